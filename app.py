@@ -1,8 +1,6 @@
 # Standard Library
 import os
-from io import StringIO
 from time import time
-import random
 import pickle
 import logging
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -11,20 +9,14 @@ logging.info("Loading External Modules")
 # External Modules
 from pathlib import Path
 import streamlit as st
-import pandas as pd
-from pandasai import SmartDataframe
-from pandasai.llm import OpenAI
-import streamlit_authenticator as stauth
 
-logging.info("Loading External Modules")
+logging.info("Loading Internal Modules")
 # Internal Modules
 from genesys.env import load_dotenv
-from genesys.visuals import render_protein_file
-from genesys.ai import run_conversation
-from genesys.DNAToolKit import sequence_type, multiple_sequence_alignment
-import genesys.client as cli
-from genesys.assistants import research_assistant
-from genesys.openai import openai_client as client
+
+# Heavy modules (pandas, pandasai, Biopython, py3Dmol, openai, httpx) are imported
+# in the branch that needs them, so the first paint only pays for Streamlit.
+# Run `python -m genesys.profiling` to see what the startup path imports.
 
 # import genesys.eventcreator as ec
 
@@ -35,11 +27,16 @@ usernames = ["charlie", "eshcol", "sandeep", "raj", "ashish"]
 
 # Load hashed passwords
 
-file_path = Path("genesys/hashed_pw.pkl")
-logging.info("Load hashed passwords")
-with file_path.open("rb") as file:
-    hashed_passwords = pickle.load(file)
+@st.cache_resource
+def load_hashed_passwords():
+    file_path = Path("genesys/hashed_pw.pkl")
+    logging.info("Load hashed passwords")
+    with file_path.open("rb") as file:
+        return pickle.load(file)
+
+hashed_passwords = load_hashed_passwords()
 
+# import streamlit_authenticator as stauth
 # authenticator = stauth.Authenticate(
 #     names, usernames, hashed_passwords, "sales_dashboard", "abcdef", cookie_expiry_days=0)
 
@@ -128,6 +125,28 @@ else:  # UNIX-like OS (Mac & Linux)
 
 load_dotenv()
 
+@st.cache_resource
+def get_pandasai_llm():
+    from pandasai.llm import OpenAI
+    return OpenAI()
+
+@st.cache_resource(max_entries=8)
+def get_dataframe(parquet_file):
+    from genesys.tables import load_parquet
+
+    # Converted to pandas once per file instead of on every rerun
+    return load_parquet(parquet_file)
+
+@st.cache_resource(max_entries=8)
+def get_smart_dataframe(parquet_file):
+    from pandasai import SmartDataframe
+    from pandasai.schemas.df_config import Config
+
+    # The LLM always sees every column: a question need not name all the
+    # columns its answer depends on
+    # Answers are cached by genesys.answers instead of pandasai's own cache
+    return SmartDataframe(get_dataframe(parquet_file), config=Config(llm=get_pandasai_llm(), enable_cache=False))
+
 logging.info("Determining File Type")
 def determine_file_type(file):
     if file is not None:
@@ -136,7 +155,7 @@ def determine_file_type(file):
             return "FASTA"
         elif file_extension == "csv":
             return "CSV"
-        elif file_extension == "pdb":
+        elif file_extension in ("pdb", "cif", "mmcif"):
             return "PDB"
     return None
 
@@ -152,6 +171,10 @@ else:
 # Another reason we don't want this to be our implementation is we are going to hopefully have 10 --> 20 file types in the future. Which will be a lot of ifs.
 
 if data_type == "FASTA":
+    from genesys.ai import stream_conversation
+    from genesys.DNAToolKit import sequence_type, multiple_sequence_alignment
+    from genesys.uploads import get_upload_queue
+
     if data_type == "FASTA":
         fasta_file = file
 
@@ -163,13 +186,12 @@ if data_type == "FASTA":
                         fasta_content = fasta_file.read()
                         temp_file.write(fasta_content)
 
-                        fasta_content_str = fasta_content.decode('utf-8')
-
-            cli.upload_s3(fasta_content_str, username, filename, "FASTA")    
+            # Uploads run in the background so the analysis can start right away
+            get_upload_queue().enqueue(fasta_content, username, filename, "FASTA")
 
             st.success(f"File uploaded successfully!")
 
-if fasta_file is not None:
+    if fasta_file is not None:
 
         # url = get_s3_url(filename=fasta_file.name)
         # upload_content_to_s3(url, fasta_content)
@@ -179,7 +201,7 @@ if fasta_file is not None:
         col1, col2 = st.columns(2)
 
         if user_input:
-            st.write(run_conversation(user_input, temp_file_path))
+            st.write_stream(stream_conversation(user_input, temp_file_path))
             # ec.create_message_event(username, cur_session, user_input)
 
         sequence_type = sequence_type(temp_file_path)
@@ -229,34 +251,34 @@ if fasta_file is not None:
                 st.code(msa_result, language="text")
                 # ec.create_response_event(username, cur_session, msa_result, "code", "text")
         elif mass_button:
-            st.write(run_conversation("Calculate the mass?", temp_file_path))
+            st.write_stream(stream_conversation("Calculate the mass?", temp_file_path))
             # ec.create_message_event(username, cur_session, "Calculate the mass?")
         elif orf_button:
-            st.write(run_conversation("What are the ORFs for the given file?", temp_file_path))
+            st.write_stream(stream_conversation("What are the ORFs for the given file?", temp_file_path))
             # ec.create_message_event(username, cur_session, "What are the ORFs for the given file?")
         elif restriction_button:
-            st.write(run_conversation("What are restriction sites on the first sequence?", temp_file_path))
+            st.write_stream(stream_conversation("What are restriction sites on the first sequence?", temp_file_path))
             # ec.create_message_event(username, cur_session, "What are restriction sites on the first sequence?")
         elif transcription_button:
-            st.write(run_conversation("Generate the mRNA transcript", temp_file_path))
+            st.write_stream(stream_conversation("Generate the mRNA transcript", temp_file_path))
             # ec.create_message_event(username, cur_session, "Generate the mRNA transcript")
         elif translate_button:
-            st.write(run_conversation("Translate the given sequence", temp_file_path))
+            st.write_stream(stream_conversation("Translate the given sequence", temp_file_path))
             # ec.create_message_event(username, cur_session, "Translate the given sequence")
         elif gc_button:
-            st.write(run_conversation("Calculate the GC content(s)", temp_file_path))
+            st.write_stream(stream_conversation("Calculate the GC content(s)", temp_file_path))
             # ec.create_message_event(username, cur_session, "Calculate the GC content(s)")
         elif reverse_button:
-            st.write(run_conversation("Find the reverse complementary", temp_file_path))
+            st.write_stream(stream_conversation("Find the reverse complementary", temp_file_path))
             # ec.create_message_event(username, cur_session, "Find the reverse complementary")
         elif complement_button:
-            st.write(run_conversation("Generate the complement of the given sequence", temp_file_path))
+            st.write_stream(stream_conversation("Generate the complement of the given sequence", temp_file_path))
             # ec.create_message_event(username, cur_session, "Generate the complement of the given sequence")
         elif isoelectric_button:
-            st.write(run_conversation("What are the isoelectric points?", temp_file_path))
+            st.write_stream(stream_conversation("What are the isoelectric points?", temp_file_path))
             # ec.create_message_event(username, cur_session, "What are the isoelectric points?")
         elif phylogenetic_button:
-            st.write(run_conversation("Generate a phylogenetic tree", temp_file_path))
+            st.write_stream(stream_conversation("Generate a phylogenetic tree", temp_file_path))
             # ec.create_message_event(username, cur_session, "Generate a phylogenetic tree")
 
         if user_input == None:
@@ -266,49 +288,62 @@ if fasta_file is not None:
             st.write(f"Your question: {user_input}")
 
 elif data_type == "PDB":
+    from genesys.ai import stream_conversation
+    from genesys.visuals import render_protein_file
+    from genesys.uploads import get_upload_queue
+
     pdb_file = file
 
     if pdb_file is not None:
-        pdb_content = pdb_file.read().decode("utf-8")
+        pdb_content = pdb_file.read()
 
-        pdb_filename = str(int(time()))+pdb_file.name
-        cli.upload_s3(pdb_content, username, pdb_filename, "pdb")
+        # Re-uploads of the same content keep their first name, and with it
+        # the temp file and the cached structure and view
+        pdb_filename = get_upload_queue().enqueue(pdb_content, username, str(int(time()))+pdb_file.name, "pdb")
         # ec.create_pdb_event(username, cur_session, pdb_filename, "Visualization")
 
+        # The structure tools and the viewer read the file from disk
+        temp_file_path = os.path.join(temp_dir, pdb_filename)
+        if not os.path.exists(temp_file_path):
+            with open(temp_file_path, "wb") as temp_file:
+                temp_file.write(pdb_content)
+
+        render_protein_file(temp_file_path)
+
         pdb_user_input = st.chat_input("")
 
         if pdb_user_input:
-            st.write(render_protein_file(pdb_content)) # TODO: What is this??????! This section makes zero sense why would we wait for the user to type something? This was also purposefully changed from my original implementation which was much simpler.
-
-        st.write(pdb_user_input)
+            st.write(pdb_user_input)
+            st.write_stream(stream_conversation(pdb_user_input, temp_file_path))
 
     else:
         st.write("Please upload a PDB file.")
         # ec.create_response_event(username, cur_session, "Please upload a PDB file.")
 
 elif data_type == "CSV":
+    from genesys.answers import COLUMNS_QUESTION, DESCRIBE_QUESTION, HEAD_QUESTION, SHAPE_QUESTION, answer_question
+    from genesys.tables import csv_to_parquet
+    from genesys.uploads import get_upload_queue
+
     csv_file = file
 
     if csv_file is not None:
         st.write("CSV file uploaded. Displaying DataFrame:")
         # ec.create_response_event(username, cur_session, "CSV file uploaded. Displaying DataFrame:")
 
-        df = pd.read_csv(csv_file)
+        csv_bytes = csv_file.getvalue()
+        # Parsed once per distinct file, reruns memory-map the cached Parquet copy
+        parquet_file = csv_to_parquet(csv_bytes)
+        df = get_dataframe(parquet_file)
         csv_filename = str(int(time()))+csv_file.name
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer)
-        cli.upload_s3(csv_buffer.getvalue(), username, csv_filename, "csv")
+        # Upload the original bytes rather than re-serialising the dataframe
+        get_upload_queue().enqueue(csv_bytes, username, csv_filename, "csv")
         # ec.create_csv_event(username, cur_session, csv_filename, df)
 
         st.dataframe(df)
         # ec.display_csv_event(username, cur_session, csv_filename)
 
 
-    from pandasai.schemas.df_config import Config
-
-    default_config = Config()
-    sdf = SmartDataframe(df, config=default_config)
-
     csv_user_input = st.chat_input("")
 
     col1, col2 = st.columns(2)
@@ -322,14 +357,15 @@ elif data_type == "CSV":
         head_button = st.button("Show the first 5 rows of the dataframe")
 
         # TODO: These if statements can be simplified so much. I don't think the buttons should be generated in this app. The app file should be a simple loop of user event --> compute event. This architecture is un
+        # Stock questions are answered locally, without the LLM
         if shape_button:
-            csv_user_input = "What is the shape of the dataframe?"
+            csv_user_input = SHAPE_QUESTION
         elif columns_button:
-            csv_user_input = "What are the columns of the dataframe?"
+            csv_user_input = COLUMNS_QUESTION
         elif describe_button:
-            csv_user_input = "Tell me the descriptive statistics of the dataframe"
+            csv_user_input = DESCRIBE_QUESTION
         elif head_button:
-            csv_user_input = "Show the first 5 rows of the dataframe"
+            csv_user_input = HEAD_QUESTION
         
         
         st.write(csv_user_input)
@@ -339,7 +375,13 @@ elif data_type == "CSV":
             st.write(csv_user_input)
             # ec.create_message_event(username, cur_session, csv_user_input)
 
-            response = sdf.chat(csv_user_input)
+            # Local answer for the stock questions, then the answer cache, then the LLM
+            response = answer_question(
+                df,
+                parquet_file.stem,
+                csv_user_input,
+                lambda question: get_smart_dataframe(parquet_file).chat(question),
+            )
             # # ec.create_message_event(username, cur_session, response)
             st.write(response)
 
@@ -1,239 +1,152 @@
 import os
+import asyncio
 import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
 import openai
-from . import eventcreator as ec
-from . import DNAToolKit as toolkit
+from openai import AsyncOpenAI, OpenAI
+
 from .env import load_dotenv
+from .tools import sequence as sequence_tools
+from .tools import structure as structure_tools
+from .utils import gen_tools_schema, get_tool_functions
 
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-system_prompt = "Be a bioinformatician who answers questions about a FASTA file with the given path."
-
-functions = [
-    {
-        "name": "sequence_type",
-        "description": "Get the type of sequences in a FASTA file.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                }
-            },
-            "required": ["filepath"]
-        },
-        "returns": {
-            "type": "object",
-            "properties": {
-                "sequence_type": {
-                    "type": "string",
-                    "enum": ["DNA", "RNA", "Protein"],
-                }
-            },
-        }
-    },
-    {
-        "name": "count_occurences",
-        "description": "Count the number of nucleotides for each DNA/RNA sequence or amino acids for each protein in a FASTA file",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "transcription",
-        "description": "Transcribe a DNA sequence to RNA.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "complementary",
-        "description": "Find the complementary DNA sequence to a given DNA sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "reverseComplementary",
-        "description": "Find the reverse complementary of a sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "gc_content",
-        "description": "Calculate the GC content of a DNA/RNA sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "translation",
-        "description": "Translate a DNA sequence to a protein sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "mass_calculator",
-        "description": "Calculate the molecular mass of a DNA, RNA or protein sequence",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "restriction_sites",
-        "description": "Find the restriction sites of a DNA sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "isoelectric_point",
-        "description": "Calculate the isoelectric point of a protein sequence.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "The protein sequence."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "multiple_sequence_alignment",
-        "description": "Perform multiple sequence alignment using a FASTA file.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                    "description": "Path to the FASTA file."
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "construct_phylogenetic_tree",
-        "description": "Construct a phylogenetic tree using a FASTA file.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "open_reading_frames",
-        "description": "Finds the forward and reverse open reading frames",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "detect_snps",
-        "description": "Detect single nucleotide polymorphisms (SNPs)",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                },
-            },
-            "required": ["filepath"]
-        },
-    },
-    {
-        "name": "find_motifs",
-        "description": "Find motifs in a DNA sequence",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "filepath": {
-                    "type": "string",
-                },
-                "motif": {
-                    "type": "string",
-                }
-            },
-            "required": ["filepath", "motif"]
-        }
+system_prompt = "Be a bioinformatician who answers questions about a FASTA, PDB or mmCIF file with the given path."
+
+# Built once per process from the annotated toolkit modules and reused by every
+# conversation. Dispatch is a plain lookup into `tool_functions`.
+tools = gen_tools_schema(sequence_tools) + gen_tools_schema(structure_tools)
+functions = [tool["function"] for tool in tools]
+tool_functions = get_tool_functions(sequence_tools) | get_tool_functions(structure_tools)
+
+# Tools that spend their time crunching sequences rather than waiting on I/O.
+# These run in a process pool so that several of them requested in the same
+# turn don't contend for the GIL.
+CPU_BOUND_TOOLS = {
+    "open_reading_frames",
+    "multiple_sequence_alignment",
+    "detect_snps",
+    "restriction_sites",
+    "find_motifs",
+}
+
+# Upper bound on the tool processes of one server, however many CPUs it has
+MAX_TOOL_PROCESSES = 4
+
+MAX_TOOL_ROUNDS = 5
+
+client = OpenAI()
+
+_thread_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="genesys-tool")
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Workers come from a fork server rather than forking the Streamlit
+            # server, whose other threads may hold locks (e.g. logging's) that
+            # would never be released in the child
+            _process_pool = ProcessPoolExecutor(
+                max_workers=min(MAX_TOOL_PROCESSES, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+    return _process_pool
+
+
+def _submit_tool_call(function_name: str, function_args: dict):
+    function_to_call = tool_functions[function_name]
+    pool = _get_process_pool() if function_name in CPU_BOUND_TOOLS else _thread_pool
+    return pool.submit(function_to_call, **function_args)
+
+
+def _start_tool_call(function_name: str, arguments: str) -> Future:
+    """Submit a single tool call without waiting for it.
+
+    Returns:
+        Future: Resolves to a `(response, seconds)` tuple. Failures are reported
+        in the response instead of being raised so the model can explain them.
+    """
+    outcome = Future()
+    start = time.perf_counter()
+
+    try:
+        function_args = json.loads(arguments)
+    except json.JSONDecodeError:
+        outcome.set_result(("An error occurred while decoding the function arguments.", 0.0))
+        return outcome
+    if not isinstance(function_args, dict):
+        outcome.set_result(("The function arguments must be a JSON object.", 0.0))
+        return outcome
+
+    try:
+        future = _submit_tool_call(function_name, function_args)
+    except KeyError:
+        outcome.set_result((f"Unknown function: {function_name}", 0.0))
+        return outcome
+
+    def _done(f):
+        elapsed = time.perf_counter() - start
+        try:
+            response = f.result()
+        except Exception as e:
+            response = f"An error occurred while running {function_name}: {e}"
+        outcome.set_result((response, elapsed))
+
+    future.add_done_callback(_done)
+    return outcome
+
+
+def _tool_message(call_id: str, function_name: str, response, elapsed: float, timings: list | None) -> dict:
+    logging.info(f"Tool call {function_name} took {elapsed:.3f}s")
+    if timings is not None:
+        timings.append({
+            "name": function_name,
+            "tool_call_id": call_id,
+            "seconds": elapsed,
+        })
+
+    return {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": str(response),
     }
-]
 
-def run_conversation(user_input, fasta_file):
-    # Step 1: Send the user query and available functions to GPT-3.5 Turbo
+
+def execute_tool_calls(tool_calls, timings: list | None = None) -> list[dict]:
+    """Run every tool call of a single model turn concurrently.
+
+    Args:
+        tool_calls: The `tool_calls` of an assistant message.
+        timings: Optional list that receives a `{"name", "tool_call_id", "seconds"}`
+            entry for each call.
+
+    Returns:
+        list: One `tool` message per call, in the same order as `tool_calls`.
+    """
+    started = [
+        (tool_call, _start_tool_call(tool_call.function.name, tool_call.function.arguments))
+        for tool_call in tool_calls
+    ]
+
+    return [
+        _tool_message(tool_call.id, tool_call.function.name, *outcome.result(), timings)
+        for tool_call, outcome in started
+    ]
+
+
+def run_conversation(user_input, fasta_file, timings: list | None = None):
+    # Step 1: Send the user query and available tools to the model
     messages = [
         {
             "role": "system",
@@ -249,85 +162,136 @@ def run_conversation(user_input, fasta_file):
         }
     ]
 
-from openai import OpenAI
+    for _ in range(MAX_TOOL_ROUNDS):
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",  # The model decides whether to call a tool
+            temperature=0.3,
+        )
+        response_message = response.choices[0].message
+        # ec.create_response_event(username, current_session, response_message)
 
-client = OpenAI()
+        # Step 2: Stop as soon as the model answers without asking for tools
+        if not response_message.tool_calls:
+            return response_message.content
 
-def create_chat_completion(user_input):
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ],
-        # functions=functions,
-        function_call="auto",  # The model decides whether to call a function
-        temperature=0.3,
-    )
-    return response
-#     temperature=0.3,
-# )
-
-# def create_chat_completion(user_input):
-#     response = client.chat.completions.create(
-#         model="gpt-4o",
-#         messages=[
-#             {"role": "system", "content": system_prompt},
-#             {"role": "user", "content": user_input}
-#         ],
-#         #functions=functions,
-#         function_call="auto",  # The model decides whether to call a function
-#         temperature=0.3,
-#     )
-    #return response
-
-    response_message = response.choices[0].message
-    # ec.create_response_event(username, current_session, response_message)
-
-    # Initialize function_response with a default value
-    function_response = None
-
-    # Step 2: Check if GPT wants to call a function
-    if response_message.function_call:
-        # Step 3: Call the function based on the model's response
-        function_name = response_message.function_call.name
-
-        if function_name is not None:
-            try:
-                function_to_call = getattr(toolkit, function_name)
-                function_args = json.loads(response_message.function_call.arguments)
-                filepath = function_args.get("filepath")
-                motif = function_args.get("motif", None)
-
-                if function_name == "find_motifs":
-                    function_response = function_to_call(filepath=filepath, motif=motif)
-                else:
-                    function_response = function_to_call(filepath=filepath) 
-
-            except json.JSONDecodeError:
-                function_response = "An error occurred while decoding the function arguments."
-    
-    # Step 4: Extend the conversation with the function call and response
-    # Extend the conversation with the assistant's reply
-    if 'messages' not in locals():
-        messages = []
-    messages.append(response_message)
-    if function_response is not None:
-        messages.append(
-            {
-                "role": "function",
-                "name": function_name,
-                "content": str(function_response),
-            }
-        )  # Extend the conversation with the function response
-
-    # Step 5: Send the extended conversation to GPT for further interaction
-    second_response = openai.chat.completions.create(
+        # Step 3: Run all requested tools at once and extend the conversation
+        messages.append(response_message)
+        messages.extend(execute_tool_calls(response_message.tool_calls, timings))
+
+    # Step 4: Out of tool rounds, ask for an answer with what we have
+    final_response = client.chat.completions.create(
         model="gpt-4o",
         messages=messages,
+        temperature=0.3,
     )
 
-    answer = second_response.choices[0].message.content
+    answer = final_response.choices[0].message.content
     # ec.create_response_event(username, current_session, answer)
 
     return answer
+
+
+async def astream_conversation(user_input, fasta_file, timings: list | None = None):
+    """Streaming, async counterpart of `run_conversation`.
+
+    Yields the answer text as the model produces it. Each tool call is started
+    as soon as its arguments have finished streaming, so tool execution overlaps
+    with the rest of the model's response.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": f"""
+                {user_input}
+
+                '{fasta_file}'
+                """
+        }
+    ]
+
+    async with AsyncOpenAI() as async_client:
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            request = {"model": "gpt-4o", "messages": messages, "temperature": 0.3, "stream": True}
+            if round_number < MAX_TOOL_ROUNDS:
+                request.update(tools=tools, tool_choice="auto")
+
+            stream = await async_client.chat.completions.create(**request)
+
+            content = []
+            calls = {}  # index -> {"id", "name", "arguments", "outcome"}
+
+            def _start(call):
+                call["outcome"] = asyncio.wrap_future(_start_tool_call(call["name"], call["arguments"]))
+
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if delta.content:
+                    content.append(delta.content)
+                    yield delta.content
+
+                for tool_call_delta in delta.tool_calls or []:
+                    if tool_call_delta.index not in calls:
+                        # A new tool call means the previous ones are complete
+                        for call in calls.values():
+                            if "outcome" not in call:
+                                _start(call)
+                        calls[tool_call_delta.index] = {"id": "", "name": "", "arguments": ""}
+
+                    call = calls[tool_call_delta.index]
+                    if tool_call_delta.id:
+                        call["id"] = tool_call_delta.id
+                    if tool_call_delta.function:
+                        call["name"] += tool_call_delta.function.name or ""
+                        call["arguments"] += tool_call_delta.function.arguments or ""
+
+            if not calls:
+                return
+
+            for call in calls.values():
+                if "outcome" not in call:
+                    _start(call)
+
+            ordered = [calls[index] for index in sorted(calls)]
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": "".join(content) or None,
+                    "tool_calls": [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]},
+                        }
+                        for call in ordered
+                    ],
+                }
+            )
+            for call in ordered:
+                response, elapsed = await call["outcome"]
+                messages.append(_tool_message(call["id"], call["name"], response, elapsed, timings))
+
+
+def stream_conversation(user_input, fasta_file, timings: list | None = None):
+    """Synchronous generator over `astream_conversation`, for `st.write_stream`."""
+    loop = asyncio.new_event_loop()
+    chunks = astream_conversation(user_input, fasta_file, timings)
+
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(chunks))
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(chunks.aclose())
+        loop.close()
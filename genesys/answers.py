@@ -0,0 +1,173 @@
+"""Answers to questions about uploaded dataframes.
+
+Stock questions (the buttons in `app.py`) are answered locally with pandas.
+Everything else goes to the LLM once per dataframe and normalised question;
+the answer is kept in an SQLite cache, replacing pandasai's own cache.
+"""
+
+import json
+import re
+import sqlite3
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from .env import CACHE_DIR
+
+CACHE_FILE = CACHE_DIR / "answers.sqlite3"
+
+# pandasai answers with this instead of raising when the generated code fails
+LLM_ERROR_PREFIX = "Unfortunately, I was not able to answer your question"
+
+SHAPE_QUESTION = "What is the shape of the dataframe?"
+COLUMNS_QUESTION = "What are the columns of the dataframe?"
+DESCRIBE_QUESTION = "Tell me the descriptive statistics of the dataframe"
+HEAD_QUESTION = "Show the first 5 rows of the dataframe"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    df_hash TEXT NOT NULL,
+    question TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (df_hash, question)
+);
+"""
+
+
+def normalize_question(question: str) -> str:
+    """Normalise a question so trivially different spellings share a cache entry."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
+
+
+_LOCAL_ANSWERS: dict[str, Callable[[pd.DataFrame], Any]] = {
+    normalize_question(SHAPE_QUESTION): lambda df: df.shape,
+    normalize_question(COLUMNS_QUESTION): lambda df: list(df.columns),
+    normalize_question(DESCRIBE_QUESTION): lambda df: df.describe(),
+    normalize_question(HEAD_QUESTION): lambda df: df.head(5),
+}
+
+
+def local_answer(df: pd.DataFrame, question: str) -> Any | None:
+    """Answer a stock question with pandas, or return None if it isn't one."""
+    if (answer := _LOCAL_ANSWERS.get(normalize_question(question))) is not None:
+        return answer(df)
+    return None
+
+
+def _json_default(value: Any) -> Any:
+    # NumPy scalars, which pandas hands out for most computed values
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode(answer: Any) -> tuple[str, str] | None:
+    # pandasai wraps dataframe answers in a SmartDataframe
+    if isinstance(getattr(answer, "dataframe", None), pd.DataFrame):
+        answer = answer.dataframe
+    if isinstance(answer, pd.DataFrame):
+        return "dataframe", answer.to_json(orient="split", date_format="iso")
+    if isinstance(answer, pd.Series):
+        return "series", answer.to_json(orient="split", date_format="iso")
+    try:
+        return "json", json.dumps(answer, default=_json_default)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode(kind: str, value: str) -> Any:
+    if kind == "dataframe":
+        return pd.read_json(StringIO(value), orient="split")
+    if kind == "series":
+        return pd.read_json(StringIO(value), orient="split", typ="series")
+    return json.loads(value)
+
+
+class AnswerCache:
+    """Disk-backed cache of answers keyed by dataframe hash and normalised question."""
+
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path or CACHE_FILE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, df_hash: str, question: str) -> tuple[bool, Any]:
+        """Get a cached answer as (found, answer)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT kind, value FROM answers WHERE df_hash = ? AND question = ?",
+                (df_hash, normalize_question(question)),
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, _decode(*row)
+
+    def put(self, df_hash: str, question: str, answer: Any) -> bool:
+        """Cache an answer. Returns False if it can't be stored (e.g. None for a chart)."""
+        if answer is None or (encoded := _encode(answer)) is None:
+            return False
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (df_hash, normalize_question(question), *encoded, time.time()),
+            )
+        return True
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers")
+
+
+def answer_question(
+    df: pd.DataFrame,
+    df_hash: str,
+    question: str,
+    ask_llm: Callable[[str], Any],
+    cache: AnswerCache | None = None,
+) -> Any:
+    """Answer a question about a dataframe as cheaply as possible.
+
+    Args:
+        df (pd.DataFrame): The dataframe, used for the local answers.
+        df_hash (str): Identifies the dataframe's content, e.g. its CSV's hash.
+        question (str): The user's question.
+        ask_llm (Callable[[str], Any]): Asks the LLM, e.g. `SmartDataframe.chat`.
+            Only called on a cache miss.
+        cache (AnswerCache, optional): Defaults to the cache in `CACHE_FILE`.
+
+    Returns:
+        Any: The answer. None means the LLM drew a chart.
+    """
+    if (answer := local_answer(df, question)) is not None:
+        return answer
+
+    cache = cache or get_default_cache()
+    found, answer = cache.get(df_hash, question)
+    if found:
+        return answer
+
+    answer = ask_llm(question)
+    if not (isinstance(answer, str) and answer.startswith(LLM_ERROR_PREFIX)):
+        cache.put(df_hash, question, answer)
+    return answer
+
+
+_default_cache = None
+
+def get_default_cache() -> AnswerCache:
+    """Get the process-wide cache stored in `CACHE_FILE`."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnswerCache()
+    return _default_cache
@@ -9,7 +9,11 @@ research_assistant = BaseAssistant(
     tools_module=pubmed,
     name="Research Assistant",
     description="A research assistant to help you with your work.",
-    instructions="Help find sources for my research paper.",
+    instructions=(
+        "Help find sources for my research paper. "
+        "Search the papers we already have with search_local_papers first, "
+        "and only use fetch_papers when that doesn't turn up enough."
+    ),
     tools=gen_tools_schema(pubmed),
 )
 
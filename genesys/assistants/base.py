@@ -3,6 +3,10 @@ from types import ModuleType
 from typing import Optional, TypedDict, Unpack
 
 from openai import OpenAI
+from openai.types.beta import Assistant
+
+from .registry import forget_assistant, get_assistant_id
+from .runner import get_tool_runner
 
 DEFAULT_MODEL = "gpt-4"
 
@@ -17,34 +21,74 @@ def initialize_base_assistant(**kwargs: Unpack[AssistantCreateParams]) -> Any:
     return OpenAI().beta.assistants.create(**kwargs)
 
 class BaseAssistant:
+    """A remote assistant backed by the functions of a tools module.
+
+    Nothing is sent to the API until the assistant is first used. Its ID is
+    then resolved through the local assistant registry, which reuses a
+    matching remote assistant instead of creating a new one per process.
+    """
     model: str = DEFAULT_MODEL
 
     def __init__(self, tools_module: ModuleType, **kwargs: Unpack[AssistantCreateParams]):
-        self.tools = tools_module.__dict__
+        self.tool_runner = get_tool_runner(tools_module)
         kwargs.setdefault("model", self.model)
-        self.assistant = create_base_assistant(**kwargs)
-        self.client = OpenAI()
-        
+        self.config = kwargs
+        self._id = None
+        self._assistant = None
+        self._client = None
+
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            self._client = OpenAI()
+        return self._client
+
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = get_assistant_id(self.client, **self.config)
+        return self._id
+
+    @property
+    def assistant(self) -> Assistant:
+        if self._assistant is None:
+            self._assistant = self.client.beta.assistants.retrieve(self.id)
+        return self._assistant
+
     def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self.assistant, name)
 
     def __repr__(self) -> str:
-        return f"<BaseAssistant: {self.assistant.id}>"
+        return f"<BaseAssistant: {self.config.get('name')}>"
     
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, BaseAssistant):
             return NotImplemented
-        return self.assistant.id == other.assistant.id
+        return self.id == other.id
 
     def __hash__(self) -> int:
-        return hash(self.assistant.id)
+        return hash(self.id)
 
     def delete(self):
-        return self.client.beta.assistants.delete(self.assistant.id)
+        deleted = self.client.beta.assistants.delete(self.id)
+        forget_assistant(self.config["name"])
+        self._id = self._assistant = None
+        return deleted
+
+    def get_tool_outputs(self, run):
+        if run.required_action and run.required_action.type == "submit_tool_outputs":
+            tool_calls = [
+                tool_call.model_dump()
+                for tool_call in run.required_action.submit_tool_outputs.tool_calls
+            ]
+            return self.tool_runner.run(tool_calls)
+
+        return []
 
 import openai
 from openai.types.beta import AssistantCreateParams
-from openai.types.beta import Assistant
 from typing import Unpack
 
 def create_base_assistant(**kwargs: Unpack[AssistantCreateParams]) -> Assistant:
@@ -53,20 +97,3 @@ def create_base_assistant(**kwargs: Unpack[AssistantCreateParams]) -> Assistant:
 
 # def update(self, **kwargs: Unpack[AssistantCreateParams]) -> 'Assistant':
 #     return self.client.beta.assistants.update(assistant_id=self.assistant['id'], **kwargs)
-
-def get_tool_outputs(self, run):
-        tool_outputs = []
-        if run.required_action and run.required_action.type == "submit_tool_outputs":
-            for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                if (fn_name := tool_call.function.name) in self.tools:
-                    function_to_call = self.tools[fn_name]
-                    args = json.loads(tool_call.function.arguments)
-                    ret = function_to_call(**args)
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps(ret)
-                    })
-                else:
-                    raise ValueError(f"Unknown tool: {fn_name}")
-                
-        return tool_outputs
\ No newline at end of file
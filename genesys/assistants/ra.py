@@ -1,16 +1,25 @@
 from openai import OpenAI
 import time
-import json
+import logging
 from genesys.env import load_dotenv
+from genesys.assistants.runner import get_tool_runner
 import genesys.tools.pubmed as pubmed_tools
 import inspect
 
 load_dotenv()
 
+# Polling backoff, used when the installed client can't stream run events.
+POLL_INITIAL_DELAY = 0.1
+POLL_MAX_DELAY = 2.0
+POLL_BACKOFF = 1.5
+
+TERMINAL_RUN_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete"}
+
 class ResearchAssistant:
     def __init__(self, api_key, model="gpt-4-1106-preview"):
         self.client = OpenAI(api_key=api_key)
         self.model = model
+        self.run_metrics = {}
 
     def create_assistant(self, assistant_name, instructions, tools_list):
         assistant = self.client.beta.assistants.create(
@@ -25,61 +34,148 @@ class ResearchAssistant:
         thread = self.client.beta.threads.create()
         return thread
 
+    def supports_streaming(self):
+        return "stream" in inspect.signature(self.client.beta.threads.runs.create).parameters
+
     def run_assistant(self, thread_id, assistant_id, user_input, thread_instructions):
         self.client.beta.threads.messages.create(thread_id=thread_id, role="user", content=user_input)
+
+        if self.supports_streaming():
+            return self.stream_run(thread_id, assistant_id, thread_instructions)
+
         run = self.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, instructions=thread_instructions)
-        self.check_run_status(thread_id, run.id)
+        return self.check_run_status(thread_id, run.id)
+
+    def stream_run(self, thread_id, assistant_id, thread_instructions):
+        """Drive a run from its event stream, submitting tool outputs as soon as they are required.
+
+        Returns:
+            dict: The latency metrics of the run, see `_new_metrics`.
+        """
+        metrics = self._new_metrics()
+        events = self.client.beta.threads.runs.create(
+            thread_id=thread_id, assistant_id=assistant_id, instructions=thread_instructions, stream=True
+        )
+        run = None
+
+        while events is not None:
+            next_events = None
+            for event in events:
+                metrics["events"] += 1
+                if not event.event.startswith("thread.run.") or event.event.startswith("thread.run.step"):
+                    continue
+
+                run = event.data
+                if event.event == "thread.run.requires_action":
+                    tool_outputs = self._timed_tool_outputs(run, metrics)
+                    print("Submitting outputs back to the Assistant...")
+                    next_events = self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs, stream=True
+                    )
+            events = next_events
+
+        return self._finish_run(thread_id, run, metrics)
 
     def check_run_status(self, thread_id, run_id):
+        """Poll a run with exponential backoff until it reaches a terminal status.
+
+        Returns:
+            dict: The latency metrics of the run, see `_new_metrics`.
+        """
+        metrics = self._new_metrics()
+        delay = POLL_INITIAL_DELAY
+
         while True:
-            time.sleep(5)
             run_status = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+            metrics["status_checks"] += 1
 
-            if run_status.status == 'completed':
-                messages = self.client.beta.threads.messages.list(thread_id=thread_id)
-                for msg in messages.data:
-                    role = msg.role
-                    for content_item in msg.content:
-                        if content_item.type == 'text':
-                            print(f"{role.capitalize()}: {content_item.text.value}")
-                        elif content_item.type == 'image_file':
-                            print(f"{role.capitalize()}: [Image File: {content_item.image_file.file_id}]")
-                        elif content_item.type == 'image_url':
-                            print(f"{role.capitalize()}: [Image URL: {content_item.image_url.url}]")
+            if run_status.status in TERMINAL_RUN_STATUSES:
                 break
             elif run_status.status == 'requires_action':
                 if run_status.required_action and run_status.required_action.submit_tool_outputs:
-                    self.process_required_actions(thread_id, run_id, run_status.required_action.submit_tool_outputs.model_dump())
+                    tool_outputs = self._timed_tool_outputs(run_status, metrics)
+                    print("Submitting outputs back to the Assistant...")
+                    self.client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs)
+                    # The run picks up right away, so start checking quickly again
+                    delay = POLL_INITIAL_DELAY
+                    continue
                 else:
                     print("Required action is present, but submit_tool_outputs is not available.")
             else:
                 print("Waiting for the Assistant to process...")
-        
-    def build_function_map(self):
-        function_map = {}
-        for name, func in inspect.getmembers(pubmed_tools, inspect.isfunction):
-            function_map[name] = func
-        return function_map
 
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+        return self._finish_run(thread_id, run_status, metrics)
+
+    def _new_metrics(self):
+        """Latency metrics collected while driving a single run.
+
+        Keys:
+            run_id, status: Identify the run and how it ended.
+            total_seconds: Wall time from starting to drive the run until it ended.
+            first_action_seconds: Time until the first `requires_action`, if any.
+            tool_seconds: Time spent running tools locally.
+            tool_rounds: Number of times tool outputs were submitted.
+            status_checks / events: Number of polls or streamed events seen.
+        """
+        return {
+            "run_id": None,
+            "status": None,
+            "started": time.perf_counter(),
+            "total_seconds": None,
+            "first_action_seconds": None,
+            "tool_seconds": 0.0,
+            "tool_rounds": 0,
+            "status_checks": 0,
+            "events": 0,
+        }
+
+    def _timed_tool_outputs(self, run, metrics):
+        start = time.perf_counter()
+        if metrics["first_action_seconds"] is None:
+            metrics["first_action_seconds"] = start - metrics["started"]
+
+        tool_outputs = self.get_tool_outputs(run.required_action.submit_tool_outputs.model_dump())
+
+        metrics["tool_seconds"] += time.perf_counter() - start
+        metrics["tool_rounds"] += 1
+        return tool_outputs
+
+    def _finish_run(self, thread_id, run, metrics):
+        metrics["total_seconds"] = time.perf_counter() - metrics.pop("started")
+        if run is not None:
+            metrics["run_id"] = run.id
+            metrics["status"] = run.status
+            self.run_metrics[run.id] = metrics
+
+        logging.info(
+            f"Run {metrics['run_id']} {metrics['status']} in {metrics['total_seconds']:.2f}s "
+            f"({metrics['tool_rounds']} tool rounds, {metrics['tool_seconds']:.2f}s in tools)"
+        )
+
+        if metrics["status"] == "completed":
+            self.print_messages(thread_id)
+        return metrics
+
+    def print_messages(self, thread_id):
+        messages = self.client.beta.threads.messages.list(thread_id=thread_id)
+        for msg in messages.data:
+            role = msg.role
+            for content_item in msg.content:
+                if content_item.type == 'text':
+                    print(f"{role.capitalize()}: {content_item.text.value}")
+                elif content_item.type == 'image_file':
+                    print(f"{role.capitalize()}: [Image File: {content_item.image_file.file_id}]")
+                elif content_item.type == 'image_url':
+                    print(f"{role.capitalize()}: [Image URL: {content_item.image_url.url}]")
+
+    def get_tool_outputs(self, required_actions):
+        return get_tool_runner(pubmed_tools).run(required_actions["tool_calls"])
 
     def process_required_actions(self, thread_id, run_id, required_actions):
-        tool_outputs = []
-        function_map = self.build_function_map()
-
-        for action in required_actions["tool_calls"]:
-            func_name = action['function']['name']
-            arguments = json.loads(action['function']['arguments'])
-
-            if func_name in function_map:
-                function_to_call = function_map[func_name]
-                output = function_to_call(**arguments)
-                output_str = json.dumps(output)
-                tool_outputs.append({
-                    "tool_call_id": action['id'],
-                    "output": output_str
-                })
-            else:
-                raise ValueError(f"Unknown function: {func_name}")
+        tool_outputs = self.get_tool_outputs(required_actions)
 
         print("Submitting outputs back to the Assistant...")
-        self.client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs)
\ No newline at end of file
+        self.client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run_id, tool_outputs=tool_outputs)
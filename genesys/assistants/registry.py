@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from openai import OpenAI
+
+from ..env import CACHE_DIR
+
+REGISTRY_FILE = CACHE_DIR / "assistants.json"
+
+
+def config_hash(config: dict[str, Any]) -> str:
+    """Hash the parameters an assistant is created with."""
+    encoded = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def _read_registry(path: Path) -> dict[str, dict]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_registry(path: Path, registry: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _find_remote_assistant(client: OpenAI, name: str, digest: str) -> Any:
+    for assistant in client.beta.assistants.list(limit=100):
+        if assistant.name == name and (assistant.metadata or {}).get("config_hash") == digest:
+            return assistant
+    return None
+
+
+def get_assistant_id(client: OpenAI, path: Path | None = None, **config: Any) -> str:
+    """Get the ID of the remote assistant matching `config`, creating it only if needed.
+
+    Assistants are looked up by name and a hash of their configuration, first
+    in the local registry file and then remotely. A cached assistant whose
+    configuration changed is updated in place rather than replaced, so no
+    stale assistants pile up.
+
+    Args:
+        client (OpenAI): Client used for any remote calls.
+        path (Path, optional): Registry file. Defaults to `REGISTRY_FILE`.
+        **config: Parameters for `assistants.create`. `name` is required.
+
+    Returns:
+        str: The assistant ID.
+    """
+    path = path or REGISTRY_FILE
+    name = config["name"]
+    digest = config_hash(config)
+    metadata = {**config.get("metadata", {}), "config_hash": digest}
+
+    registry = _read_registry(path)
+    entry = registry.get(name)
+
+    if entry is not None and entry["config_hash"] == digest:
+        return entry["id"]
+
+    if entry is not None:
+        logging.info(f"Updating assistant {name} ({entry['id']}) to config {digest}")
+        assistant = client.beta.assistants.update(entry["id"], **{**config, "metadata": metadata})
+    elif (assistant := _find_remote_assistant(client, name, digest)) is None:
+        logging.info(f"Creating assistant {name} with config {digest}")
+        assistant = client.beta.assistants.create(**{**config, "metadata": metadata})
+
+    registry[name] = {"id": assistant.id, "config_hash": digest}
+    _write_registry(path, registry)
+    return assistant.id
+
+
+def forget_assistant(name: str, path: Path | None = None) -> None:
+    """Drop an assistant from the local registry, e.g. after deleting it remotely."""
+    path = path or REGISTRY_FILE
+    registry = _read_registry(path)
+    if registry.pop(name, None) is not None:
+        _write_registry(path, registry)
@@ -0,0 +1,124 @@
+import functools
+import json
+import logging
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from types import ModuleType
+from typing import Any
+
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from ..utils import get_tool_functions
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 60.0
+
+
+class ToolOutputEncoder(json.JSONEncoder):
+    """JSON encoder for the values our tools return.
+
+    Handles Biopython sequences and alignments, NumPy scalars and arrays, sets
+    and XML elements on top of what `json` supports out of the box (which
+    already covers `Counter` and other dict subclasses).
+    """
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, Seq):
+            return str(o)
+        if isinstance(o, SeqRecord):
+            return {"id": o.id, "seq": str(o.seq)}
+        if isinstance(o, MultipleSeqAlignment):
+            return {record.id: str(record.seq) for record in o}
+        if isinstance(o, ET.Element):
+            return o.text
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        if hasattr(o, "tolist"):  # NumPy arrays and scalars
+            return o.tolist()
+        return super().default(o)
+
+
+_encoder = ToolOutputEncoder(separators=(",", ":"))
+
+
+def dumps(obj: Any) -> str:
+    """Serialise a tool result to compact JSON."""
+    return _encoder.encode(obj)
+
+
+class ToolRunner:
+    """Runs the tool calls of an assistant run against the functions of a module.
+
+    Independent tool calls are executed concurrently on a bounded thread pool.
+    A call to an unknown tool, with arguments that aren't a JSON object, that
+    raises or that takes longer than `timeout` seconds is reported to the
+    assistant as an `{"error": ...}` output instead of failing the run.
+    """
+
+    def __init__(self, tools_module: ModuleType, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT):
+        self.functions = get_tool_functions(tools_module)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{tools_module.__name__}-tool")
+
+    def _submit(self, fn_name: str, arguments: str) -> Future:
+        if fn_name not in self.functions:
+            raise ValueError(f"Unknown tool: {fn_name}")
+
+        try:
+            args = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid arguments for {fn_name}: {e}") from e
+        if not isinstance(args, dict):
+            raise ValueError(f"Invalid arguments for {fn_name}: expected a JSON object")
+
+        return self.executor.submit(self.functions[fn_name], **args)
+
+    def run(self, tool_calls: list[dict]) -> list[dict]:
+        """Execute tool calls and collect their outputs.
+
+        Args:
+            tool_calls (list): Tool calls as dictionaries, e.g. from `model_dump()`.
+
+        Returns:
+            list: `{"tool_call_id", "output"}` dictionaries ready for `submit_tool_outputs`.
+        """
+        submitted = []
+
+        for tool_call in tool_calls:
+            fn_name = tool_call["function"]["name"]
+            try:
+                future = self._submit(fn_name, tool_call["function"]["arguments"])
+            except ValueError as e:
+                # Reported like a failed call, so the other calls still run
+                future = Future()
+                future.set_exception(e)
+            submitted.append((tool_call["id"], fn_name, future, time.monotonic()))
+
+        tool_outputs = []
+
+        for tool_call_id, fn_name, future, start in submitted:
+            remaining = max(0.0, self.timeout - (time.monotonic() - start))
+            try:
+                output = dumps(future.result(timeout=remaining))
+            except TimeoutError:
+                logging.error(f"Tool {fn_name} timed out after {self.timeout}s")
+                output = dumps({"error": f"{fn_name} timed out after {self.timeout} seconds"})
+            except Exception as e:
+                logging.error(f"Tool {fn_name} failed: {e}")
+                output = dumps({"error": str(e)})
+
+            tool_outputs.append({
+                "tool_call_id": tool_call_id,
+                "output": output
+            })
+
+        return tool_outputs
+
+
+@functools.cache
+def get_tool_runner(tools_module: ModuleType) -> ToolRunner:
+    """Get the shared `ToolRunner` for a tools module."""
+    return ToolRunner(tools_module)
@@ -1,14 +1,98 @@
-import httpx as requests # httpx runs async while requests doesn't. 
+import httpx
 import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+from urllib.parse import parse_qs, urlparse
 
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
 
 # TODO: Generate the random a
 
+API_URL = "https://omqjp5gczd.execute-api.us-east-1.amazonaws.com/TestStage"
 
-def upload_content_to_s3(presigned_url: str, content: str) -> int:
-    with requests.Client(timeout=60) as client:
-        http_response = client.put(presigned_url, content=content)
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Responses of the batch presign endpoint meaning it isn't deployed
+BATCH_UNSUPPORTED_STATUS_CODES = {404, 405}
+
+# Presigned URLs are reused until shortly before they expire. URLs without a
+# recognisable expiry are kept for DEFAULT_URL_TTL seconds.
+DEFAULT_URL_TTL = 60
+URL_EXPIRY_MARGIN = 30
+
+# (load_type, user_id, filename, data_file)
+PresignKey = tuple[str, str, str, str]
+
+_http_client = None
+_url_cache: dict[PresignKey, tuple[dict, float]] = {}
+_url_cache_lock = threading.Lock()
+_batch_supported = True
+
+def get_http_client() -> httpx.Client:
+    """Get the connection-pooled client shared by every request in this module."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            timeout=httpx.Timeout(60, connect=10),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+def _request(method: str, url: str, content_factory: Callable[[], object] | None = None, stream: bool = False, **kwargs) -> httpx.Response:
+    """Send a request, retrying connection errors and retryable status codes with exponential backoff.
+
+    Request bodies that can only be read once (file handles, generators) are
+    passed as `content_factory`, which is called again for every attempt.
+    """
+    client = get_http_client()
+
+    for attempt in range(MAX_RETRIES + 1):
+        if content_factory is not None:
+            kwargs["content"] = content_factory()
+        try:
+            request = client.build_request(method, url, **kwargs)
+            response = client.send(request, stream=stream)
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logging.warning(f"{method} request failed ({e}), retrying")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                return response
+            response.close()
+            logging.warning(f"{method} request returned {response.status_code}, retrying")
+
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+def _iter_file(file: BinaryIO, start: int) -> Iterator[bytes]:
+    file.seek(start)
+    while chunk := file.read(CHUNK_SIZE):
+        yield chunk
+
+def upload_content_to_s3(presigned_url: str, content: str | bytes | BinaryIO) -> int:
+    """Upload content to a presigned S3 URL.
+
+    File handles are streamed in `CHUNK_SIZE` pieces instead of being read into
+    memory. S3 rejects chunked transfer encoding on presigned PUTs, so the
+    Content-Length is taken from the file size.
+    """
+    if isinstance(content, (str, bytes)):
+        http_response = _request("PUT", presigned_url, content=content)
+    else:
+        start = content.tell()
+        size = os.fstat(content.fileno()).st_size - start
+        http_response = _request(
+            "PUT",
+            presigned_url,
+            content_factory=lambda: _iter_file(content, start),
+            headers={"Content-Length": str(size)},
+        )
 
     if http_response.status_code == 200:
         logging.info("Successfully uploaded content to S3")
@@ -18,62 +102,234 @@ def upload_content_to_s3(presigned_url: str, content: str) -> int:
     return http_response.status_code
 
 def download_content_from_s3(presigned_url:str):
-    with requests.Client(timeout=60) as client:
-        http_response = client.get(presigned_url)
+    http_response = _request("GET", presigned_url)
 
     if http_response.status_code == 200:
         logging.info("Successfully obtained s3 url from lambda.")
     else:
         logging.error(http_response.status_code)
         logging.error(f"Failed to Download content. HTTP Response Code: {http_response.status_code}")
-    
+
     return http_response.content
 
-def get_s3_upload_url(user_id:str="test_user", filename:str="test_file", data_file:str="Text") -> str:
-    request_url = "https://omqjp5gczd.execute-api.us-east-1.amazonaws.com/TestStage"
-    params = {
-        "user_id": user_id,
-        "token": "test_user_5124kaf",
-        "filename": filename,
-        "load_type": 'upload',
-        "data_file": data_file
-    }
+def download_file_from_s3(presigned_url: str, path: str | Path) -> int:
+    """Stream the object at a presigned S3 URL to `path` without holding it in memory."""
+    http_response = _request("GET", presigned_url, stream=True)
 
-    response = requests.get(request_url, params=params)
-    logging.info(response)
-    presigned_url = response.json()['upload_url']
-    return presigned_url
+    try:
+        if http_response.status_code == 200:
+            with open(path, "wb") as f:
+                for chunk in http_response.iter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+            logging.info(f"Successfully downloaded content to {path}")
+        else:
+            logging.error(f"Failed to Download content. HTTP Response Code: {http_response.status_code}")
+    finally:
+        http_response.close()
 
-def get_s3_download_url(user_id:str="test_user", filename:str="test_file", data_file:str="Text") -> tuple:
-    request_url = "https://omqjp5gczd.execute-api.us-east-1.amazonaws.com/TestStage"
-    params = {
+    return http_response.status_code
+
+def _url_expiry(url: str) -> float:
+    """Get the unix time a presigned URL stops working, from its signature parameters."""
+    params = parse_qs(urlparse(url).query)
+    if "X-Amz-Date" in params and "X-Amz-Expires" in params:
+        signed_at = datetime.strptime(params["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return signed_at.timestamp() + int(params["X-Amz-Expires"][0])
+    if "Expires" in params:
+        return float(params["Expires"][0])
+    return time.time() + DEFAULT_URL_TTL
+
+def _presign_params(load_type: str, user_id: str, filename: str, data_file: str) -> dict:
+    return {
         "user_id": user_id,
         "token": "test_user_5124kaf",
         "filename": filename,
-        "load_type": 'download',
+        "load_type": load_type,
         "data_file": data_file
     }
 
-    response = requests.get(request_url, params=params)
+def _cache_presigned(key: PresignKey, result: dict) -> None:
+    with _url_cache_lock:
+        _url_cache[key] = (result, _url_expiry(result["upload_url"]) - URL_EXPIRY_MARGIN)
+
+def _get_cached_presigned(key: PresignKey) -> dict | None:
+    with _url_cache_lock:
+        entry = _url_cache.get(key)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    return None
+
+def presign(load_type: str, user_id: str = "test_user", filename: str = "test_file", data_file: str = "Text", refresh: bool = False) -> dict:
+    """Get the presign endpoint's response for one object, reusing it until the URL expires.
+
+    Args:
+        load_type (str): "upload" or "download".
+        refresh (bool, optional): Ignore the cache, e.g. after S3 rejected the URL.
+
+    Returns:
+        dict: The response, holding the URL in `upload_url` (for both load types)
+            and `session_group_exists` for session-group downloads.
+    """
+    key = (load_type, user_id, filename, data_file)
+    if not refresh and (result := _get_cached_presigned(key)) is not None:
+        return result
+
+    response = _request("GET", API_URL, params=_presign_params(*key))
     logging.info(response)
-    presigned_url = response.json()['upload_url']
+    result = response.json()
+    _cache_presigned(key, result)
+    return result
+
+def presign_many(keys: list[PresignKey]) -> list[dict]:
+    """Presign several objects with as few round trips as possible.
+
+    Keys are (load_type, user_id, filename, data_file) tuples. Cached URLs are
+    reused and the rest are requested from the batch endpoint in one call:
+
+        POST {API_URL}/batch
+        {"token": ..., "requests": [{"user_id", "filename", "load_type", "data_file"}, ...]}
+        -> {"results": [<same fields as the single presign response>, ...]}
+
+    with results in request order. If the batch request fails, or returns the
+    wrong number of results, the missing URLs are requested one by one. Once
+    the endpoint answers 404 or 405 it isn't tried again.
+    """
+    global _batch_supported
+
+    results = {key: result for key in keys if (result := _get_cached_presigned(key)) is not None}
+    missing = list(dict.fromkeys(key for key in keys if key not in results))
+
+    if len(missing) > 1 and _batch_supported:
+        requests = [_presign_params(*key) for key in missing]
+        token = requests[0]["token"]
+        for request in requests:
+            del request["token"]
+
+        response = _request("POST", f"{API_URL}/batch", json={"token": token, "requests": requests})
+        if response.status_code == 200:
+            batch = response.json().get("results", [])
+            if len(batch) == len(missing):
+                for key, result in zip(missing, batch):
+                    _cache_presigned(key, result)
+                    results[key] = result
+                missing = []
+            else:
+                logging.error(f"Batch presign returned {len(batch)} results for {len(missing)} keys, presigning one by one")
+        elif response.status_code in BATCH_UNSUPPORTED_STATUS_CODES:
+            logging.info(f"Batch presign unavailable ({response.status_code}), presigning one by one")
+            _batch_supported = False
+        else:
+            logging.error(f"Batch presign failed ({response.status_code}), presigning one by one")
+
+    for key in missing:
+        results[key] = presign(*key)
+
+    return [results[key] for key in keys]
+
+def _mark_uploaded(key: PresignKey) -> None:
+    # A download presigned before the object existed still points at the right
+    # key, only its `session_group_exists` flag is out of date
+    with _url_cache_lock:
+        if (entry := _url_cache.get(key)) is not None and "session_group_exists" in entry[0]:
+            _url_cache[key] = ({**entry[0], "session_group_exists": True}, entry[1])
+
+def invalidate_presigned(load_type: str, user_id: str = "test_user", filename: str = "test_file", data_file: str = "Text") -> None:
+    with _url_cache_lock:
+        _url_cache.pop((load_type, user_id, filename, data_file), None)
+
+def clear_presigned_cache() -> None:
+    with _url_cache_lock:
+        _url_cache.clear()
+
+def get_s3_upload_url(user_id:str="test_user", filename:str="test_file", data_file:str="Text", refresh:bool=False) -> str:
+    presigned_url = presign("upload", user_id, filename, data_file, refresh)['upload_url']
+    return presigned_url
+
+def get_s3_download_url(user_id:str="test_user", filename:str="test_file", data_file:str="Text", refresh:bool=False) -> tuple:
+    result = presign("download", user_id, filename, data_file, refresh)
+    presigned_url = result['upload_url']
 
     if data_file == "session-group":
-        session_group_exists = response.json()['session_group_exists']
+        session_group_exists = result['session_group_exists']
         return (presigned_url, session_group_exists)
 
     return (presigned_url)
 
+def _upload_with_presigned(user_id: str, filename: str, data_file: str, send: Callable[[str], int]) -> int:
+    status_code = send(get_s3_upload_url(user_id, filename, data_file))
+    if status_code == 403:
+        # The cached URL may have expired early (e.g. clock skew), try once more with a fresh one
+        status_code = send(get_s3_upload_url(user_id, filename, data_file, refresh=True))
+    if status_code == 200:
+        _mark_uploaded(("download", user_id, filename, data_file))
+    return status_code
+
+def _download_url(user_id: str, filename: str, data_file: str, refresh: bool = False) -> str:
+    result = get_s3_download_url(user_id, filename, data_file, refresh)
+    # Session groups come back as (url, exists), everything else as the bare url
+    return result[0] if isinstance(result, tuple) else result
+
 
 def upload_s3(content:str, user_id:str="test_user", filename:str="test_file", data_file:str="Text"):
-    url = get_s3_upload_url(user_id, filename, data_file)
-    upload_content_to_s3(url, content)
+    return _upload_with_presigned(user_id, filename, data_file, lambda url: upload_content_to_s3(url, content))
+
+def upload_file_s3(path: str | Path, user_id:str="test_user", filename:str="test_file", data_file:str="Text") -> int:
+    """Stream a local file (e.g. a large FASTA/FASTQ) to S3."""
+    with open(path, "rb") as f:
+        def send(url):
+            f.seek(0)
+            return upload_content_to_s3(url, f)
+        return _upload_with_presigned(user_id, filename, data_file, send)
 
 def download_s3(user_id:str="test_user", filename:str="test_file", data_file:str="Text"):
-    result = get_s3_download_url(user_id, filename, data_file)
-    file_content = download_content_from_s3(result[0])
+    http_response = _request("GET", _download_url(user_id, filename, data_file))
+    if http_response.status_code == 403:
+        http_response = _request("GET", _download_url(user_id, filename, data_file, refresh=True))
+
+    if http_response.status_code != 200:
+        logging.error(f"Failed to Download content. HTTP Response Code: {http_response.status_code}")
+    file_content = http_response.content
     return file_content
 
+def get_s3_object(user_id:str="test_user", filename:str="test_file", data_file:str="Text") -> bytes | None:
+    """Download an object, or return None if it does not exist."""
+    http_response = _request("GET", _download_url(user_id, filename, data_file))
+    if http_response.status_code == 403:
+        http_response = _request("GET", _download_url(user_id, filename, data_file, refresh=True))
+
+    if http_response.status_code == 200:
+        return http_response.content
+    # Without ListBucket permission S3 answers 403 rather than 404 for missing keys
+    if http_response.status_code not in (403, 404):
+        http_response.raise_for_status()
+    return None
+
+def iter_s3_object(user_id:str="test_user", filename:str="test_file", data_file:str="Text", chunk_size:int=CHUNK_SIZE) -> Iterator[bytes] | None:
+    """Stream an object in chunks, or return None if it does not exist."""
+    http_response = _request("GET", _download_url(user_id, filename, data_file), stream=True)
+    if http_response.status_code == 403:
+        http_response.close()
+        http_response = _request("GET", _download_url(user_id, filename, data_file, refresh=True), stream=True)
+
+    if http_response.status_code != 200:
+        http_response.close()
+        if http_response.status_code not in (403, 404):
+            http_response.raise_for_status()
+        return None
+
+    def chunks():
+        try:
+            yield from http_response.iter_bytes(chunk_size)
+        finally:
+            http_response.close()
+    return chunks()
+
+def download_file_s3(path: str | Path, user_id:str="test_user", filename:str="test_file", data_file:str="Text") -> int:
+    """Stream an object from S3 to a local file."""
+    status_code = download_file_from_s3(_download_url(user_id, filename, data_file), path)
+    if status_code == 403:
+        status_code = download_file_from_s3(_download_url(user_id, filename, data_file, refresh=True), path)
+    return status_code
 
 if __name__ == "__main__":
     logging.info("Testing")
@@ -84,4 +340,4 @@ if __name__ == "__main__":
     logging.info("Doing a Download")
     download_url, *_ = get_s3_download_url(user_id="Charlie-Test")
     download_content_from_s3(download_url)
-    # download_content_from_s3()
\ No newline at end of file
+    # download_content_from_s3()
@@ -0,0 +1,128 @@
+"""Single-pass profiling of CSV files too large to load at once.
+
+`profile_csv` reads a CSV in chunks and keeps only a small, fixed amount of
+state per column: the inferred dtype, the first few distinct values and a
+HyperLogLog sketch of the distinct count.
+"""
+
+from typing import IO, Iterable
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 100_000
+SAMPLES = 5
+
+
+class HyperLogLog:
+    """Approximate distinct counter using 2**p registers (~1.04 / sqrt(2**p) relative error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Add 64-bit hashes, e.g. from `pd.util.hash_pandas_object`."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+
+        # Position of the leftmost 1 bit among the remaining 64 - p bits.
+        # The values fit in a float64 mantissa, so frexp gives their bit length.
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - self.p) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def add_series(self, series: pd.Series) -> None:
+        self.add_hashes(pd.util.hash_pandas_object(series, index=False).to_numpy())
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+def _combine_dtypes(current: np.dtype | None, new: np.dtype) -> np.dtype:
+    """Widen a column's dtype to cover a new chunk, like reading it in one go would."""
+    if current is None or current == new:
+        return new
+    if current.kind in "iuf" and new.kind in "iuf":
+        return np.result_type(current, new)
+    return np.dtype(object)
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class _ColumnProfile:
+    def __init__(self, name: str, samples: int):
+        self.name = name
+        self.samples = samples
+        self.dtype = None
+        self.values = []
+        self.seen = set()
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+
+    def update(self, series: pd.Series) -> None:
+        self.dtype = _combine_dtypes(self.dtype, series.dtype)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        self.distinct.add_series(values)
+
+        # First-k distinct values, in order of appearance
+        if len(self.values) < self.samples:
+            for value in values:
+                value = _to_python(value)
+                if value not in self.seen:
+                    self.seen.add(value)
+                    self.values.append(value)
+                    if len(self.values) == self.samples:
+                        break
+
+    def to_dict(self) -> dict:
+        return {
+            "Name": self.name,
+            "Type": str(self.dtype),
+            "possibleValues": self.values,
+            "nullCount": self.nulls,
+            "approxDistinct": self.distinct.count(),
+        }
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame], samples: int = SAMPLES) -> dict:
+    """Profile a dataframe that arrives in chunks.
+
+    Returns:
+        dict: {"rows": int, "columns": [{"Name", "Type", "possibleValues",
+            "nullCount", "approxDistinct"}, ...]}. "possibleValues" holds the
+            first `samples` distinct values of the column.
+    """
+    rows = 0
+    columns = {}
+
+    for chunk in chunks:
+        rows += len(chunk)
+        for name in chunk.columns:
+            if name not in columns:
+                columns[name] = _ColumnProfile(name, samples)
+            columns[name].update(chunk[name])
+
+    return {"rows": rows, "columns": [column.to_dict() for column in columns.values()]}
+
+
+def profile_csv(source: str | IO, chunksize: int = CHUNK_SIZE, samples: int = SAMPLES, **read_csv_kwargs) -> dict:
+    """Profile a CSV file (path or file object) reading `chunksize` rows at a time."""
+    with pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs) as reader:
+        return profile_chunks(reader, samples)
+
+
+def profile_dataframe(df: pd.DataFrame, chunksize: int = CHUNK_SIZE, samples: int = SAMPLES) -> dict:
+    """Profile a dataframe that is already in memory, `chunksize` rows at a time."""
+    return profile_chunks((df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize)), samples)
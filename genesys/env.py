@@ -1,7 +1,12 @@
 import os
+from pathlib import Path
+
 import streamlit as st
 from dotenv import load_dotenv as _load_dotenv
 
+# Local on-disk caches (assistant IDs, API responses, converted uploads, ...).
+CACHE_DIR = Path(os.getenv("GENESYS_CACHE_DIR", "cache"))
+
 def load_dotenv():
     """This will load environment variables from `.env`.
 
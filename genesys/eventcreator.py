@@ -1,9 +1,16 @@
 # Internal Python Modules
+import codecs
+import gzip
+import itertools
 import json
+import zlib
 from time import time
 import logging
 import os
-from typing import Dict
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
 
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
 
@@ -11,7 +18,29 @@ logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=lo
 import pandas as pd
 
 # Library Modules
-import genesys.client as client
+from genesys.csvprofile import profile_csv, profile_dataframe
+from genesys.env import CACHE_DIR
+from genesys.storage import S3Storage, Storage, get_storage
+
+# Sessions are stored as an append-only log under this data file: an index
+# with one line per session, and per session numbered JSONL segments of
+# events plus a periodic snapshot.
+SESSION_LOG = "session-log"
+INDEX_FILE = "index.jsonl"
+COMPACT_EVERY = 20
+PRESIGN_AHEAD = 8
+
+# Set to "gzip" to compress new log objects. Readers detect compressed
+# objects by their magic bytes, so the setting can change at any time.
+SESSION_COMPRESSION = os.getenv("GENESYS_SESSION_COMPRESSION", "none")
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Events are buffered and written as one segment once this many are pending,
+# FLUSH_INTERVAL seconds after the first pending one, or when the session ends.
+# Until then they are kept in a write-ahead file under WAL_DIR.
+FLUSH_EVENTS = 16
+FLUSH_INTERVAL = 5.0
+WAL_DIR = CACHE_DIR / "session-wal"
 
 def create_session(session_id: str, user_id) -> dict:
     """
@@ -26,83 +55,54 @@ def create_session(session_id: str, user_id) -> dict:
     
     new_session = {
         "sessionId": session_id,
-        "sessionData": []
+        "sessionData": [],
+        "loggedEvents": 0,
+        "segments": 0
     }
-    session_group = "session-group"
-
-    result = client.get_s3_download_url(user_id=user_id, data_file=session_group)
-    session_group_exists = result[1]
-    print("Session Group Exists:", session_group_exists)
-
-    if not session_group_exists:
-        json_list = []
-        json_list.append(new_session)
-        json_data = json.dumps(json_list)
-    else:
-        logging.info("Session Group Exists")
-        logging.info("Downloading Old Session Group")
-        content = str(client.download_s3(user_id, data_file=session_group))
-        content = content[2:][:-1]
-        logging.info("Loading old session group as json")
-        json_data = json.loads(content)
-        logging.info('Creating Session Data')
-        json_data.append(new_session)
-        json_data = json.dumps(json_data)
-    logging.info("Uploading Session Data to S3")
-    client.upload_s3(content=json_data, user_id=user_id, data_file=session_group)
-    
+
+    logging.info("Adding session to the session index")
+    index = read_session_index(user_id)
+    if session_id not in {entry["sessionId"] for entry in index}:
+        index.append({"sessionId": session_id, "uTime": str(int(time()))})
+        _write_log_object(user_id, INDEX_FILE, _to_jsonl(index))
+
     return new_session
 
-def create_csv_metadata(df: pd.DataFrame) -> dict:
+def create_csv_metadata(df: pd.DataFrame | None = None, csv_source=None, samples: int = 5) -> dict:
     """
-    Obtain metadata from a CSV file.
+    Obtain metadata from a dataframe or, without loading it, from a CSV file.
 
     Args:
-        csv_path (str): Path to the CSV file.
-        sample_values_count (int, optional): Number of unique sample values to return for each column. 
-                                             Defaults to 5.
+        df (pd.DataFrame, optional): Dataframe that is already in memory.
+        csv_source (str | file object, optional): CSV file to profile in chunks instead.
+        samples (int, optional): Number of unique sample values to return for each column.
+                                 Defaults to 5.
 
     Returns:
-        dict: Metadata containing column names, data types, and possible values.
+        dict: Metadata containing the row count and the column names, data types,
+            possible values, null counts and approximate distinct counts.
     """
-    samples = 5 
-     
-    metadata = {
-        "columns": []
-    }
-
-    for column in df.columns:
-            col_data = {
-                "Name": column,
-                "Type": str(df[column].dtype)
-            }
-            unique_values = df[column].dropna().unique()
+    if df is not None:
+        return profile_dataframe(df, samples=samples)
+    return profile_csv(csv_source, samples=samples)
 
-            if len(unique_values) < samples:
-                col_data["possibleValues"] = unique_values.tolist()
-            else:
-                col_data["possibleValues"] = unique_values[:samples].tolist()
-
-            metadata["columns"].append(col_data)
-
-    return metadata
 
-
-def create_csv_event(user_id:str, session: dict, filename: str, df: pd.DataFrame) -> None:
+def create_csv_event(user_id:str, session: dict, filename: str, df: pd.DataFrame | None = None, metadata: dict | None = None) -> None:
     """
     Add a CSV event to the session data.
 
     Args:
         session (dict): The session to which the CSV event should be added.
         filename (str): The filename of the CSV file.
-        unix_time (str): The unix timestamp associated with the event.
-        metadata (dict): The metadata for the CSV, including column details.
+        df (pd.DataFrame, optional): The CSV's dataframe, profiled if no metadata is given.
+        metadata (dict, optional): The metadata for the CSV, see `create_csv_metadata`.
 
     Returns:
         None: The function updates the session in-place.
     """
     
-    metadata = create_csv_metadata(df)
+    if metadata is None:
+        metadata = create_csv_metadata(df)
 
     unix_time = str(int(time()))
 
@@ -115,9 +115,7 @@ def create_csv_event(user_id:str, session: dict, filename: str, df: pd.DataFrame
         }
     }
 
-    session["sessionData"].append(csv_event)
-
-    update_session(user_id, session)
+    record_event(user_id, session, csv_event)
 
 
 def create_message_event(user_id:str, session: dict, message:str) -> None:
@@ -143,9 +141,7 @@ def create_message_event(user_id:str, session: dict, message:str) -> None:
         }
     }
 
-    session["sessionData"].append(message_event)
-
-    update_session(user_id, session)
+    record_event(user_id, session, message_event)
 
 def create_response_event(user_id:str, session: dict, response: str, type:str="text", language:str="None") -> None:
     """
@@ -171,9 +167,7 @@ def create_response_event(user_id:str, session: dict, response: str, type:str="t
         }
     }
 
-    session["sessionData"].append(response_event)
-
-    update_session(user_id, session)
+    record_event(user_id, session, response_event)
 
 def display_csv_event(user_id:str, session: dict, filename: str):
     unix_time = str(int(time()))
@@ -185,9 +179,7 @@ def display_csv_event(user_id:str, session: dict, filename: str):
             "uTime": unix_time
         }
     }
-    session["sessionData"].append(csv_event)
-
-    update_session(user_id, session)
+    record_event(user_id, session, csv_event)
 
 
 
@@ -215,9 +207,7 @@ def create_pdb_event(user_id:str, session: dict, filename: str, action: str) ->
         }
     }
 
-    session["sessionData"].append(pdb_event)
-
-    update_session(user_id, session)
+    record_event(user_id, session, pdb_event)
 
 def create_fasta_event(user_id:str, session:dict, filename:str, action:str) -> None:
     """
@@ -244,40 +234,357 @@ def create_fasta_event(user_id:str, session:dict, filename:str, action:str) -> N
             "action": action
         }
     }
-    session["sessionData"].append(fasta_event)
+    record_event(user_id, session, fasta_event)
+
+
+class SessionWriter:
+    """
+    Buffers a session's events and writes them to the log in batches.
+
+    Every event is first appended to a local write-ahead file, so events that
+    were not flushed yet survive a crash and are written by `recover_sessions`.
+    """
 
-    update_session(user_id, session)
+    def __init__(self, user_id: str, session: dict, wal_dir: Path | None = None,
+                 max_events: int | None = None, interval: float | None = None):
+        self.user_id = user_id
+        self.session = session
+        self.max_events = max_events or FLUSH_EVENTS
+        self.interval = interval or FLUSH_INTERVAL
+        self.lock = threading.RLock()
+        self.timer = None
+
+        self.wal_path = Path(wal_dir or WAL_DIR) / user_id / f"{session['sessionId']}.jsonl"
+        self.wal_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def pending(self) -> int:
+        return len(self.session["sessionData"]) - self.session.get("loggedEvents", 0)
+
+    def append(self, event: dict) -> None:
+        with self.lock:
+            seq = len(self.session["sessionData"])
+            with open(self.wal_path, "a") as f:
+                f.write(json.dumps({"seq": seq, "event": event}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.session["sessionData"].append(event)
+
+            if self.pending() >= self.max_events:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        """Write every pending event as a single segment."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending() == 0:
+                return
+            try:
+                update_session(self.user_id, self.session)
+            except Exception as e:
+                # The events stay pending and in the write-ahead file
+                logging.error(f"Failed to write session {self.session['sessionId']}: {e}")
+                return
+            self.wal_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.flush()
+
+
+_writers: dict = {}
+_writers_lock = threading.Lock()
+
+def get_session_writer(user_id: str, session: dict) -> SessionWriter:
+    key = (user_id, session["sessionId"])
+    with _writers_lock:
+        if key not in _writers or _writers[key].session is not session:
+            _writers[key] = SessionWriter(user_id, session)
+        return _writers[key]
+
+def record_event(user_id: str, session: dict, event: dict) -> None:
+    """Add an event to the session, to be written with the next batch."""
+    get_session_writer(user_id, session).append(event)
+
+def flush_session(user_id: str, session: dict) -> None:
+    """Write the session's pending events now, e.g. at the end of a chat turn."""
+    get_session_writer(user_id, session).flush()
+
+def end_session(user_id: str, session: dict) -> None:
+    with _writers_lock:
+        writer = _writers.pop((user_id, session["sessionId"]), None)
+    if writer is not None:
+        writer.close()
+
+def recover_sessions(user_id: str, wal_dir: Path | None = None) -> list:
+    """
+    Write events left in write-ahead files by a previous process.
+
+    Returns:
+        list: IDs of the sessions that had unwritten events.
+    """
+    recovered = []
+    for wal_path in sorted((Path(wal_dir or WAL_DIR) / user_id).glob("*.jsonl")):
+        session = get_session(user_id, wal_path.stem)
+        with open(wal_path, "r") as f:
+            # A torn last line means the event was never acknowledged
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        # Events at or past `loggedEvents` were not written before the crash
+        for entry in entries:
+            if entry["seq"] >= session["loggedEvents"]:
+                session["sessionData"].append(entry["event"])
+
+        if len(session["sessionData"]) > session["loggedEvents"]:
+            update_session(user_id, session)
+            recovered.append(session["sessionId"])
+        wal_path.unlink()
+    return recovered
+
+def _to_jsonl(records: list) -> bytes:
+    content = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+    if SESSION_COMPRESSION == "gzip":
+        content = gzip.compress(content, mtime=0)
+    return content
+
+def _decompress(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Transparently gunzip compressed objects, so old and new logs can be mixed."""
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    if not first.startswith(GZIP_MAGIC):
+        yield first
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(wbits=31)
+    for chunk in itertools.chain([first], chunks):
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+def iter_jsonl(chunks: Iterable[bytes]) -> Iterator:
+    """Decode JSON lines from a stream of (possibly gzipped) byte chunks."""
+    buffer = b""
+    for chunk in _decompress(chunks):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+# Scanning one element of a JSON array: runs of string characters (with
+# escapes), runs of anything but strings and brackets, and the end of a
+# number or literal
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_OUTSIDE_STRINGS = re.compile(r'[^"\[\]{}]*')
+_SCALAR_END = re.compile(r'[\s,\]]')
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Decode the elements of a top-level JSON array one at a time from a stream
+    of byte chunks, without holding the whole document in memory.
 
+    Each chunk is scanned once for string and bracket boundaries, and an
+    element is decoded once it is complete, so large elements spread over
+    many chunks cost linear time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    texts = itertools.chain(
+        (text_decoder.decode(chunk) for chunk in _decompress(chunks)),
+        [text_decoder.decode(b"", final=True)],
+    )
+    started = False
+    parts = None  # Text of the element being read, None between elements
+    depth = 0
+    in_string = escaped = scalar = False
+
+    for text in texts:
+        position = 0
+        start = 0
+        while position < len(text):
+            if parts is None:
+                # Skip whitespace and the array punctuation between elements
+                char = text[position]
+                if char in " \t\r\n,":
+                    position += 1
+                    continue
+                if not started:
+                    if char != "[":
+                        raise ValueError("Expected a JSON array")
+                    started = True
+                    position += 1
+                    continue
+                if char == "]":
+                    return
+                parts = []
+                start = position
+                depth = 0
+                scalar = char not in '[{"'
+
+            if escaped:
+                position += 1
+                escaped = False
+                continue
+            if in_string:
+                position = _STRING_BODY.match(text, position).end()
+                if position == len(text):
+                    continue
+                if text[position] == "\\":
+                    # A backslash at the end of the chunk escapes the next one's first character
+                    escaped = True
+                    position += 1
+                    continue
+                position += 1
+                in_string = False
+                if depth > 0:
+                    continue
+            elif scalar:
+                end = _SCALAR_END.search(text, position)
+                if end is None:
+                    position = len(text)
+                    continue
+                position = end.start()
+            else:
+                position = _OUTSIDE_STRINGS.match(text, position).end()
+                if position == len(text):
+                    continue
+                char = text[position]
+                position += 1
+                if char == '"':
+                    in_string = True
+                    continue
+                depth += 1 if char in "[{" else -1
+                if depth > 0:
+                    continue
+
+            # The element is complete
+            parts.append(text[start:position])
+            yield decoder.decode("".join(parts))
+            parts = None
+
+        if parts is not None:
+            parts.append(text[start:])
+
+    if not started:
+        raise ValueError("Expected a JSON array")
+    raise ValueError("Unterminated JSON array")
+
+def _segment_file(session_id: str, segment: int) -> str:
+    return f"{session_id}-{segment:06d}.jsonl"
+
+def _snapshot_file(session_id: str) -> str:
+    return f"{session_id}-snapshot.jsonl"
+
+def _read_log_records(user_id: str, filename: str) -> Iterator | None:
+    chunks = get_storage().iter_chunks(user_id, SESSION_LOG, filename)
+    return None if chunks is None else iter_jsonl(chunks)
+
+def _write_log_object(user_id: str, filename: str, content: bytes) -> None:
+    get_storage().put(user_id, SESSION_LOG, filename, content)
+
+def _presign_segments(user_id: str, session_id: str, first: int) -> None:
+    # Segment names are known in advance, so S3 can presign the next few in one request
+    get_storage().prepare_puts(user_id, SESSION_LOG, [
+        _segment_file(session_id, segment) for segment in range(first, first + PRESIGN_AHEAD)
+    ])
 
 def update_session(user_id:str, updated_session:dict):
-    session_group = "session-group"
+    """
+    Append the session's new events to its log.
+
+    Events added since the last call are written as one new segment, so the
+    cost does not grow with the session history. Every `COMPACT_EVERY`
+    segments, the whole session is written to a snapshot that readers start
+    from instead of replaying every segment.
+    """
     session_id = updated_session['sessionId']
+    logged = updated_session.get("loggedEvents", 0)
+    events = updated_session["sessionData"][logged:]
+    if not events:
+        return
 
-    json_list = get_session_group(user_id)
-    old_session = get_session_dict(session_id, json_list)
-    json_list.remove(old_session)
-    json_list.append(updated_session)
-    json_data = json.dumps(json_list)
-    client.upload_s3(content=json_data, user_id=user_id, data_file=session_group)
+    segment = updated_session.get("segments", 0)
+    if segment % PRESIGN_AHEAD == 0:
+        _presign_segments(user_id, session_id, segment)
+
+    _write_log_object(user_id, _segment_file(session_id, segment), _to_jsonl(events))
+    updated_session["loggedEvents"] = logged + len(events)
+    updated_session["segments"] = segment + 1
+
+    if updated_session["segments"] % COMPACT_EVERY == 0:
+        compact_session(user_id, updated_session)
+
+def compact_session(user_id:str, session:dict) -> None:
+    """Write a snapshot of every event logged so far."""
+    header = {"sessionId": session["sessionId"], "segments": session["segments"]}
+    events = session["sessionData"][:session["loggedEvents"]]
+    _write_log_object(user_id, _snapshot_file(session["sessionId"]), _to_jsonl([header, *events]))
+
+def get_session(user_id:str, session_id:str) -> dict:
+    """Rebuild a session from its latest snapshot and the segments written after it."""
+    session = {"sessionId": session_id, "sessionData": [], "loggedEvents": 0, "segments": 0}
+
+    if (snapshot := _read_log_records(user_id, _snapshot_file(session_id))) is not None:
+        header = next(snapshot)
+        session["sessionData"].extend(snapshot)
+        session["segments"] = header["segments"]
+
+    # Segments are numbered consecutively, the first missing one ends the log
+    while (segment := _read_log_records(user_id, _segment_file(session_id, session["segments"]))) is not None:
+        session["sessionData"].extend(segment)
+        session["segments"] += 1
+
+    session["loggedEvents"] = len(session["sessionData"])
+    return session
 
 def get_session_dict(session_id:str, json_list:list) -> dict:
     for sesh in json_list:
         if sesh['sessionId'] == session_id:
             return sesh
     return {}  # Return an empty dictionary if no matching session is found
+
+def read_session_index(user_id:str) -> list:
+    """Get the {"sessionId", "uTime"} entries of every session, oldest first."""
+    records = _read_log_records(user_id, INDEX_FILE)
+    return list(records) if records is not None else []
+
+def iter_session_group(user_id:str) -> Iterator[dict]:
+    """Load the user's sessions one at a time, oldest first."""
+    for session_id in list_session_ids(user_id):
+        yield get_session(user_id, session_id)
         
 def get_session_group(user_id:str) -> list:
-    session_group = "session-group"
-    content = str(client.download_s3(user_id, data_file=session_group))[2:][:-1]
-    json_list = json.loads(content)
-    return json_list
+    return list(iter_session_group(user_id))
         
 def list_session_ids(user_id:str) -> list:
-    json_list = get_session_group(user_id)
-    session_ids = []
-    for sesh in json_list:
-        session_ids.append(sesh['sessionId'])
-    return session_ids
+    return [entry['sessionId'] for entry in read_session_index(user_id)]
+
+def migrate_session_group(user_id:str, source:Storage | None = None) -> None:
+    """Move sessions from the old single-object session group (in S3 by default) into the log."""
+    chunks = (source or S3Storage()).iter_chunks(user_id, "session-group", "test_file")
+    if chunks is None:
+        return
+
+    index = read_session_index(user_id)
+    known = {entry["sessionId"] for entry in index}
+    for sesh in iter_json_array(chunks):
+        if sesh["sessionId"] in known:
+            continue
+        session = {**sesh, "loggedEvents": len(sesh["sessionData"]), "segments": 0}
+        compact_session(user_id, session)
+        index.append({"sessionId": sesh["sessionId"], "uTime": str(int(time()))})
+
+    _write_log_object(user_id, INDEX_FILE, _to_jsonl(index))
     
 if __name__ == "__main__":
     session_id = "Test-Session"
@@ -0,0 +1,72 @@
+"""Import-time profiling for the Streamlit app's startup path.
+
+Run `python -m genesys.profiling` to print how long the modules imported before
+the first paint of `app.py` take to load, and which of their dependencies
+dominate. Pass module names to profile something else, e.g.
+`python -m genesys.profiling genesys.ai`.
+"""
+
+import subprocess
+import sys
+from typing import TypedDict
+
+# Modules `app.py` imports before it renders anything.
+STARTUP_MODULES = ["streamlit", "genesys.env"]
+
+
+class ImportTiming(TypedDict):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse the stderr of `python -X importtime`."""
+    timings = []
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append({
+            "module": name.strip(),
+            "depth": (len(name.rstrip()) - len(name.strip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+
+    return timings
+
+
+def profile_imports(modules: list[str]) -> list[ImportTiming]:
+    """Import `modules` in a fresh interpreter and return the import timings."""
+    statements = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statements],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def format_report(timings: list[ImportTiming], modules: list[str], top: int = 20) -> str:
+    by_name = {t["module"]: t for t in timings if t["depth"] == 0}
+    total_us = sum(t["cumulative_us"] for t in by_name.values())
+
+    lines = [f"Total import time: {total_us / 1e6:.3f}s", ""]
+    for module in modules:
+        if (timing := by_name.get(module)) is not None:
+            lines.append(f"{timing['cumulative_us'] / 1e6:8.3f}s  {module}")
+
+    lines += ["", f"Slowest {top} imports (cumulative):"]
+    for timing in sorted(timings, key=lambda t: t["cumulative_us"], reverse=True)[:top]:
+        lines.append(f"{timing['cumulative_us'] / 1e6:8.3f}s  {'  ' * timing['depth']}{timing['module']}")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or STARTUP_MODULES
+    print(format_report(profile_imports(modules), modules))
@@ -0,0 +1,226 @@
+"""Neighbour search over atom coordinates.
+
+`CellList` bins atoms into cubic cells, so finding the atoms within a radius
+of a point only looks at the surrounding cells. Queries are vectorised and
+processed in batches, which keeps memory bounded for assemblies with
+hundreds of thousands of atoms.
+"""
+
+import itertools
+import threading
+import weakref
+
+import numpy as np
+
+from .structure import Structure
+
+# Edge of a cell in Angstrom. Radii up to this size only visit the 27
+# surrounding cells; larger ones visit more.
+CELL_SIZE = 5.0
+
+# Query points handled per batch, bounding the candidate pairs held at once.
+BATCH_SIZE = 8192
+
+
+class CellList:
+    """Spatial index over a fixed set of coordinates.
+
+    Args:
+        coords (np.ndarray): (N, 3) coordinates.
+        cell_size (float): Edge of a cell in Angstrom.
+        ids (np.ndarray, optional): What queries report for each point, e.g.
+            atom indices into a larger structure. Defaults to the positions in
+            `coords`.
+    """
+
+    def __init__(self, coords: np.ndarray, cell_size: float = CELL_SIZE, ids: np.ndarray | None = None):
+        self.coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+        self.cell_size = cell_size
+        self.origin = self.coords.min(axis=0) if len(self.coords) else np.zeros(3, dtype=np.float32)
+
+        cells = self._cells(self.coords)
+        self.shape = cells.max(axis=0) + 1 if len(cells) else np.ones(3, dtype=np.int64)
+        keys = self._keys(cells)
+
+        # Atoms sorted by cell; each occupied cell is a contiguous run. The
+        # sorted coordinates are kept per axis so candidate lookups read
+        # neighbouring memory.
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_coords = np.ascontiguousarray(self.coords[self.order].T)
+        self.sorted_keys = keys[self.order]
+        self.sorted_ids = self.order if ids is None else np.asarray(ids)[self.order]
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            self.sorted_keys, return_index=True, return_counts=True
+        )
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * self.shape[1] + cells[:, 1]) * self.shape[2] + cells[:, 2]
+
+    def _candidates(self, cells: np.ndarray, offsets) -> tuple[np.ndarray, np.ndarray]:
+        # (query, sorted atom) pairs for every atom in the cells at `offsets`
+        # from each query point's cell
+        queries = []
+        atoms = []
+        for offset in offsets:
+            neighbour = cells + offset
+            inside = np.all((neighbour >= 0) & (neighbour < self.shape), axis=1)
+            query = np.flatnonzero(inside)
+            keys = self._keys(neighbour[query])
+
+            slot = np.searchsorted(self.cell_keys, keys)
+            slot[slot == len(self.cell_keys)] = 0
+            occupied = self.cell_keys[slot] == keys
+            query, slot = query[occupied], slot[occupied]
+            if len(query) == 0:
+                continue
+
+            # Expand each (query, cell) into one pair per atom of the cell
+            counts = self.cell_counts[slot]
+            starts = np.repeat(self.cell_starts[slot] - np.cumsum(counts) + counts, counts)
+            queries.append(np.repeat(query, counts))
+            atoms.append(starts + np.arange(counts.sum()))
+
+        if not queries:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(queries), np.concatenate(atoms)
+
+    def _search(self, points: np.ndarray, radius: float, half: bool = False):
+        # Yields (point index, sorted atom index) arrays of close pairs, one
+        # batch at a time. Points are visited in cell order for locality.
+        reach = max(1, int(np.ceil(radius / self.cell_size)))
+        offsets = list(itertools.product(range(-reach, reach + 1), repeat=3))
+        if half:
+            # Each pair of distinct cells is visited from one side only
+            offsets = [offset for offset in offsets if offset >= (0, 0, 0)]
+
+        cells = self._cells(points)
+        visit = np.argsort(self._keys(cells), kind="stable")
+        # Fewer points per batch when each one visits more cells
+        batch = max(1, BATCH_SIZE // reach ** 3)
+        cutoff = np.float32(radius) ** 2
+
+        for start in range(0, len(points), batch):
+            chunk = visit[start:start + batch]
+            query, atom = self._candidates(cells[chunk], offsets)
+            query = chunk[query]
+
+            distance = np.zeros(len(query), dtype=np.float32)
+            for axis in range(3):
+                delta = points[query, axis] - self.sorted_coords[axis, atom]
+                distance += delta * delta
+            close = distance <= cutoff
+            yield query[close], atom[close]
+
+    def query_pairs(self, points: np.ndarray, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Find every (point, atom) pair closer than `radius`.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Indices into `points` and the ids
+                of the indexed points, in no particular order.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        if len(points) == 0 or len(self) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        found = list(self._search(points, radius))
+        return (
+            np.concatenate([query for query, _ in found]),
+            self.sorted_ids[np.concatenate([atom for _, atom in found])],
+        )
+
+    def within(self, points: np.ndarray, radius: float) -> np.ndarray:
+        """Ids of the indexed points closer than `radius` to any of `points`, ascending."""
+        return np.unique(self.query_pairs(points, radius)[1])
+
+    def pairs(self, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Every pair of ids (i, j) with i < j of indexed points closer than `radius`, in no particular order."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        # Query with the atoms themselves, in sorted order, over half the
+        # neighbouring cells
+        found_i = []
+        found_j = []
+        sorted_points = np.ascontiguousarray(self.sorted_coords.T)
+        for query, atom in self._search(sorted_points, radius, half=True):
+            # Within one cell both (a, b) and (b, a) are found, as well as (a, a)
+            keep = (query < atom) | (self.sorted_keys[query] != self.sorted_keys[atom])
+            found_i.append(self.sorted_ids[query[keep]])
+            found_j.append(self.sorted_ids[atom[keep]])
+
+        i = np.concatenate(found_i)
+        j = np.concatenate(found_j)
+        return np.minimum(i, j), np.maximum(i, j)
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+def spatial_index(structure: Structure, atom_names: tuple[str, ...] | None = None) -> CellList:
+    """Get an index over the atoms of a structure, built once per structure object.
+
+    `genesys.structure.load_structure` hands out the same object for the same
+    file, so tools asking about one upload share its indexes.
+
+    Args:
+        structure (Structure): The structure.
+        atom_names (tuple[str, ...], optional): Only index polymer atoms with
+            these names, e.g. ("CA",), which leaves out calcium ions named
+            CA. All atoms if None.
+
+    Returns:
+        CellList: Reports atom indices into `structure`.
+    """
+    with _indexes_lock:
+        indexes = _indexes.setdefault(structure, {})
+        if (index := indexes.get(atom_names)) is None:
+            if atom_names is None:
+                index = CellList(structure.coords)
+            else:
+                atoms = np.flatnonzero(np.isin(structure.atom_name, atom_names) & ~structure.hetatm)
+                index = CellList(structure.coords[atoms], ids=atoms)
+            indexes[atom_names] = index
+    return index
+
+
+def residue_pairs(structure: Structure, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Turn atom pairs into unique residue pairs (see `Structure.residue_index`).
+
+    Returns:
+        np.ndarray: (n, 2) residue indices, lower index first, sorted. Pairs of
+            atoms in the same residue are dropped.
+    """
+    residue = structure.residue_index
+    a, b = residue[i], residue[j]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    n = len(structure.residue_starts)
+    keys = np.unique((a * n + b)[a != b])
+    return np.stack([keys // n, keys % n], axis=1)
+
+
+def contact_map(structure: Structure, cutoff: float = 8.0, atom_names: tuple[str, ...] | None = ("CA",)) -> np.ndarray:
+    """Residue pairs with polymer atoms named `atom_names` (any atom if None) within `cutoff` Angstrom.
+
+    Returns:
+        np.ndarray: (n, 2) residue indices, as returned by `residue_pairs`.
+    """
+    return residue_pairs(structure, *spatial_index(structure, atom_names).pairs(cutoff))
+
+
+def neighbours(structure: Structure, query: np.ndarray, target: np.ndarray, cutoff: float) -> tuple[np.ndarray, np.ndarray]:
+    """Atoms of `target` within `cutoff` Angstrom of atoms of `query` (both boolean masks).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Indices of the query atoms and of the
+            target atoms that have a partner in the other set, ascending.
+    """
+    query_atoms = np.flatnonzero(query)
+    i, j = spatial_index(structure).query_pairs(structure.coords[query_atoms], cutoff)
+    close = target[j]
+    return np.unique(query_atoms[i[close]]), np.unique(j[close])
@@ -0,0 +1,198 @@
+"""Where uploads and sessions are stored.
+
+Objects are addressed like the S3 bucket behind `genesys.client`: by user,
+data file (the kind of object, e.g. "FASTA" or "session-log") and filename.
+`get_storage()` picks the backend from the `GENESYS_STORAGE` environment
+variable:
+
+- "local" (default): files under `STORAGE_DIR`, no network access at all.
+- "s3": the presigned-URL S3 API only.
+- "local+s3": local files, mirrored to S3. Reads stay local and only fall
+  back to S3 for objects this machine has not seen.
+"""
+
+import abc
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from .env import CACHE_DIR
+
+STORAGE_DIR = CACHE_DIR / "storage"
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+class Storage(abc.ABC):
+    """Interface of a storage backend. Backends implement `get` and `put`."""
+
+    @abc.abstractmethod
+    def get(self, user_id: str, data_file: str, filename: str) -> bytes | None:
+        """Get an object's content, or None if it does not exist."""
+
+    def iter_chunks(self, user_id: str, data_file: str, filename: str) -> Iterator[bytes] | None:
+        """Like `get`, but yields the content in chunks where the backend can stream it."""
+        content = self.get(user_id, data_file, filename)
+        return None if content is None else iter([content])
+
+    @abc.abstractmethod
+    def put(self, user_id: str, data_file: str, filename: str, content: str | bytes) -> None:
+        """Create or replace an object. Raises `StorageError` if it could not be written."""
+
+    def put_file(self, user_id: str, data_file: str, filename: str, path: Path | str) -> None:
+        """Like `put`, with the content read from a local file."""
+        self.put(user_id, data_file, filename, Path(path).read_bytes())
+
+    def prepare_puts(self, user_id: str, data_file: str, filenames: list[str]) -> None:
+        """Hint that these objects will be written soon."""
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path | str | None = None):
+        self.root = Path(root or STORAGE_DIR)
+
+    def path(self, user_id: str, data_file: str, filename: str) -> Path:
+        path = self.root / user_id / data_file / filename
+        if not path.resolve().is_relative_to(self.root.resolve()):
+            raise StorageError(f"Invalid object name: {user_id}/{data_file}/{filename}")
+        return path
+
+    def get(self, user_id: str, data_file: str, filename: str) -> bytes | None:
+        try:
+            return self.path(user_id, data_file, filename).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def iter_chunks(self, user_id: str, data_file: str, filename: str) -> Iterator[bytes] | None:
+        try:
+            f = open(self.path(user_id, data_file, filename), "rb")
+        except FileNotFoundError:
+            return None
+
+        def chunks():
+            with f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+        return chunks()
+
+    def _replace(self, path: Path, write) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            raise StorageError(f"Failed to write {path}: {e}") from e
+
+    def put(self, user_id: str, data_file: str, filename: str, content: str | bytes) -> None:
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self._replace(self.path(user_id, data_file, filename), lambda tmp_path: tmp_path.write_bytes(content))
+
+    def put_file(self, user_id: str, data_file: str, filename: str, path: Path | str) -> None:
+        self._replace(self.path(user_id, data_file, filename), lambda tmp_path: shutil.copyfile(path, tmp_path))
+
+
+class S3Storage(Storage):
+    def get(self, user_id: str, data_file: str, filename: str) -> bytes | None:
+        from . import client
+        return client.get_s3_object(user_id, filename, data_file)
+
+    def iter_chunks(self, user_id: str, data_file: str, filename: str) -> Iterator[bytes] | None:
+        from . import client
+        return client.iter_s3_object(user_id, filename, data_file, CHUNK_SIZE)
+
+    def put(self, user_id: str, data_file: str, filename: str, content: str | bytes) -> None:
+        from . import client
+        status_code = client.upload_s3(content, user_id, filename, data_file)
+        if status_code != 200:
+            raise StorageError(f"Failed to upload {filename}. HTTP Response Code: {status_code}")
+
+    def put_file(self, user_id: str, data_file: str, filename: str, path: Path | str) -> None:
+        from . import client
+        status_code = client.upload_file_s3(path, user_id, filename, data_file)
+        if status_code != 200:
+            raise StorageError(f"Failed to upload {filename}. HTTP Response Code: {status_code}")
+
+    def prepare_puts(self, user_id: str, data_file: str, filenames: list[str]) -> None:
+        from . import client
+        # One presign round trip for all of them
+        client.presign_many([("upload", user_id, filename, data_file) for filename in filenames])
+
+
+class MirroredStorage(Storage):
+    """Keeps every object locally and mirrors writes to a remote backend.
+
+    The local copy is the source of truth: a failed remote write is logged,
+    not raised. Objects missing remotely are remembered, so probing for them
+    again (e.g. the end of a session log) stays local.
+    """
+
+    def __init__(self, local: Storage, remote: Storage):
+        self.local = local
+        self.remote = remote
+        self.missing = set()
+
+    def get(self, user_id: str, data_file: str, filename: str) -> bytes | None:
+        key = (user_id, data_file, filename)
+        if (content := self.local.get(*key)) is not None or key in self.missing:
+            return content
+        if (content := self.remote.get(*key)) is not None:
+            self.local.put(*key, content)
+        else:
+            self.missing.add(key)
+        return content
+
+    def iter_chunks(self, user_id: str, data_file: str, filename: str) -> Iterator[bytes] | None:
+        if (chunks := self.local.iter_chunks(user_id, data_file, filename)) is not None:
+            return chunks
+        # Fetched objects are copied to disk whole, so go through `get`
+        return super().iter_chunks(user_id, data_file, filename)
+
+    def _mirror(self, method: str, *args) -> None:
+        try:
+            getattr(self.remote, method)(*args)
+        except Exception as e:
+            logging.error(f"Failed to mirror {args[:3]} to remote storage: {e}")
+
+    def put(self, user_id: str, data_file: str, filename: str, content: str | bytes) -> None:
+        self.local.put(user_id, data_file, filename, content)
+        self.missing.discard((user_id, data_file, filename))
+        self._mirror("put", user_id, data_file, filename, content)
+
+    def put_file(self, user_id: str, data_file: str, filename: str, path: Path | str) -> None:
+        self.local.put_file(user_id, data_file, filename, path)
+        self.missing.discard((user_id, data_file, filename))
+        self._mirror("put_file", user_id, data_file, filename, path)
+
+    def prepare_puts(self, user_id: str, data_file: str, filenames: list[str]) -> None:
+        self._mirror("prepare_puts", user_id, data_file, filenames)
+
+
+def create_storage(kind: str) -> Storage:
+    if kind == "local":
+        return LocalStorage()
+    if kind == "s3":
+        return S3Storage()
+    if kind == "local+s3":
+        return MirroredStorage(LocalStorage(), S3Storage())
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+_default_storage = None
+_default_storage_lock = threading.Lock()
+
+def get_storage() -> Storage:
+    """Get the process-wide storage backend selected by `GENESYS_STORAGE`."""
+    global _default_storage
+    with _default_storage_lock:
+        if _default_storage is None:
+            _default_storage = create_storage(os.getenv("GENESYS_STORAGE", "local"))
+    return _default_storage
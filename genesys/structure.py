@@ -0,0 +1,440 @@
+"""NumPy-backed loading of macromolecular structures (PDB and mmCIF).
+
+A `Structure` keeps the coordinates as an N x 3 float32 array and every other
+per-atom field as its own NumPy array, so structures with hundreds of
+thousands of atoms can be filtered and measured without Python loops.
+"""
+
+import gzip
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Iterable
+
+import numpy as np
+from Bio.Data.IUPACData import protein_letters_3to1_extended
+
+PDB_LINE_LENGTH = 80
+
+# Columns of the fixed-width PDB ATOM/HETATM record, as [start, end) offsets.
+_PDB_FIELDS = {
+    "record": (0, 6),
+    "serial": (6, 11),
+    "atom_name": (12, 16),
+    "alt_loc": (16, 17),
+    "res_name": (17, 20),
+    "chain_id": (21, 22),
+    "res_seq": (22, 26),
+    "ins_code": (26, 27),
+    "x": (30, 38),
+    "y": (38, 46),
+    "z": (46, 54),
+    "occupancy": (54, 60),
+    "b_factor": (60, 66),
+    "element": (76, 78),
+}
+
+WATER_NAMES = {"HOH", "WAT", "DOD", "H2O"}
+
+# One-letter codes of amino acids and nucleotides by residue name
+_ONE_LETTER = {
+    **{name.upper(): letter for name, letter in protein_letters_3to1_extended.items()},
+    "A": "A", "C": "C", "G": "G", "U": "U", "I": "I",
+    "DA": "A", "DC": "C", "DG": "G", "DT": "T", "DI": "I",
+}
+
+
+def one_letter_sequence(res_names: Iterable[str]) -> str:
+    """One-letter codes of a sequence of residue names; unknown residues are 'X'."""
+    return "".join(_ONE_LETTER.get(name, "X") for name in res_names)
+
+
+class Structure:
+    """The atoms of one model of a structure, stored column-wise.
+
+    Attributes:
+        coords (np.ndarray): (N, 3) float32 Cartesian coordinates.
+        atom_name, res_name, chain_id, ins_code, element (np.ndarray): Strings.
+        res_seq (np.ndarray): int32 residue numbers.
+        hetatm (np.ndarray): True for HETATM records.
+        occupancy, b_factor (np.ndarray): float32.
+    """
+
+    def __init__(self, coords, atom_name, res_name, chain_id, res_seq, ins_code, element, hetatm, occupancy, b_factor):
+        self.coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+        self.atom_name = np.asarray(atom_name, dtype=str)
+        self.res_name = np.asarray(res_name, dtype=str)
+        self.chain_id = np.asarray(chain_id, dtype=str)
+        self.res_seq = np.asarray(res_seq, dtype=np.int32)
+        self.ins_code = np.asarray(ins_code, dtype=str)
+        self.element = np.asarray(element, dtype=str)
+        self.hetatm = np.asarray(hetatm, dtype=bool)
+        self.occupancy = np.asarray(occupancy, dtype=np.float32)
+        self.b_factor = np.asarray(b_factor, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def select(self, mask: np.ndarray) -> "Structure":
+        """Get the atoms where `mask` is True (or at the given indices) as a new structure."""
+        return Structure(
+            self.coords[mask], self.atom_name[mask], self.res_name[mask], self.chain_id[mask],
+            self.res_seq[mask], self.ins_code[mask], self.element[mask], self.hetatm[mask],
+            self.occupancy[mask], self.b_factor[mask],
+        )
+
+    @property
+    def residue_starts(self) -> np.ndarray:
+        """Index of the first atom of each residue (atoms of a residue are contiguous)."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.intp)
+        changed = (
+            (self.chain_id[1:] != self.chain_id[:-1])
+            | (self.res_seq[1:] != self.res_seq[:-1])
+            | (self.ins_code[1:] != self.ins_code[:-1])
+        )
+        return np.concatenate([[0], np.flatnonzero(changed) + 1])
+
+    @property
+    def residue_index(self) -> np.ndarray:
+        """For each atom, the number of the residue it belongs to (0-based, in file order)."""
+        index = np.zeros(len(self), dtype=np.intp)
+        index[self.residue_starts[1:]] = 1
+        return np.cumsum(index)
+
+    def residue_labels(self, chain: bool = True) -> np.ndarray:
+        """A label like "A:GLY1" (or "GLY1" without `chain`) for each residue."""
+        starts = self.residue_starts
+        labels = np.char.add(np.char.add(self.res_name[starts], self.res_seq[starts].astype(str)), self.ins_code[starts])
+        return np.char.add(np.char.add(self.chain_id[starts], ":"), labels) if chain else labels
+
+    def chains(self) -> list[str]:
+        """Chain IDs in file order."""
+        _, first = np.unique(self.chain_id, return_index=True)
+        return [str(chain) for chain in self.chain_id[np.sort(first)]]
+
+    def polymer(self) -> "Structure":
+        """The ATOM records, i.e. without ligands and water."""
+        return self.select(~self.hetatm)
+
+    def ligands(self) -> "Structure":
+        """HETATM records other than water."""
+        return self.select(self.hetatm & ~np.isin(self.res_name, list(WATER_NAMES)))
+
+    def sequence(self, chain: str) -> str:
+        """One-letter sequence of the polymer residues of a chain; unknown residues are 'X'."""
+        polymer = self.polymer()
+        residues = polymer.select(polymer.chain_id == chain)
+        return one_letter_sequence(residues.res_name[residues.residue_starts].tolist())
+
+    def radius_of_gyration(self) -> float:
+        """Mass-unweighted radius of gyration, in Angstrom."""
+        if len(self) == 0:
+            return 0.0
+        coords = self.coords.astype(np.float64)
+        centered = coords - coords.mean(axis=0)
+        return float(np.sqrt((centered ** 2).sum(axis=1).mean()))
+
+
+def _fixed_width_columns(lines: list[bytes]) -> dict[str, np.ndarray]:
+    # Pad every record to 80 characters and cut the columns out of one
+    # (n, 80) byte matrix instead of slicing each line in Python
+    buffer = b"".join(line.rstrip(b"\r\n").ljust(PDB_LINE_LENGTH)[:PDB_LINE_LENGTH] for line in lines)
+    chars = np.frombuffer(buffer, dtype=np.uint8).reshape(len(lines), PDB_LINE_LENGTH)
+
+    columns = {}
+    for name, (start, end) in _PDB_FIELDS.items():
+        field = np.ascontiguousarray(chars[:, start:end]).view(f"S{end - start}").ravel()
+        columns[name] = field
+    return columns
+
+
+def _strip(field: np.ndarray) -> np.ndarray:
+    return np.char.strip(np.char.decode(field, "ascii", "replace"))
+
+
+def _to_float(field: np.ndarray, default: float) -> np.ndarray:
+    blank = np.char.strip(field) == b""
+    field = np.where(blank, str(default).encode(), field)
+    return field.astype(np.float32)
+
+
+def _first_alt_locs(alt_loc: np.ndarray, blank: np.ndarray, atom_keys: list[np.ndarray]) -> np.ndarray:
+    # Mask keeping atoms without alternate locations and, for each atom that
+    # has them (same values in every array of `atom_keys`), the first one listed
+    keep = blank.copy()
+    alternates = np.flatnonzero(~blank)
+    if len(alternates):
+        codes = np.stack([np.unique(key[alternates], return_inverse=True)[1].ravel() for key in atom_keys], axis=1)
+        _, first, atom = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+        letters = alt_loc[alternates]
+        keep[alternates] = letters == letters[first][atom.ravel()]
+    return keep
+
+
+def _read_pdb(lines: Iterable[bytes], all_models: bool) -> tuple[Structure, np.ndarray]:
+    # The atoms of the first (or every) model, and the model number of each
+    records = []
+    models = []
+    model = 0
+    for line in lines:
+        if line.startswith((b"ATOM  ", b"HETATM")):
+            records.append(line)
+            models.append(model)
+        elif line.startswith(b"ENDMDL"):
+            if not all_models:
+                break
+            model += 1
+
+    if not records:
+        return _empty_structure(), np.zeros(0, dtype=np.intp)
+
+    columns = _fixed_width_columns(records)
+
+    # Keep one alternate location per atom: the blank one or the first letter seen
+    alt_loc = columns["alt_loc"]
+    atom_keys = [np.asarray(models)] + [columns[name] for name in ("chain_id", "res_seq", "ins_code", "atom_name")]
+    keep = _first_alt_locs(alt_loc, alt_loc == b" ", atom_keys)
+    columns = {name: field[keep] for name, field in columns.items()}
+
+    element = _strip(columns["element"])
+    atom_name = _strip(columns["atom_name"])
+    # Old files leave the element column empty; guess it from the atom name
+    missing = element == ""
+    if missing.any():
+        element[missing] = np.char.lstrip(atom_name[missing], "0123456789").astype("U1")
+
+    coords = np.stack([_to_float(columns[axis], 0.0) for axis in "xyz"], axis=1)
+    structure = Structure(
+        coords,
+        atom_name,
+        _strip(columns["res_name"]),
+        _strip(columns["chain_id"]),
+        columns["res_seq"].astype(np.int32),
+        _strip(columns["ins_code"]),
+        element,
+        columns["record"] == b"HETATM",
+        _to_float(columns["occupancy"], 1.0),
+        _to_float(columns["b_factor"], 0.0),
+    )
+    return structure, np.asarray(models)[keep]
+
+
+def _split_models(structure: Structure, models: np.ndarray) -> list[Structure]:
+    _, first = np.unique(models, return_index=True)
+    return [structure.select(models == model) for model in models[np.sort(first)]]
+
+
+def parse_pdb(lines: Iterable[bytes]) -> Structure:
+    """Parse a PDB file given as an iterable of byte lines.
+
+    Only the first model of multi-model files (e.g. NMR ensembles) and the
+    first alternate location of each atom are kept.
+    """
+    return _read_pdb(lines, all_models=False)[0]
+
+
+def parse_pdb_models(lines: Iterable[bytes]) -> list[Structure]:
+    """Like `parse_pdb`, but returns every model."""
+    return _split_models(*_read_pdb(lines, all_models=True))
+
+
+_CIF_TOKEN = re.compile(r"""'(?:[^']|'(?=\S))*'|"(?:[^"]|"(?=\S))*"|\S+""")
+
+
+def _cif_tokens(line: str) -> list[str]:
+    tokens = _CIF_TOKEN.findall(line)
+    return [t[1:-1] if t[:1] in "'\"" and len(t) > 1 and t[-1] == t[0] else t for t in tokens]
+
+
+def _read_mmcif(lines: Iterable[bytes]) -> tuple[Structure, np.ndarray]:
+    # The atoms of every model, and the model number of each
+    lines = iter(lines)
+    names = []
+    rows = []
+
+    for raw in lines:
+        line = raw.decode("utf-8", "replace").strip()
+        if line.startswith("_atom_site."):
+            names.append(line.split()[0][len("_atom_site."):])
+        elif names:
+            if not line or line.startswith(("#", "loop_", "_", "data_")):
+                break
+            rows.append(_cif_tokens(line))
+
+    if not rows:
+        return _empty_structure(), np.zeros(0, dtype=str)
+
+    # Values of one row may wrap over several lines
+    tokens = [token for row in rows for token in row]
+    table = np.array(tokens, dtype=object).reshape(-1, len(names))
+    column = {name: table[:, i] for i, name in enumerate(names)}
+
+    def get(*candidates, default="?"):
+        for name in candidates:
+            if name in column:
+                return column[name]
+        return np.full(len(table), default, dtype=object)
+
+    def text(*candidates):
+        values = get(*candidates).astype(str)
+        return np.where(np.isin(values, ["?", "."]), "", values)
+
+    def number(*candidates, default=0.0):
+        values = get(*candidates).astype(str)
+        values = np.where(np.isin(values, ["?", "."]), str(default), values)
+        return values.astype(np.float32)
+
+    model = get("pdbx_PDB_model_num", default="1").astype(str)
+    coords = np.stack([number(f"Cartn_{axis}") for axis in "xyz"], axis=1)
+    structure = Structure(
+        coords,
+        text("auth_atom_id", "label_atom_id"),
+        text("auth_comp_id", "label_comp_id"),
+        text("auth_asym_id", "label_asym_id"),
+        number("auth_seq_id", "label_seq_id").astype(np.int32),
+        text("pdbx_PDB_ins_code"),
+        text("type_symbol"),
+        get("group_PDB", default="ATOM").astype(str) == "HETATM",
+        number("occupancy", default=1.0),
+        number("B_iso_or_equiv"),
+    )
+
+    alt_loc = text("label_alt_id")
+    atom_keys = [model, structure.chain_id, structure.res_seq, structure.ins_code, structure.atom_name]
+    keep = _first_alt_locs(alt_loc, alt_loc == "", atom_keys)
+    return structure.select(keep), model[keep]
+
+
+def parse_mmcif(lines: Iterable[bytes]) -> Structure:
+    """Parse the first model of the `_atom_site` loop of an mmCIF file."""
+    structure, models = _read_mmcif(lines)
+    return structure.select(models == models[0]) if len(models) else structure
+
+
+def parse_mmcif_models(lines: Iterable[bytes]) -> list[Structure]:
+    """Like `parse_mmcif`, but returns every model."""
+    return _split_models(*_read_mmcif(lines))
+
+
+def _pdb_atom_name(name: str, element: str) -> str:
+    # Names of one-letter elements start in column 14, e.g. " CA "
+    return f" {name:<3}" if len(name) < 4 and len(element) < 2 else f"{name:<4}"
+
+
+def write_pdb(structure: Structure) -> str:
+    """Write the atoms of a structure as PDB ATOM/HETATM records.
+
+    Serial numbers wrap at 100000, as the fixed-width format has no room for
+    more. Raises ValueError for other fields that don't fit their columns,
+    e.g. two-character chain IDs of large assemblies; use `write_mmcif` for those.
+    """
+    if len(structure) and (
+        np.char.str_len(structure.chain_id).max() > 1
+        or np.char.str_len(structure.res_name).max() > 3
+        or structure.res_seq.min() < -999
+        or structure.res_seq.max() > 9999
+        or np.abs(structure.coords).max() >= 10000
+    ):
+        raise ValueError("Structure does not fit the PDB format; write it as mmCIF")
+
+    lines = [
+        f"{'HETATM' if hetatm else 'ATOM':<6}{serial % 100000:>5} {_pdb_atom_name(name, element)} "
+        f"{res_name:>3} {chain:1}{res_seq:>4}{ins_code:1}   {x:8.3f}{y:8.3f}{z:8.3f}"
+        f"{occupancy:6.2f}{b_factor:6.2f}          {element:>2}\n"
+        for serial, (hetatm, name, element, res_name, chain, res_seq, ins_code, (x, y, z), occupancy, b_factor)
+        in enumerate(zip(
+            structure.hetatm.tolist(), structure.atom_name.tolist(), structure.element.tolist(),
+            structure.res_name.tolist(), structure.chain_id.tolist(), structure.res_seq.tolist(),
+            structure.ins_code.tolist(), structure.coords.tolist(), structure.occupancy.tolist(),
+            structure.b_factor.tolist(),
+        ), start=1)
+    ]
+    return "".join(lines) + "END\n"
+
+
+_CIF_SPECIAL = re.compile(r"""^[_#$'"\[\];]|^[?.]$|\s""")
+
+
+def _cif_value(value: str) -> str:
+    if value == "":
+        return "?"
+    if _CIF_SPECIAL.search(value):
+        return f"'{value}'" if '"' in value else f'"{value}"'
+    return value
+
+
+def write_mmcif(structure: Structure, name: str = "structure") -> str:
+    """Write the atoms of a structure as an mmCIF `_atom_site` loop.
+
+    Unlike `write_pdb`, this has no limits on chain IDs, residue numbers or
+    the number of atoms.
+    """
+    fields = [
+        "group_PDB", "id", "type_symbol", "label_atom_id", "label_comp_id", "label_asym_id",
+        "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z", "occupancy",
+        "B_iso_or_equiv", "auth_seq_id", "auth_comp_id", "auth_asym_id", "auth_atom_id",
+        "pdbx_PDB_model_num",
+    ]
+    header = [f"data_{name}", "#", "loop_", *(f"_atom_site.{field}" for field in fields)]
+
+    rows = [
+        f"{'HETATM' if hetatm else 'ATOM'} {serial} {_cif_value(element)} {atom} {residue} {chain} "
+        f"{res_seq} {_cif_value(ins_code)} {x:.3f} {y:.3f} {z:.3f} {occupancy:.2f} {b_factor:.2f} "
+        f"{res_seq} {residue} {chain} {atom} 1"
+        for serial, (hetatm, atom, element, residue, chain, res_seq, ins_code, (x, y, z), occupancy, b_factor)
+        in enumerate(zip(
+            structure.hetatm.tolist(), map(_cif_value, structure.atom_name.tolist()), structure.element.tolist(),
+            map(_cif_value, structure.res_name.tolist()), map(_cif_value, structure.chain_id.tolist()),
+            structure.res_seq.tolist(), structure.ins_code.tolist(), structure.coords.tolist(),
+            structure.occupancy.tolist(), structure.b_factor.tolist(),
+        ), start=1)
+    ]
+    return "\n".join(header + rows + ["#"]) + "\n"
+
+
+def _empty_structure() -> Structure:
+    text = np.zeros(0, dtype=str)
+    number = np.zeros(0)
+    return Structure(number, text, text, text, number, text, text, number, number, number)
+
+
+def _open(path: Path) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def structure_format(path: str | Path) -> str:
+    """Guess "pdb" or "mmcif" from a file name like 1abc.pdb, 1abc.cif or 1abc.cif.gz."""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes if suffix.lower() != ".gz"]
+    return "mmcif" if suffixes and suffixes[-1] in (".cif", ".mmcif") else "pdb"
+
+
+@lru_cache(maxsize=8)
+def _load_cached(path: str, mtime_ns: int, size: int) -> Structure:
+    parse = parse_mmcif if structure_format(path) == "mmcif" else parse_pdb
+    with _open(Path(path)) as f:
+        return parse(f)
+
+
+@lru_cache(maxsize=4)
+def _load_models_cached(path: str, mtime_ns: int, size: int) -> tuple[Structure, ...]:
+    parse = parse_mmcif_models if structure_format(path) == "mmcif" else parse_pdb_models
+    with _open(Path(path)) as f:
+        return tuple(parse(f))
+
+
+def load_models(path: str | Path) -> list[Structure]:
+    """Like `load_structure`, but returns every model, e.g. of an NMR ensemble."""
+    stat = os.stat(path)
+    return list(_load_models_cached(str(path), stat.st_mtime_ns, stat.st_size))
+
+
+def load_structure(path: str | Path) -> Structure:
+    """Load a PDB or mmCIF file (optionally gzipped), streaming it line by line.
+
+    Recently loaded files are kept in memory until they change on disk, so
+    several tools asking about the same upload parse it once.
+    """
+    stat = os.stat(path)
+    return _load_cached(str(path), stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,151 @@
+"""Superposition and RMSD of protein structures.
+
+Structures are compared on their C-alpha atoms. Residues are matched by a
+global alignment of the chain sequences, so models with missing residues or
+point mutations can still be compared. All superpositions of a batch are
+computed at once with NumPy's stacked SVD.
+"""
+
+import numpy as np
+from Bio.Align import PairwiseAligner, substitution_matrices
+
+from .structure import Structure, one_letter_sequence
+
+_BLOSUM62 = substitution_matrices.load("BLOSUM62")
+_aligner = PairwiseAligner(mode="global", substitution_matrix=_BLOSUM62, open_gap_score=-10, extend_gap_score=-0.5)
+
+
+def ca_trace(structure: Structure, chain: str | None = None) -> tuple[np.ndarray, str]:
+    """Get the C-alpha coordinates and one-letter sequence of the polymer residues.
+
+    Returns:
+        tuple[np.ndarray, str]: (M, 3) coordinates and the matching sequence.
+    """
+    mask = ~structure.hetatm & (structure.atom_name == "CA")
+    if chain is not None:
+        mask &= structure.chain_id == chain
+    ca = structure.select(mask)
+    # One C-alpha per residue, also for residues listed twice
+    ca = ca.select(ca.residue_starts)
+    return ca.coords, one_letter_sequence(ca.res_name.tolist())
+
+
+def residue_mapping(sequence_a: str, sequence_b: str) -> tuple[np.ndarray, np.ndarray]:
+    """Match residues of two sequences by a global alignment (BLOSUM62).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Positions in `sequence_a` and the
+            positions in `sequence_b` they are aligned with.
+    """
+    if sequence_a == sequence_b:
+        positions = np.arange(len(sequence_a))
+        return positions, positions
+    if not sequence_a or not sequence_b:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    # Letters BLOSUM62 doesn't know, like U for selenocysteine, count as unknown
+    def known(sequence):
+        return "".join(letter if letter in _BLOSUM62.alphabet else "X" for letter in sequence)
+
+    blocks_a, blocks_b = _aligner.align(known(sequence_a), known(sequence_b))[0].aligned
+    positions_a = [np.arange(start, end) for start, end in blocks_a]
+    positions_b = [np.arange(start, end) for start, end in blocks_b]
+    if not positions_a:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    return np.concatenate(positions_a), np.concatenate(positions_b)
+
+
+def kabsch(mobile: np.ndarray, target: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Optimal rigid superposition of `mobile` onto `target`.
+
+    Both are (..., N, 3) arrays of matched points; leading dimensions are
+    batched, so many superpositions cost one stacked SVD.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Rotations (..., 3, 3) and
+            translations (..., 3) such that `mobile @ rotation + translation`
+            is superposed on `target`, and the RMSD (...) after superposition.
+    """
+    mobile = np.asarray(mobile, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    mobile_center = mobile.mean(axis=-2, keepdims=True)
+    target_center = target.mean(axis=-2, keepdims=True)
+    p = mobile - mobile_center
+    q = target - target_center
+
+    u, s, vt = np.linalg.svd(np.swapaxes(p, -1, -2) @ q)
+    # Flip the smallest axis where the best orthogonal matrix is a reflection
+    d = np.sign(np.linalg.det(u @ vt))
+    u[..., :, 2] *= d[..., None]
+    s[..., 2] *= d
+    rotation = u @ vt
+
+    translation = (target_center - mobile_center @ rotation)[..., 0, :]
+    n = mobile.shape[-2]
+    squared = ((p ** 2).sum(axis=(-1, -2)) + (q ** 2).sum(axis=(-1, -2)) - 2 * s.sum(axis=-1)) / n
+    return rotation, translation, np.sqrt(np.maximum(squared, 0))
+
+
+def rmsd_matrix(coords: np.ndarray) -> np.ndarray:
+    """RMSD after optimal superposition between every pair of K models.
+
+    Args:
+        coords (np.ndarray): (K, N, 3) matched coordinates.
+
+    Returns:
+        np.ndarray: Symmetric (K, K) matrix with zeros on the diagonal.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    k, n, _ = coords.shape
+    centered = coords - coords.mean(axis=1, keepdims=True)
+
+    # All K x K covariance matrices from a single matrix product
+    flat = centered.transpose(0, 2, 1).reshape(k * 3, n)
+    covariance = (flat @ flat.T).reshape(k, 3, k, 3).transpose(0, 2, 1, 3)
+
+    i, j = np.triu_indices(k, 1)
+    u, s, vt = np.linalg.svd(covariance[i, j])
+    s[:, 2] *= np.sign(np.linalg.det(u) * np.linalg.det(vt))
+
+    squares = (centered ** 2).sum(axis=(1, 2))
+    rmsd = np.sqrt(np.maximum((squares[i] + squares[j] - 2 * s.sum(axis=1)) / n, 0))
+
+    matrix = np.zeros((k, k))
+    matrix[i, j] = matrix[j, i] = rmsd
+    return matrix
+
+
+def superpose(mobile: Structure, target: Structure, mobile_chain: str | None = None, target_chain: str | None = None) -> dict:
+    """Superpose the C-alpha atoms of `mobile` on those of `target`.
+
+    Returns:
+        dict: "rmsd", "aligned" (number of matched residues), and the
+            "rotation" and "translation" that map `mobile` onto `target`.
+    """
+    mobile_coords, mobile_sequence = ca_trace(mobile, mobile_chain)
+    target_coords, target_sequence = ca_trace(target, target_chain)
+    mobile_positions, target_positions = residue_mapping(mobile_sequence, target_sequence)
+    if len(mobile_positions) < 3:
+        raise ValueError("Superposition needs at least 3 matched residues")
+
+    rotation, translation, rmsd = kabsch(mobile_coords[mobile_positions], target_coords[target_positions])
+    return {"rmsd": float(rmsd), "aligned": len(mobile_positions), "rotation": rotation, "translation": translation}
+
+
+def matched_coords(structures: list[Structure], chain: str | None = None) -> np.ndarray:
+    """C-alpha coordinates of the residues all structures share with the first one.
+
+    Returns:
+        np.ndarray: (K, M, 3) coordinates, matched residue by residue.
+    """
+    traces = [ca_trace(structure, chain) for structure in structures]
+    _, reference_sequence = traces[0]
+
+    # For each residue of the reference, its position in every structure (-1 if unmatched)
+    positions = np.full((len(traces), len(reference_sequence)), -1)
+    for row, (_, sequence) in enumerate(traces):
+        reference_positions, own_positions = residue_mapping(reference_sequence, sequence)
+        positions[row, reference_positions] = own_positions
+
+    shared = np.all(positions >= 0, axis=0)
+    return np.stack([coords[positions[row, shared]] for row, (coords, _) in enumerate(traces)])
@@ -0,0 +1,80 @@
+"""Columnar cache of uploaded CSV files.
+
+Each uploaded CSV is converted to Parquet once and stored in `PARQUET_DIR`
+under the SHA-256 of its bytes. Streamlit reruns then memory-map the Parquet
+file instead of parsing the CSV again.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import IO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from .env import CACHE_DIR
+
+PARQUET_DIR = CACHE_DIR / "parquet"
+
+# Bytes of CSV parsed per block by pyarrow, each written as one Parquet row group.
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def parquet_path(digest: str, directory: Path | None = None) -> Path:
+    return Path(directory or PARQUET_DIR) / f"{digest}.parquet"
+
+
+def _write_streaming(source: IO[bytes], path: Path) -> None:
+    # Converts block by block, so the CSV never has to fit in memory
+    reader = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE))
+    with pq.ParquetWriter(path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+def _write_with_pandas(source: IO[bytes], path: Path) -> None:
+    pq.write_table(pa.Table.from_pandas(pd.read_csv(source), preserve_index=False), path)
+
+
+def csv_to_parquet(content: bytes, directory: Path | None = None) -> Path:
+    """Convert CSV bytes to Parquet, unless the same content was converted before.
+
+    Returns:
+        Path: The Parquet file.
+    """
+    path = parquet_path(content_hash(content), directory)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        try:
+            _write_streaming(pa.BufferReader(content), tmp_path)
+        except pa.ArrowInvalid as e:
+            # pyarrow infers column types from the first block and fails if a
+            # later block disagrees; pandas looks at the whole column
+            logging.info(f"Falling back to pandas for CSV conversion: {e}")
+            _write_with_pandas(io.BytesIO(content), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    logging.info(f"Converted CSV to {path}")
+    return path
+
+
+def load_parquet(path: Path) -> pd.DataFrame:
+    """Load a Parquet file through a memory map."""
+    table = pq.read_table(path, memory_map=True)
+    return table.to_pandas()
@@ -1,8 +1,25 @@
-import requests
+import asyncio
+import os
+import time
 import xml.etree.ElementTree as ET
+from typing import AsyncIterator
+
+import httpx
+
+from .pubmed_cache import PubMedCache, get_default_cache
 
 base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
 
+# Number of articles requested per EFetch call.
+BATCH_SIZE = 200
+
+# NCBI allows 3 requests per second, or 10 with an API key.
+# https://www.ncbi.nlm.nih.gov/books/NBK25497/#chapter2.Usage_Guidelines_and_Requiremen
+DEFAULT_RATE_LIMIT = 3
+API_KEY_RATE_LIMIT = 10
+
+Paper = tuple[str, str, str]  # (PMID, title, abstract)
+
 def _parse_search_results(search_result: str) -> list[str]:
     """
     Parses the XML response from PubMed's ESearch API and returns a list of PMIDs.
@@ -10,28 +27,201 @@ def _parse_search_results(search_result: str) -> list[str]:
     root = ET.fromstring(search_result)
     return [id_tag.text for id_tag in root.findall('.//IdList/Id') if id_tag.text is not None]
 
-def fetch_papers(query: str, max_results: int = 10) -> list:
+def _parse_search_history(search_result: str) -> tuple[int, str | None, str | None]:
     """
-    Fetches a list of papers from PubMed based on the given query.
-    This function now also returns the abstract of each paper.
+    Parses an ESearch response made with `usehistory=y` into (count, WebEnv, query_key).
+    """
+    root = ET.fromstring(search_result)
+    return (
+        int(root.findtext('Count') or 0),
+        root.findtext('WebEnv'),
+        root.findtext('QueryKey'),
+    )
+
+def _article_to_paper(article: ET.Element) -> Paper:
+    pmid = article.findtext('.//PMID') or ""
+    title = article.find('.//ArticleTitle')
+    title_text = "".join(title.itertext()) if title is not None else ""
+
+    abstract = [" ".join(part.itertext()) for part in article.findall('.//Abstract/AbstractText')]
+    abstract_text = "\n".join(abstract) if abstract else "No abstract available"
+
+    return (pmid, title_text, abstract_text)
+
+
+class _RateLimiter:
+    """Spaces out request starts so that at most `rate` begin per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _stream_articles(client: httpx.AsyncClient, limiter: _RateLimiter, url: str, params: dict, out: asyncio.Queue):
+    """Fetch one EFetch batch and put each parsed article on `out` as soon as it is complete."""
+    try:
+        await limiter.wait()
+        parser = ET.XMLPullParser(events=("end",))
+
+        async with client.stream("GET", url, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                for _, element in parser.read_events():
+                    if element.tag == 'PubmedArticle':
+                        await out.put(_article_to_paper(element))
+                        element.clear()
+    finally:
+        await out.put(None)
+
+
+async def _stream_batches(client: httpx.AsyncClient, limiter: _RateLimiter, url: str, batch_params: list[dict]) -> AsyncIterator[Paper]:
     """
+    Starts every EFetch batch at once and yields their articles in batch order
+    while later batches keep downloading.
+    """
+    batches = []
+    for params in batch_params:
+        queue = asyncio.Queue()
+        task = asyncio.create_task(_stream_articles(client, limiter, f"{url}efetch.fcgi", params, queue))
+        batches.append((queue, task))
 
-    search_url = f"{base_url}esearch.fcgi?db=pubmed&term={query}&retmode=xml"
-    search_response = requests.get(search_url)
-    id_list = _parse_search_results(search_response.text)
+    try:
+        for queue, task in batches:
+            while (paper := await queue.get()) is not None:
+                yield paper
+            await task
+    finally:
+        for _, task in batches:
+            task.cancel()
 
-    ids = ','.join(id_list[:max_results])
-    fetch_url = f"{base_url}efetch.fcgi?db=pubmed&id={ids}&retmode=xml"
-    fetch_response = requests.get(fetch_url)
-    root = ET.fromstring(fetch_response.text)
 
-    papers = []
-    for article in root.findall('.//PubmedArticle'):
-        pmid = article.find('.//PMID')
-        title = article.find('.//ArticleTitle')
+async def aiter_papers(
+    query: str,
+    max_results: int = 10,
+    client: httpx.AsyncClient | None = None,
+    url: str | None = None,
+    rate_limit: float | None = None,
+    cache: PubMedCache | None = None,
+) -> AsyncIterator[Paper]:
+    """
+    Streams (PMID, title, abstract) tuples from PubMed for the given query.
 
-        abstract = article.find('.//Abstract/AbstractText')
-        abstract_text = abstract.text if abstract is not None else "No abstract available"
-        papers.append((pmid, title, abstract_text))
+    The search result is kept on the NCBI history server (`usehistory`), then
+    fetched in batches of `BATCH_SIZE` that run concurrently within the NCBI
+    rate limit. Each batch is parsed incrementally, so articles are yielded
+    while the rest of the response is still downloading.
 
-    return papers
\ No newline at end of file
+    With a `cache`, searches and articles already on disk are served from it and
+    only the missing articles are fetched, by PMID.
+    """
+    url = url or base_url
+    api_key = os.getenv("NCBI_API_KEY")
+    rate_limit = rate_limit or (API_KEY_RATE_LIMIT if api_key else DEFAULT_RATE_LIMIT)
+    limiter = _RateLimiter(rate_limit)
+    common_params = {"db": "pubmed", "retmode": "xml"}
+    if api_key:
+        common_params["api_key"] = api_key
+
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=int(rate_limit)))
+
+    try:
+        pmids = cache.get_search(query, max_results) if cache else None
+        webenv = query_key = None
+
+        if pmids is None:
+            await limiter.wait()
+            search_response = await client.get(
+                f"{url}esearch.fcgi",
+                # The cache needs the PMIDs themselves, otherwise the history is enough
+                params={**common_params, "term": query, "usehistory": "y", "retmax": max_results if cache else 0},
+            )
+            search_response.raise_for_status()
+            count, webenv, query_key = _parse_search_history(search_response.text)
+            total = min(count, max_results)
+
+            if cache:
+                pmids = _parse_search_results(search_response.text)[:max_results]
+                cache.put_search(query, max_results, pmids, count)
+
+        cached = cache.get_articles(pmids) if cache else {}
+
+        if webenv and not cached:
+            batch_params = [
+                {
+                    **common_params,
+                    "WebEnv": webenv,
+                    "query_key": query_key,
+                    "retstart": retstart,
+                    "retmax": min(BATCH_SIZE, total - retstart),
+                }
+                for retstart in range(0, total, BATCH_SIZE)
+            ]
+        else:
+            missing = [pmid for pmid in pmids or [] if pmid not in cached]
+            batch_params = [
+                {**common_params, "id": ",".join(missing[i:i + BATCH_SIZE])}
+                for i in range(0, len(missing), BATCH_SIZE)
+            ]
+
+        fetched = _stream_batches(client, limiter, url, batch_params)
+
+        if cache is None:
+            async for paper in fetched:
+                yield paper
+            return
+
+        # Merge cached and fetched articles back into search order
+        buffered = {}
+        new_papers = []
+        try:
+            for pmid in pmids:
+                if pmid in cached:
+                    yield cached[pmid]
+                    continue
+                while pmid not in buffered and (paper := await anext(fetched, None)) is not None:
+                    buffered[paper[0]] = paper
+                    new_papers.append(paper)
+                if pmid in buffered:
+                    yield buffered.pop(pmid)
+        finally:
+            cache.put_articles(new_papers)
+            await fetched.aclose()
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
+async def afetch_papers(query: str, max_results: int = 10, **kwargs) -> list[Paper]:
+    """
+    Async version of `fetch_papers`. Keyword arguments are passed to `aiter_papers`.
+    """
+    return [paper async for paper in aiter_papers(query, max_results, **kwargs)]
+
+
+def fetch_papers(query: str, max_results: int = 10) -> list:
+    """
+    Fetches a list of papers from PubMed based on the given query.
+    Each paper is a (PMID, title, abstract) tuple.
+    """
+    return asyncio.run(afetch_papers(query, max_results, cache=get_default_cache()))
+
+
+def search_local_papers(query: str, max_results: int = 10) -> list:
+    """
+    Searches the titles and abstracts of every PubMed paper fetched so far,
+    without going online. Try this first and only call `fetch_papers` when it
+    doesn't find what you need. Each paper is a (PMID, title, abstract) tuple.
+    """
+    return get_default_cache().search(query, max_results)
@@ -0,0 +1,209 @@
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from ..env import CACHE_DIR
+
+CACHE_FILE = CACHE_DIR / "pubmed.sqlite3"
+
+SEARCH_TTL = 24 * 60 * 60
+ARTICLE_TTL = 30 * 24 * 60 * 60
+MAX_ARTICLE_BYTES = 100 * 1024 * 1024
+
+Paper = tuple[str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT PRIMARY KEY,
+    max_results INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    pmids TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS articles (
+    pmid TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    abstract TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_last_used ON articles (last_used);
+"""
+
+# Full-text index of every article ever fetched. Unlike `articles` it is never
+# expired or evicted, so it keeps answering follow-up questions offline.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5 (
+    pmid UNINDEXED,
+    title,
+    abstract
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Normalise a search term so trivially different spellings share a cache entry."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class PubMedCache:
+    """Disk-backed cache of PubMed search results and articles.
+
+    Searches are cached by normalised query and map to a list of PMIDs. Articles
+    are cached per PMID, so overlapping searches only need to fetch the articles
+    they don't share. Entries expire after their TTL, and the least recently
+    used articles are evicted once they take up more than `max_article_bytes`.
+
+    Every stored article is also added to a full-text index, see `search`.
+    """
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        search_ttl: float = SEARCH_TTL,
+        article_ttl: float = ARTICLE_TTL,
+        max_article_bytes: int = MAX_ARTICLE_BYTES,
+    ):
+        self.path = Path(path or CACHE_FILE)
+        self.search_ttl = search_ttl
+        self.article_ttl = article_ttl
+        self.max_article_bytes = max_article_bytes
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5, `search` falls back to LIKE over `articles`
+                self.fts = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the cache usable from the tool runner's threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_search(self, query: str, max_results: int) -> list[str] | None:
+        """Get the cached PMIDs for a query, or None if they need to be searched again."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT max_results, complete, pmids FROM searches WHERE query = ? AND fetched_at > ?",
+                (normalize_query(query), time.time() - self.search_ttl),
+            ).fetchone()
+
+        if row is None:
+            return None
+        cached_max, complete, pmids = row
+        if cached_max < max_results and not complete:
+            return None
+        return json.loads(pmids)[:max_results]
+
+    def put_search(self, query: str, max_results: int, pmids: list[str], count: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)",
+                (normalize_query(query), max_results, len(pmids) >= count, json.dumps(pmids), time.time()),
+            )
+            conn.execute("DELETE FROM searches WHERE fetched_at <= ?", (time.time() - self.search_ttl,))
+
+    def get_articles(self, pmids: list[str]) -> dict[str, Paper]:
+        """Get the fresh cached articles among `pmids`, keyed by PMID."""
+        if not pmids:
+            return {}
+
+        now = time.time()
+        placeholders = ",".join("?" * len(pmids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT pmid, title, abstract FROM articles WHERE pmid IN ({placeholders}) AND fetched_at > ?",
+                (*pmids, now - self.article_ttl),
+            ).fetchall()
+            conn.execute(
+                f"UPDATE articles SET last_used = ? WHERE pmid IN ({placeholders})",
+                (now, *pmids),
+            )
+
+        return {pmid: (pmid, title, abstract) for pmid, title, abstract in rows}
+
+    def put_articles(self, papers: list[Paper]) -> None:
+        if not papers:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (pmid, title, abstract, len(title.encode()) + len(abstract.encode()), now, now)
+                    for pmid, title, abstract in papers
+                ],
+            )
+            if self.fts:
+                conn.executemany("DELETE FROM papers_fts WHERE pmid = ?", [(paper[0],) for paper in papers])
+                conn.executemany("INSERT INTO papers_fts VALUES (?, ?, ?)", papers)
+            self._evict(conn, now)
+
+    def search(self, query: str, limit: int = 10) -> list[Paper]:
+        """Search the titles and abstracts of every article stored so far.
+
+        Any of the words in `query` may match; results are ranked by BM25.
+        """
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+
+        with self._connect() as conn:
+            if self.fts:
+                match = " OR ".join(f'"{term}"' for term in terms)
+                rows = conn.execute(
+                    "SELECT pmid, title, abstract FROM papers_fts WHERE papers_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+            else:
+                conditions = " OR ".join("(title || ' ' || abstract) LIKE ?" for _ in terms)
+                rows = conn.execute(
+                    f"SELECT pmid, title, abstract FROM articles WHERE {conditions} LIMIT ?",
+                    (*(f"%{term}%" for term in terms), limit),
+                ).fetchall()
+
+        return [tuple(row) for row in rows]
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM articles WHERE fetched_at <= ?", (now - self.article_ttl,))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+        if total <= self.max_article_bytes:
+            return
+
+        # Drop least recently used articles until we are back under the limit
+        excess = total - self.max_article_bytes
+        freed = 0
+        doomed = []
+        for pmid, size in conn.execute("SELECT pmid, size FROM articles ORDER BY last_used, pmid"):
+            if freed >= excess:
+                break
+            doomed.append((pmid,))
+            freed += size
+        conn.executemany("DELETE FROM articles WHERE pmid = ?", doomed)
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM searches")
+            conn.execute("DELETE FROM articles")
+            if self.fts:
+                conn.execute("DELETE FROM papers_fts")
+
+
+_default_cache = None
+
+def get_default_cache() -> PubMedCache:
+    """Get the process-wide cache stored in `CACHE_FILE`."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PubMedCache()
+    return _default_cache
@@ -4,7 +4,7 @@ import re
 from typing import Annotated
 from typing_extensions import Doc
 
-from Bio import AlignIO, Restriction, SeqIO
+from Bio import AlignIO, SeqIO
 from Bio.Align import MultipleSeqAlignment
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
@@ -280,6 +280,9 @@ def open_reading_frames(filepath: Annotated[str, Doc("Path to the FASTA file.")]
 
 
 def find_recognition_sites(dna_sequence, enzyme_name):
+    # Building the restriction enzyme tables is slow, so only pay for it when needed
+    from Bio import Restriction
+
     sequence = Seq(dna_sequence)
     enzyme = getattr(Restriction, enzyme_name, None)
 
@@ -0,0 +1,230 @@
+from typing import Annotated
+from typing_extensions import Doc
+
+import numpy as np
+
+from genesys import spatial, superpose
+from genesys.structure import WATER_NAMES, load_models, load_structure
+
+
+def structure_summary(filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")]):
+    """Summarize a protein structure file: atom, residue and ligand counts per chain.
+
+    Returns:
+        dict: Totals and, for each chain, its number of residues and atoms.
+    """
+    structure = load_structure(filepath)
+    polymer = structure.polymer()
+    ligands = structure.ligands()
+
+    chains = {}
+    for chain in polymer.chains():
+        atoms = polymer.select(polymer.chain_id == chain)
+        chains[chain] = {
+            "residues": len(atoms.residue_starts),
+            "atoms": len(atoms),
+        }
+
+    ligand_names = ligands.res_name[ligands.residue_starts]
+    return {
+        "atoms": len(structure),
+        "polymerAtoms": len(polymer),
+        "residues": len(polymer.residue_starts),
+        "waters": len(structure.select(structure.hetatm).residue_starts) - len(ligand_names),
+        "ligands": sorted(set(ligand_names.tolist())),
+        "chains": chains,
+    }
+
+
+def chain_sequences(filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")]):
+    """Extract the one-letter amino acid sequence of each chain in a protein structure file.
+
+    Returns:
+        dict: Dictionary with chain IDs as keys and sequences as values.
+    """
+    structure = load_structure(filepath)
+    polymer = structure.polymer()
+    return {chain: structure.sequence(chain) for chain in polymer.chains()}
+
+
+def residue_list(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    chain: Annotated[str, Doc("Chain ID, e.g. 'A'.")]
+):
+    """List the residues of a chain in a protein structure file, with their numbers.
+
+    Returns:
+        list: "<residue name><residue number><insertion code>" for each residue, e.g. "GLY1".
+    """
+    structure = load_structure(filepath).polymer()
+    atoms = structure.select(structure.chain_id == chain)
+    if len(atoms) == 0:
+        raise ValueError(f"No chain {chain!r} in {filepath}")
+
+    return atoms.residue_labels(chain=False).tolist()
+
+
+def radius_of_gyration(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    chain: Annotated[str | None, Doc("Chain ID, or None for the whole structure.")] = None
+):
+    """Calculate the radius of gyration of a protein structure (ligands and water excluded), in Angstrom."""
+    structure = load_structure(filepath).polymer()
+    if chain is not None:
+        structure = structure.select(structure.chain_id == chain)
+        if len(structure) == 0:
+            raise ValueError(f"No chain {chain!r} in {filepath}")
+    return round(structure.radius_of_gyration(), 3)
+
+
+def _chain_mask(structure, chain, filepath):
+    mask = ~structure.hetatm & (structure.chain_id == chain)
+    if not mask.any():
+        raise ValueError(f"No chain {chain!r} in {filepath}")
+    return mask
+
+
+def _labels(structure, atoms):
+    # Labels of the residues the given atoms belong to, in file order
+    residues = np.unique(structure.residue_index[atoms])
+    return structure.residue_labels()[residues].tolist()
+
+
+def contact_map(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    chain: Annotated[str | None, Doc("Chain ID, or None for all chains.")] = None,
+    cutoff: Annotated[float, Doc("Maximum distance between C-alpha atoms, in Angstrom.")] = 8.0
+):
+    """Calculate the residue contact map of a protein structure from C-alpha distances.
+
+    Returns:
+        dict: "residues" lists the labels (like "A:GLY1") of the residues with
+            at least one contact; "contacts" lists pairs of positions in
+            "residues" that are in contact.
+    """
+    structure = load_structure(filepath)
+    if chain is not None:
+        _chain_mask(structure, chain, filepath)
+
+    pairs = spatial.contact_map(structure, cutoff)
+    residues = np.unique(pairs)
+    if chain is not None:
+        residues = residues[structure.chain_id[structure.residue_starts[residues]] == chain]
+        pairs = pairs[np.isin(pairs, residues).all(axis=1)]
+
+    return {
+        "residues": structure.residue_labels()[residues].tolist(),
+        "contacts": np.searchsorted(residues, pairs).tolist(),
+    }
+
+
+def interface_residues(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    chain_a: Annotated[str, Doc("ID of the first chain.")],
+    chain_b: Annotated[str, Doc("ID of the second chain.")],
+    cutoff: Annotated[float, Doc("Maximum distance between atoms of the two chains, in Angstrom.")] = 5.0
+):
+    """Find the residues at the interface between two chains of a protein structure.
+
+    Returns:
+        dict: Chain IDs as keys and the labels of their interface residues as values.
+    """
+    structure = load_structure(filepath)
+    a = _chain_mask(structure, chain_a, filepath)
+    b = _chain_mask(structure, chain_b, filepath)
+
+    atoms_a, atoms_b = spatial.neighbours(structure, a, b, cutoff)
+    return {chain_a: _labels(structure, atoms_a), chain_b: _labels(structure, atoms_b)}
+
+
+def ligand_contacts(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    ligand: Annotated[str, Doc("Residue name of the ligand, e.g. 'HEM'.")],
+    cutoff: Annotated[float, Doc("Maximum distance to the ligand, in Angstrom.")] = 4.0
+):
+    """Find the protein residues that contact a ligand in a protein structure.
+
+    Returns:
+        list: Labels like "A:HIS93" of the residues with an atom within `cutoff` of the ligand.
+    """
+    structure = load_structure(filepath)
+    query = structure.hetatm & (structure.res_name == ligand.upper())
+    if not query.any():
+        raise ValueError(f"No ligand {ligand!r} in {filepath}")
+
+    _, atoms = spatial.neighbours(structure, query, ~structure.hetatm, cutoff)
+    return _labels(structure, atoms)
+
+
+def residues_within_radius(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file.")],
+    x: Annotated[float, Doc("X coordinate of the center, in Angstrom.")],
+    y: Annotated[float, Doc("Y coordinate of the center, in Angstrom.")],
+    z: Annotated[float, Doc("Z coordinate of the center, in Angstrom.")],
+    radius: Annotated[float, Doc("Radius in Angstrom.")]
+):
+    """Find the residues (water excluded) with an atom within a radius of a point in a protein structure.
+
+    Returns:
+        list: Labels like "A:GLY1" of the residues.
+    """
+    structure = load_structure(filepath)
+    atoms = spatial.spatial_index(structure).within([x, y, z], radius)
+    atoms = atoms[~np.isin(structure.res_name[atoms], list(WATER_NAMES))]
+    return _labels(structure, atoms)
+
+
+def superpose_structures(
+    filepath: Annotated[str, Doc("Path to the PDB or mmCIF file to move, e.g. a predicted model.")],
+    reference_filepath: Annotated[str, Doc("Path to the PDB or mmCIF file to superpose onto, e.g. the experimental structure.")],
+    chain: Annotated[str | None, Doc("Chain ID in the first file, or None for all chains.")] = None,
+    reference_chain: Annotated[str | None, Doc("Chain ID in the reference file, or None for all chains.")] = None
+):
+    """Superpose one protein structure onto another and calculate the C-alpha RMSD.
+
+    Residues are matched by aligning the two sequences, so the structures may differ in length or sequence.
+    Only the uploaded file is available: both paths may name it, e.g. to compare two of its chains.
+
+    Returns:
+        dict: "rmsd" in Angstrom, "alignedResidues", and the "rotation" (3x3, applied
+            to row vectors) and "translation" that move the first structure onto the reference.
+    """
+    result = superpose.superpose(load_structure(filepath), load_structure(reference_filepath), chain, reference_chain)
+    return {
+        "rmsd": round(result["rmsd"], 3),
+        "alignedResidues": result["aligned"],
+        "rotation": np.round(result["rotation"], 4).tolist(),
+        "translation": np.round(result["translation"], 3).tolist(),
+    }
+
+
+def rmsd_matrix(
+    filepaths: Annotated[list[str], Doc("Paths to the PDB or mmCIF files. Every model of multi-model files (e.g. NMR ensembles) is included.")],
+    chain: Annotated[str | None, Doc("Chain ID to compare, or None for all chains.")] = None
+):
+    """Calculate the C-alpha RMSD after superposition between every pair of protein structures or models.
+
+    Only the uploaded file is available, so this compares the models of a multi-model upload.
+
+    Returns:
+        dict: "labels" ("<path>" or "<path>#<model number>" for each structure),
+            "alignedResidues" shared by all of them, and the symmetric RMSD "matrix" in Angstrom.
+    """
+    labels = []
+    structures = []
+    for filepath in filepaths:
+        models = load_models(filepath)
+        structures.extend(models)
+        labels.extend([filepath] if len(models) == 1 else [f"{filepath}#{number}" for number in range(1, len(models) + 1)])
+
+    if len(structures) < 2:
+        raise ValueError("Need at least 2 structures to compare")
+    coords = superpose.matched_coords(structures, chain)
+    if coords.shape[1] < 3:
+        raise ValueError("The structures share fewer than 3 residues")
+
+    return {
+        "labels": labels,
+        "alignedResidues": coords.shape[1],
+        "matrix": np.round(superpose.rmsd_matrix(coords), 3).tolist(),
+    }
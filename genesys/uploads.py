@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable
+
+from .env import CACHE_DIR
+from .storage import get_storage
+
+UPLOAD_DIR = CACHE_DIR / "uploads"
+
+# Failed uploads are retried after RETRY_DELAY seconds, doubling with every
+# failure up to MAX_RETRY_DELAY
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+
+# upload(path, user_id, filename, data_file), raising if the upload failed
+Uploader = Callable[[Path, str, str, str], None]
+
+
+def _put_file(path: Path, user_id: str, filename: str, data_file: str) -> None:
+    get_storage().put_file(user_id, data_file, filename, path)
+
+
+class UploadQueue:
+    """Writes files to the storage backend (see `genesys.storage`) on a background thread.
+
+    Content is spooled to `directory` under an `upload_key` together with a
+    small JSON record, so pending uploads survive Streamlit reruns and are
+    resumed when the process restarts. Failed uploads are retried with
+    exponential backoff. Content that the same user already queued or
+    uploaded as the same kind of file is not uploaded again.
+    """
+
+    def __init__(self, directory: Path | str | None = None, upload: Uploader = _put_file, retry_delay: float = RETRY_DELAY):
+        self.directory = Path(directory or UPLOAD_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.upload = upload
+        self.retry_delay = retry_delay
+        self.failures = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+
+        self.worker = threading.Thread(target=self._work, name="genesys-uploads", daemon=True)
+        self.worker.start()
+
+        for record in sorted(self.directory.glob("*.json")):
+            if self._read(record.stem).get("status") == "pending":
+                self.queue.put(record.stem)
+
+    @staticmethod
+    def upload_key(content: bytes, user_id: str, data_file: str) -> str:
+        """Identify an upload by its owner, kind of file and content."""
+        digest = hashlib.sha256(content).hexdigest()
+        return hashlib.sha256(f"{user_id}\0{data_file}\0{digest}".encode("utf-8")).hexdigest()
+
+    def _record_path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.json"
+
+    def _read(self, digest: str) -> dict:
+        try:
+            with open(self._record_path(digest), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, digest: str, record: dict) -> None:
+        path = self._record_path(digest)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def enqueue(self, content: str | bytes, user_id: str, filename: str, data_file: str) -> str:
+        """Queue `content` for upload and return immediately.
+
+        Args:
+            content (str | bytes): File content.
+            user_id (str): Owner of the upload.
+            filename (str): Name of the stored object.
+            data_file (str): Kind of file, e.g. "FASTA".
+
+        Returns:
+            str: The name the content is stored under. For content this user
+                queued before as the same `data_file`, this is the filename it
+                was first queued with.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = self.upload_key(content, user_id, data_file)
+
+        with self.lock:
+            if record := self._read(digest):
+                logging.info(f"Skipping upload of {filename}, already {record['status']} as {record['filename']}")
+                return record["filename"]
+
+            (self.directory / digest).write_bytes(content)
+            self._write(digest, {
+                "status": "pending",
+                "user_id": user_id,
+                "filename": filename,
+                "data_file": data_file,
+            })
+
+        self.queue.put(digest)
+        return filename
+
+    def status(self, digest: str) -> str | None:
+        """Get the status ("pending", "done") of the upload with this `upload_key`."""
+        return self._read(digest).get("status")
+
+    def join(self) -> None:
+        """Block until every queued upload has been attempted (retries not included)."""
+        self.queue.join()
+
+    def _work(self):
+        while True:
+            digest = self.queue.get()
+            try:
+                self._process(digest)
+                self.failures.pop(digest, None)
+            except Exception as e:
+                self._retry_later(digest, e)
+            finally:
+                self.queue.task_done()
+
+    def _retry_later(self, digest: str, error: Exception) -> None:
+        # The record stays pending, so a restart also resumes it
+        failures = self.failures[digest] = self.failures.get(digest, 0) + 1
+        delay = min(self.retry_delay * 2 ** (failures - 1), MAX_RETRY_DELAY)
+        logging.error(f"Upload {digest} failed: {error}, retrying in {delay:.0f}s")
+
+        timer = threading.Timer(delay, self.queue.put, args=(digest,))
+        timer.daemon = True
+        timer.start()
+
+    def _process(self, digest: str) -> None:
+        record = self._read(digest)
+        if record.get("status") != "pending":
+            return
+
+        path = self.directory / digest
+        self.upload(path, record["user_id"], record["filename"], record["data_file"])
+
+        with self.lock:
+            self._write(digest, {**record, "status": "done"})
+            path.unlink(missing_ok=True)
+        logging.info(f"Uploaded {record['filename']} in the background")
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+def get_upload_queue() -> UploadQueue:
+    """Get the process-wide queue stored in `UPLOAD_DIR`, shared by all Streamlit sessions."""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = UploadQueue()
+    return _default_queue
@@ -1,10 +1,21 @@
+import collections.abc
+import copy
+import hashlib
 import inspect
+import json
 import typing
+from pathlib import Path
 from types import GenericAlias, ModuleType, UnionType
 from typing import Annotated, Any, Callable
 
 from typing_extensions import Doc
 
+TOOLS_SCHEMA_FILE = Path(__file__).parent / "tools" / "schema.json"
+
+# Schema registries, keyed by (module name, function qualname) and module name.
+_function_schemas: dict[tuple[str, str], dict[str, Any]] = {}
+_tools_schemas: dict[str, list[dict]] = {}
+
 
 def _lenient_issubclass(cls: Any, class_or_tuple: Any) -> bool:
     """
@@ -25,21 +36,83 @@ def is_annotated(ann_type: Any) -> bool:
     origin = typing.get_origin(ann_type)
     return origin is not None and _lenient_issubclass(origin, Annotated)
 
-def to_json_type(tp: type) -> str:
-    if tp == bool:
-        return 'boolean'
-    elif tp == float or tp == int:
-        return 'number'
-    elif tp == str:
-        return 'string'
-    elif tp == list:
-        return 'array'
-    elif tp == dict:
-        return 'object'
+def _is_union(tp: Any) -> bool:
+    origin = typing.get_origin(tp)
+    return origin is typing.Union or origin is UnionType
+
+def to_json_schema(tp: Any) -> dict[str, Any]:
+    """Resolve a type hint, including generics, to a JSON Schema fragment."""
+    if tp is inspect.Parameter.empty or tp is Any:
+        return {}
+
+    if is_annotated(tp):
+        return to_json_schema(typing.get_args(tp)[0])
+
+    if _is_union(tp):
+        args = typing.get_args(tp)
+        schemas = [to_json_schema(arg) for arg in args if arg is not type(None)]
+        nullable = len(schemas) < len(args)
+
+        if len(schemas) == 1 and isinstance(schemas[0].get("type"), str):
+            schema = dict(schemas[0])
+            if nullable:
+                schema["type"] = [schema["type"], "null"]
+            return schema
+
+        if nullable:
+            schemas.append({"type": "null"})
+        return {"anyOf": schemas}
+
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+
+    if origin is typing.Literal:
+        return {"enum": list(args)}
+    if origin in (list, set, frozenset, collections.abc.Sequence, collections.abc.Iterable):
+        schema = {"type": "array"}
+        if args:
+            schema["items"] = to_json_schema(args[0])
+        return schema
+    if origin is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            return {"type": "array", "items": to_json_schema(args[0])}
+        schema = {"type": "array"}
+        if args:
+            schema["prefixItems"] = [to_json_schema(arg) for arg in args]
+        return schema
+    if origin in (dict, collections.abc.Mapping):
+        schema = {"type": "object"}
+        if len(args) == 2:
+            schema["additionalProperties"] = to_json_schema(args[1])
+        return schema
+
+    if tp is bool:
+        return {"type": "boolean"}
+    elif tp is int:
+        return {"type": "integer"}
+    elif tp is float:
+        return {"type": "number"}
+    elif tp is str:
+        return {"type": "string"}
+    elif tp in (list, tuple, set, frozenset):
+        return {"type": "array"}
+    elif tp is dict:
+        return {"type": "object"}
+    elif tp is None or tp is type(None):
+        return {"type": "null"}
     else:
-        return 'null'
+        return {}
+
+def to_json_type(tp: type) -> str:
+    return to_json_schema(tp).get("type", 'null')
 
 def gen_function_schema(func: Callable[..., Any]) -> dict[str, Any]:
+    key = (func.__module__, func.__qualname__)
+    if key not in _function_schemas:
+        _function_schemas[key] = _build_function_schema(func)
+    return copy.deepcopy(_function_schemas[key])
+
+def _build_function_schema(func: Callable[..., Any]) -> dict[str, Any]:
     props = {}
     required = []
 
@@ -55,7 +128,7 @@ def gen_function_schema(func: Callable[..., Any]) -> dict[str, Any]:
             required.append(name)
 
         type_hint = param.annotation
-        props[name]["type"] = to_json_type(type_hint)
+        props[name].update(to_json_schema(type_hint))
 
         if is_annotated(type_hint):
             for metadata in type_hint.__metadata__:
@@ -78,18 +151,74 @@ def gen_function_schema(func: Callable[..., Any]) -> dict[str, Any]:
 
     return schema
 
-def gen_tools_schema(mod: ModuleType) -> list[dict]:
-    tools = []
-
-    for name, fn in inspect.getmembers(mod):
+def get_tool_functions(mod: ModuleType) -> dict[str, Callable[..., Any]]:
+    """Get the public, synchronous functions defined in `mod`, keyed by name."""
+    return {
+        name: fn
+        for name, fn in inspect.getmembers(mod)
         if (
             not name.startswith("_")
             and inspect.isfunction(fn)
+            and not inspect.iscoroutinefunction(fn)
+            and not inspect.isasyncgenfunction(fn)
             and fn.__module__ == mod.__name__
-        ):
-            tools.append({
-                "type": "function",
-                "function": gen_function_schema(fn)
-            })
+        )
+    }
+
+def gen_tools_schema(mod: ModuleType) -> list[dict]:
+    """Get the tools schema for every public function in `mod`.
+
+    The schema is computed at most once per process. If the module has an
+    up-to-date entry in the precompiled `TOOLS_SCHEMA_FILE` (see
+    `precompile_tools_schema`), that entry is used and no introspection happens.
+    """
+    if mod.__name__ not in _tools_schemas:
+        tools = _load_precompiled_tools_schema(mod)
+        if tools is None:
+            tools = [
+                {"type": "function", "function": gen_function_schema(fn)}
+                for fn in get_tool_functions(mod).values()
+            ]
+        _tools_schemas[mod.__name__] = tools
+
+    return copy.deepcopy(_tools_schemas[mod.__name__])
+
+def _module_source_hash(mod: ModuleType) -> str | None:
+    try:
+        with open(mod.__file__, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+def _load_precompiled_tools_schema(mod: ModuleType) -> list[dict] | None:
+    try:
+        with open(TOOLS_SCHEMA_FILE, "r") as f:
+            entry = json.load(f).get(mod.__name__)
+    except (OSError, ValueError):
+        return None
+
+    if entry is None or entry.get("sourceHash") != _module_source_hash(mod):
+        return None
+    return entry["tools"]
+
+def precompile_tools_schema(mods: list[ModuleType], path: Path | None = None) -> None:
+    """Write the tools schema of each module to a JSON file read by `gen_tools_schema`.
+
+    Entries are tagged with a hash of the module source, so a stale file is
+    ignored rather than served.
+    """
+    compiled = {}
+    for mod in mods:
+        compiled[mod.__name__] = {
+            "sourceHash": _module_source_hash(mod),
+            "tools": gen_tools_schema(mod),
+        }
+
+    with open(path or TOOLS_SCHEMA_FILE, "w") as f:
+        json.dump(compiled, f, indent=2)
+
+
+if __name__ == "__main__":
+    from genesys.tools import pubmed, sequence, structure
 
-    return tools
+    precompile_tools_schema([pubmed, sequence, structure])
@@ -1,12 +1,12 @@
+import base64
+import gzip
 import logging
+import os
+from functools import lru_cache
 logging.basicConfig(level=logging.INFO)
 import streamlit as st
-from stmol import showmol
-import py3Dmol
 from . import DNAToolKit
-from Bio.Phylo.TreeConstruction import DistanceCalculator, DistanceTreeConstructor
 from Bio import Phylo
-import matplotlib.pyplot as plt
 
 def count_clades(tree):
     terminals = tree.get_terminals()
@@ -27,6 +27,8 @@ def construct_phylogenetic_tree(filepath):
     Returns:
     - A Phylo.Tree object representing the phylogenetic tree.
     """
+    import matplotlib.pyplot as plt
+    from Bio.Phylo.TreeConstruction import DistanceCalculator, DistanceTreeConstructor
 
     aligned_seqs = DNAToolKit.multiple_sequence_alignment(filepath)
     calculator = DistanceCalculator("identity")
@@ -49,22 +51,159 @@ def construct_phylogenetic_tree(filepath):
     return tree
 
 
-def render_protein_file(pdb_file_content):
-    pdbview = py3Dmol.view(width=400, height=400)
-    pdbview.addModel(pdb_file_content, 'pdb')
-    bcolor = st.sidebar.color_picker('Pick A Background Color', '#FFFFFF')
-    style = st.sidebar.selectbox('style',['cartoon','line','cross','stick','sphere'])
-    spin = st.sidebar.checkbox('Spin', value = True)
-    pdbview.setStyle({style:{'color':'spectrum'}})
-    pdbview.setBackgroundColor(bcolor)
-    if spin:
-        pdbview.spin(True)
+# Above this many atoms the viewer gets a CA/P trace instead of every atom.
+LOD_ATOM_THRESHOLD = 50_000
+LOD_LEVELS = ("auto", "full", "trace")
+# Atoms kept for the backbone trace of proteins and nucleic acids
+TRACE_ATOMS = ["CA", "P"]
+
+VIEWER_JS = "https://cdn.jsdelivr.net/npm/3dmol@2.5.5/build/3Dmol-min.js"
+VIEWER_STYLES = ["cartoon", "line", "cross", "stick", "sphere"]
+
+
+def decimate_structure(structure, chains=None, level="auto", max_atoms=LOD_ATOM_THRESHOLD):
+    """
+    Reduce a structure to what the browser viewer can draw smoothly.
+
+    Parameters:
+    - structure: A `genesys.structure.Structure`.
+    - chains: Chain IDs to keep, or None for all of them.
+    - level: "full" keeps every atom, "trace" only the CA/P backbone atoms and
+      "auto" picks "trace" when there are more than `max_atoms` atoms.
+
+    Returns:
+    - (structure, level) with the level that was applied.
+    """
+    import numpy as np
+
+    if level not in LOD_LEVELS:
+        raise ValueError(f"Unknown level of detail: {level}")
+    if chains is not None:
+        structure = structure.select(np.isin(structure.chain_id, list(chains)))
+    if level == "auto":
+        level = "trace" if len(structure) > max_atoms else "full"
+    if level == "trace":
+        structure = structure.select(~structure.hetatm & np.isin(structure.atom_name, TRACE_ATOMS))
+    return structure, level
+
+
+@lru_cache(maxsize=8)
+def _structure_model(filepath, mtime_ns, size, chains, level, max_atoms):
+    from .structure import load_structure, structure_format, write_mmcif
+
+    structure = load_structure(filepath)
+    reduced, applied = decimate_structure(structure, chains, level, max_atoms)
+
+    if applied == "full" and chains is None:
+        # Nothing removed: send the file as uploaded, with its HELIX/SHEET records
+        with open(filepath, "rb") as f:
+            text = f.read()
+        if filepath.endswith(".gz"):
+            text = gzip.decompress(text)
+        fmt = "cif" if structure_format(filepath) == "mmcif" else "pdb"
     else:
-        pdbview.spin(False)
-    pdbview.zoomTo()
-    showmol(pdbview,height=500,width=800)
+        # mmCIF, as large assemblies have chain IDs and residue numbers the
+        # fixed-width PDB columns can't hold
+        text = write_mmcif(reduced).encode()
+        fmt = "cif"
+
+    logging.info(f"Prepared {filepath} for the viewer: {len(reduced)} of {len(structure)} atoms ({applied})")
+    return {
+        "payload": base64.b64encode(gzip.compress(text, mtime=0)).decode("ascii"),
+        "format": fmt,
+        "atoms": len(reduced),
+        "totalAtoms": len(structure),
+        "level": applied,
+    }
+
+
+def structure_model(filepath, chains=None, level="auto", max_atoms=LOD_ATOM_THRESHOLD):
+    """
+    Prepare a structure file for the viewer: decimated, gzipped and base64 encoded.
+
+    The result is cached until the file changes, so Streamlit reruns do not
+    parse or compress the structure again.
+
+    Returns:
+    - dict with "payload", "format", "atoms", "totalAtoms" and "level".
+    """
+    filepath = str(filepath)
+    chains = tuple(sorted(chains)) if chains is not None else None
+    stat = os.stat(filepath)
+    return _structure_model(filepath, stat.st_mtime_ns, stat.st_size, chains, level, max_atoms)
+
+
+def protein_view_html(model, width=800, height=500):
+    """
+    Build a standalone 3Dmol.js page for a model from `structure_model`.
+
+    Background colour, style and spin are controlled inside the page, so
+    changing them neither reruns the Streamlit script nor sends the model again.
+    """
+    options = "".join(f'<option value="{style}">{style}</option>' for style in VIEWER_STYLES)
+    return f"""
+<div style="font-family: sans-serif; font-size: 14px; margin-bottom: 4px">
+  <input type="color" id="bcolor" value="#FFFFFF">
+  <select id="style">{options}</select>
+  <label><input type="checkbox" id="spin" checked> Spin</label>
+  <span style="color: #888">{model["atoms"]:,} of {model["totalAtoms"]:,} atoms ({model["level"]})</span>
+</div>
+<div id="viewer" style="width: {width}px; height: {height}px; position: relative"></div>
+<script src="{VIEWER_JS}"></script>
+<script>
+(async () => {{
+  const bytes = Uint8Array.from(atob("{model["payload"]}"), c => c.charCodeAt(0));
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+  const data = await new Response(stream).text();
+
+  const viewer = $3Dmol.createViewer(document.getElementById("viewer"));
+  viewer.addModel(data, "{model["format"]}");
+
+  const bcolor = document.getElementById("bcolor");
+  const style = document.getElementById("style");
+  const spin = document.getElementById("spin");
+  const update = () => {{
+    viewer.setBackgroundColor(bcolor.value);
+    viewer.setStyle({{}}, {{[style.value]: {{color: "spectrum"}}}});
+    viewer.spin(spin.checked);
+    viewer.render();
+  }};
+  [bcolor, style, spin].forEach(input => input.addEventListener("input", update));
+  update();
+  viewer.zoomTo();
+  viewer.render();
+}})();
+</script>
+"""
+
+
+def render_protein_file(filepath):
+    """
+    Show a PDB or mmCIF file in a 3D viewer.
+
+    Structures with more than `LOD_ATOM_THRESHOLD` atoms are shown as a
+    backbone trace unless the sidebar asks for full detail or fewer chains.
+    """
+    import streamlit.components.v1 as components
+    from .structure import load_structure
+
+    structure = load_structure(filepath)
+    chains = structure.chains()
+    level = st.sidebar.selectbox('Level of detail', LOD_LEVELS)
+    selected = st.sidebar.multiselect('Chains', chains, default=chains)
+
+    model = structure_model(filepath, None if selected == chains else selected, level)
+    if model["level"] == "trace" and level == "auto":
+        st.sidebar.caption(f'{model["totalAtoms"]:,} atoms: showing the backbone trace. Pick fewer chains or "full" for every atom.')
+
+    # The page only changes with the model. Streamlit caches large elements in
+    # the browser by hash, so reruns send a reference instead of the payload
+    components.html(protein_view_html(model), height=540, width=820)
 
 def render_mol(xyz):
+    import py3Dmol
+    from stmol import showmol
+
     xyzview = py3Dmol.view(width=400,height=400)
     xyzview.addModel(xyz,'xyz')
     xyzview.setStyle({'stick':{}})
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from genesys.assistants import registry
+from genesys.assistants.base import BaseAssistant
+from genesys.tools import pubmed
+
+
+class _FakeAssistants:
+    """Stand-in for `client.beta.assistants` that counts remote calls."""
+
+    def __init__(self, existing=()):
+        self.existing = list(existing)
+        self.calls = []
+
+    def list(self, limit):
+        self.calls.append("list")
+        return iter(self.existing)
+
+    def create(self, **kwargs):
+        self.calls.append("create")
+        assistant = SimpleNamespace(id=f"asst_{len(self.existing)}", **kwargs)
+        self.existing.append(assistant)
+        return assistant
+
+    def update(self, assistant_id, **kwargs):
+        self.calls.append("update")
+        return SimpleNamespace(id=assistant_id, **kwargs)
+
+
+def _client(assistants):
+    return SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+
+
+def test_assistant_created_once_and_cached(tmp_path):
+    path = tmp_path / "assistants.json"
+    assistants = _FakeAssistants()
+    config = {"name": "Test Assistant", "model": "gpt-4", "instructions": "Help."}
+
+    first = registry.get_assistant_id(_client(assistants), path, **config)
+    second = registry.get_assistant_id(_client(assistants), path, **config)
+
+    assert first == second
+    assert assistants.calls == ["list", "create"]
+
+
+def test_remote_assistant_reused(tmp_path):
+    config = {"name": "Test Assistant", "model": "gpt-4"}
+    existing = SimpleNamespace(
+        id="asst_remote", name="Test Assistant", metadata={"config_hash": registry.config_hash(config)}
+    )
+    assistants = _FakeAssistants([existing])
+
+    assert registry.get_assistant_id(_client(assistants), tmp_path / "a.json", **config) == "asst_remote"
+    assert assistants.calls == ["list"]
+
+
+def test_changed_config_updates_in_place(tmp_path):
+    path = tmp_path / "assistants.json"
+    assistants = _FakeAssistants()
+
+    first = registry.get_assistant_id(_client(assistants), path, name="Test Assistant", instructions="Old.")
+    second = registry.get_assistant_id(_client(assistants), path, name="Test Assistant", instructions="New.")
+
+    assert first == second
+    assert assistants.calls == ["list", "create", "update"]
+
+
+def test_base_assistant_is_lazy(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("no network calls expected")
+
+    monkeypatch.setattr("genesys.assistants.base.OpenAI", fail)
+    assistant = BaseAssistant(tools_module=pubmed, name="Lazy Assistant")
+    assert repr(assistant) == "<BaseAssistant: Lazy Assistant>"
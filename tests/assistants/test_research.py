@@ -35,4 +35,108 @@ def test_assistant_conversation():
 
 
 def test_ra_create_assistant():
-    pass
\ No newline at end of file
+    pass
+
+class _FakeRuns:
+    """Stand-in for `client.beta.threads.runs` that replays canned run statuses."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.submitted = []
+
+    def retrieve(self, thread_id, run_id):
+        from types import SimpleNamespace
+        status = self.statuses.pop(0)
+        required_action = None
+        if status == "requires_action":
+            required_action = SimpleNamespace(
+                submit_tool_outputs=SimpleNamespace(model_dump=lambda: {"tool_calls": []})
+            )
+        return SimpleNamespace(id=run_id, status=status, required_action=required_action)
+
+    def submit_tool_outputs(self, thread_id, run_id, tool_outputs):
+        self.submitted.append(tool_outputs)
+
+
+def test_check_run_status_backoff(monkeypatch):
+    from types import SimpleNamespace
+
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    assistant = ResearchAssistant(api_key="test")
+    tool_outputs = [{"tool_call_id": "call_1", "output": "[]"}]
+    monkeypatch.setattr(assistant, "get_tool_outputs", lambda required_actions: tool_outputs)
+    runs = _FakeRuns(["queued", "in_progress", "requires_action", "in_progress", "failed"])
+    assistant.client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+
+    metrics = assistant.check_run_status("thread_1", "run_1")
+
+    assert sleeps == pytest.approx([0.1, 0.15, 0.1])
+    assert runs.submitted == [tool_outputs]
+    assert metrics["status"] == "failed"
+    assert metrics["tool_rounds"] == 1
+    assert metrics["status_checks"] == 5
+    assert assistant.run_metrics["run_1"] is metrics
+
+
+def _event(name, status=None, required_action=None):
+    from types import SimpleNamespace
+    return SimpleNamespace(event=name, data=SimpleNamespace(id="run_1", status=status, required_action=required_action))
+
+
+class _FakeStreamingRuns:
+    """Stand-in for `client.beta.threads.runs` that replays canned event streams."""
+
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.created = []
+        self.submitted = []
+
+    def create(self, thread_id, assistant_id, instructions, stream):
+        self.created.append((thread_id, assistant_id, stream))
+        return iter(self.streams.pop(0))
+
+    def submit_tool_outputs(self, thread_id, run_id, tool_outputs, stream):
+        self.submitted.append((run_id, tool_outputs, stream))
+        return iter(self.streams.pop(0))
+
+
+def test_stream_run_submits_tool_outputs(monkeypatch, capsys):
+    from types import SimpleNamespace
+
+    assistant = ResearchAssistant(api_key="test")
+    tool_calls = {"tool_calls": [{"id": "call_1", "function": {"name": "search", "arguments": "{}"}}]}
+    tool_outputs = [{"tool_call_id": "call_1", "output": "[]"}]
+    requested = []
+    monkeypatch.setattr(assistant, "get_tool_outputs", lambda required_actions: requested.append(required_actions) or tool_outputs)
+
+    required_action = SimpleNamespace(submit_tool_outputs=SimpleNamespace(model_dump=lambda: tool_calls))
+    runs = _FakeStreamingRuns([
+        [
+            _event("thread.run.created", "queued"),
+            _event("thread.run.in_progress", "in_progress"),
+            _event("thread.run.step.created"),
+            _event("thread.run.requires_action", "requires_action", required_action),
+        ],
+        [
+            _event("thread.run.in_progress", "in_progress"),
+            _event("thread.message.delta"),
+            _event("thread.run.completed", "completed"),
+        ],
+    ])
+    message = SimpleNamespace(role="assistant", content=[SimpleNamespace(type="text", text=SimpleNamespace(value="Found 0 papers"))])
+    messages = SimpleNamespace(list=lambda thread_id: SimpleNamespace(data=[message]))
+    assistant.client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs, messages=messages)))
+
+    metrics = assistant.stream_run("thread_1", "asst_1", "Be brief")
+
+    assert runs.created == [("thread_1", "asst_1", True)]
+    assert requested == [tool_calls]
+    assert runs.submitted == [("run_1", tool_outputs, True)]
+    assert metrics["status"] == "completed"
+    assert metrics["events"] == 7
+    assert metrics["tool_rounds"] == 1
+    assert metrics["first_action_seconds"] is not None
+    assert assistant.run_metrics["run_1"] is metrics
+    assert "Assistant: Found 0 papers" in capsys.readouterr().out
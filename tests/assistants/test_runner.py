@@ -0,0 +1,79 @@
+import collections
+import json
+import time
+import types
+
+import numpy as np
+from Bio.Seq import Seq
+
+from genesys.assistants.runner import ToolRunner, dumps, get_tool_runner
+
+tools = types.ModuleType("fake_tools")
+
+def _slow(seconds: float):
+    time.sleep(seconds)
+    return seconds
+
+def _counts(seq: str):
+    return collections.Counter(seq)
+
+def _fail():
+    raise ValueError("Unable to perform operation")
+
+for fn in (_slow, _counts, _fail):
+    fn.__module__ = tools.__name__
+    setattr(tools, fn.__name__.lstrip("_"), fn)
+
+
+def _tool_call(call_id, name, **arguments):
+    return {"id": call_id, "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def test_dumps_toolkit_types():
+    assert json.loads(dumps(collections.Counter("AAT"))) == {"A": 2, "T": 1}
+    assert json.loads(dumps({"seq": Seq("ATG")})) == {"seq": "ATG"}
+    assert json.loads(dumps({"gc": np.float64(0.5), "n": np.int64(3), "xyz": np.zeros(2)})) == {
+        "gc": 0.5, "n": 3, "xyz": [0.0, 0.0]
+    }
+
+
+def test_tool_calls_run_concurrently():
+    runner = ToolRunner(tools, max_workers=4)
+    start = time.monotonic()
+    outputs = runner.run([_tool_call(f"call_{i}", "slow", seconds=0.2) for i in range(4)])
+
+    assert time.monotonic() - start < 0.6
+    assert [o["tool_call_id"] for o in outputs] == ["call_0", "call_1", "call_2", "call_3"]
+    assert all(json.loads(o["output"]) == 0.2 for o in outputs)
+
+
+def test_tool_call_timeout_and_errors():
+    runner = ToolRunner(tools, timeout=0.1)
+    outputs = runner.run([
+        _tool_call("call_slow", "slow", seconds=0.5),
+        _tool_call("call_fail", "fail"),
+        _tool_call("call_counts", "counts", seq="GGC"),
+    ])
+
+    assert "timed out" in json.loads(outputs[0]["output"])["error"]
+    assert json.loads(outputs[1]["output"]) == {"error": "Unable to perform operation"}
+    assert json.loads(outputs[2]["output"]) == {"G": 2, "C": 1}
+
+
+def test_unknown_tool_and_bad_arguments():
+    outputs = ToolRunner(tools).run([
+        _tool_call("call_1", "nope"),
+        {"id": "call_2", "function": {"name": "counts", "arguments": "{not json"}},
+        {"id": "call_3", "function": {"name": "counts", "arguments": "[]"}},
+        _tool_call("call_4", "counts", seq="GGC"),
+    ])
+
+    assert [o["tool_call_id"] for o in outputs] == ["call_1", "call_2", "call_3", "call_4"]
+    assert json.loads(outputs[0]["output"]) == {"error": "Unknown tool: nope"}
+    assert json.loads(outputs[1]["output"])["error"].startswith("Invalid arguments for counts")
+    assert json.loads(outputs[2]["output"])["error"].startswith("Invalid arguments for counts")
+    assert json.loads(outputs[3]["output"]) == {"G": 2, "C": 1}
+
+
+def test_get_tool_runner_is_cached():
+    assert get_tool_runner(tools) is get_tool_runner(tools)
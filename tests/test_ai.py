@@ -123,15 +123,6 @@ def test_ask_orf():
     assert response_message.get("function_call")
     assert response_message["function_call"]["name"] == "open_reading_frames"
 
-def test_ask_phylo():
-    response = question_about_file(
-        "What is the phylogenetic tree of the given sequences?",
-        os.path.join(TEST_DATA_DIR, "msa.fasta")
-    )
-    response_message = response["choices"][0]["message"]
-    assert response_message.get("function_call")
-    assert response_message["function_call"]["name"] == "construct_phylogenetic_tree"
-
 def test_ask_snps():
     response = question_about_file(
         "What are the SNPs in the given sequences?",
@@ -154,3 +145,110 @@ def test_find_motifs():
 def test_run_conversation():
     filepath = os.path.join(TEST_DATA_DIR, "sequence.fasta")
     print(ai.run_conversation("What type of sequences are in this file?", filepath))
+
+def _tool_call(call_id, name, arguments):
+    from types import SimpleNamespace
+    return SimpleNamespace(
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+def test_execute_tool_calls():
+    filepath = os.path.join(TEST_DATA_DIR, "sequence.fasta")
+    args = f'{{"filepath": "{filepath}"}}'
+    timings = []
+    tool_messages = ai.execute_tool_calls(
+        [
+            _tool_call("call_gc", "gc_content", args),
+            _tool_call("call_mass", "mass_calculator", args),
+            _tool_call("call_orf", "open_reading_frames", args),
+        ],
+        timings,
+    )
+
+    assert [m["tool_call_id"] for m in tool_messages] == ["call_gc", "call_mass", "call_orf"]
+    assert all(m["role"] == "tool" for m in tool_messages)
+    assert tool_messages[0]["content"] == str(ai.sequence_tools.gc_content(filepath))
+    assert [t["name"] for t in timings] == ["gc_content", "mass_calculator", "open_reading_frames"]
+    assert all(t["seconds"] >= 0 for t in timings)
+
+def test_process_pool_does_not_fork_the_server(monkeypatch):
+    monkeypatch.setattr(ai, "_process_pool", None)
+    monkeypatch.setattr(ai.os, "cpu_count", lambda: 64)
+    pool = ai._get_process_pool()
+
+    try:
+        assert pool._mp_context.get_start_method() == "forkserver"
+        assert pool._max_workers == ai.MAX_TOOL_PROCESSES
+        assert ai._get_process_pool() is pool
+    finally:
+        pool.shutdown()
+
+def test_execute_tool_calls_bad_arguments():
+    tool_messages = ai.execute_tool_calls([_tool_call("call_1", "gc_content", "{not json")])
+    assert tool_messages[0]["content"] == "An error occurred while decoding the function arguments."
+
+@pytest.mark.parametrize("arguments", ["[]", '"x"', "null"])
+def test_execute_tool_calls_arguments_not_an_object(arguments):
+    tool_messages = ai.execute_tool_calls([_tool_call("call_1", "gc_content", arguments)])
+    assert tool_messages[0]["content"] == "The function arguments must be a JSON object."
+
+def test_execute_tool_calls_unexpected_argument():
+    tool_messages = ai.execute_tool_calls([_tool_call("call_1", "gc_content", '{"filepath": "tests/fixtures/sequence.fasta", "extra": 1}')])
+    assert tool_messages[0]["content"].startswith("An error occurred while running gc_content:")
+
+def _chunk(content=None, tool_calls=None):
+    from types import SimpleNamespace
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+def _tool_call_delta(index, call_id=None, name=None, arguments=None):
+    from types import SimpleNamespace
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+class _FakeAsyncOpenAI:
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.requests = []
+        self.chat = self
+        self.completions = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        chunks = self.rounds.pop(0)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+def test_stream_conversation(monkeypatch):
+    filepath = os.path.join(TEST_DATA_DIR, "sequence.fasta")
+    fake = _FakeAsyncOpenAI([
+        [
+            _chunk(tool_calls=[_tool_call_delta(0, "call_gc", "gc_content", '{"filepath": ')]),
+            _chunk(tool_calls=[_tool_call_delta(0, arguments=f'"{filepath}"}}')]),
+            _chunk(tool_calls=[_tool_call_delta(1, "call_mass", "mass_calculator", f'{{"filepath": "{filepath}"}}')]),
+        ],
+        [_chunk("The GC content "), _chunk("is 40%.")],
+    ])
+    monkeypatch.setattr(ai, "AsyncOpenAI", lambda: fake)
+
+    timings = []
+    answer = "".join(ai.stream_conversation("What is the GC content?", filepath, timings))
+
+    assert answer == "The GC content is 40%."
+    assert [t["tool_call_id"] for t in timings] == ["call_gc", "call_mass"]
+    tool_messages = [m for m in fake.requests[1]["messages"] if m["role"] == "tool"]
+    assert tool_messages[0]["content"] == str(ai.sequence_tools.gc_content(filepath))
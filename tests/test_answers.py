@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from genesys.answers import (
+    AnswerCache,
+    COLUMNS_QUESTION,
+    DESCRIBE_QUESTION,
+    HEAD_QUESTION,
+    SHAPE_QUESTION,
+    answer_question,
+    normalize_question,
+)
+
+DF = pd.DataFrame({"Name": ["John", "Jane", "Tom"], "Age": [28, 24, 22]})
+
+
+class _FakeLLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.questions = []
+
+    def __call__(self, question):
+        self.questions.append(question)
+        return self.answer
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(tmp_path / "answers.sqlite3")
+
+
+def test_normalize_question():
+    assert normalize_question("  What is the  AVERAGE age? ") == normalize_question("what is the average age")
+
+
+@pytest.mark.parametrize("question,expected", [
+    (SHAPE_QUESTION, (3, 2)),
+    (COLUMNS_QUESTION, ["Name", "Age"]),
+    ("what are the columns of the dataframe", ["Name", "Age"]),
+])
+def test_stock_questions_skip_the_llm(cache, question, expected):
+    llm = _FakeLLM("unused")
+    assert answer_question(DF, "df", question, llm, cache) == expected
+    assert llm.questions == []
+
+
+def test_stock_dataframe_answers(cache):
+    llm = _FakeLLM("unused")
+    pd.testing.assert_frame_equal(answer_question(DF, "df", DESCRIBE_QUESTION, llm, cache), DF.describe())
+    pd.testing.assert_frame_equal(answer_question(DF, "df", HEAD_QUESTION, llm, cache), DF.head(5))
+    assert llm.questions == []
+
+
+@pytest.mark.parametrize("answer", ["Jane is the youngest", np.int64(74), 24.666, pd.DataFrame({"Age": [28]})])
+def test_llm_answers_are_cached(cache, answer):
+    llm = _FakeLLM(answer)
+    first = answer_question(DF, "df", "What is the total age?", llm, cache)
+    again = answer_question(DF, "df", "what is the total age", llm, cache)
+
+    assert len(llm.questions) == 1
+    if isinstance(answer, pd.DataFrame):
+        pd.testing.assert_frame_equal(again, first)
+    else:
+        assert again == first
+
+    # A different dataframe asks again
+    answer_question(DF, "other", "What is the total age?", llm, cache)
+    assert len(llm.questions) == 2
+
+
+@pytest.mark.parametrize("answer", [None, "Unfortunately, I was not able to answer your question, because of the following error:\n..."])
+def test_charts_and_errors_are_not_cached(cache, answer):
+    llm = _FakeLLM(answer)
+    answer_question(DF, "df", "Plot the ages", llm, cache)
+    answer_question(DF, "df", "Plot the ages", llm, cache)
+
+    assert len(llm.questions) == 2
@@ -0,0 +1,234 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from genesys import client
+
+
+class _S3StandIn(BaseHTTPRequestHandler):
+    """Stores PUT bodies by path and serves them back on GET, like a presigned S3 URL."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: bytes = b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _should_fail(self) -> bool:
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            return True
+        return False
+
+    def do_PUT(self):
+        if "Content-Length" not in self.headers:
+            # S3 rejects chunked transfer encoding on presigned PUTs
+            return self._reply(501)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self._should_fail():
+            return self._reply(503)
+        self.server.objects[urlparse(self.path).path] = body
+        self._reply(200)
+
+    def _presign(self, params: dict) -> dict:
+        signed_at = datetime.fromtimestamp(time.time() - self.server.url_age, timezone.utc)
+        key = f"{params['user_id']}/{params['data_file']}/{params['filename']}"
+        url = (
+            f"http://127.0.0.1:{self.server.server_address[1]}/{key}"
+            f"?X-Amz-Date={signed_at:%Y%m%dT%H%M%SZ}&X-Amz-Expires={self.server.url_expires}"
+        )
+        result = {"upload_url": url}
+        if params["data_file"] == "session-group":
+            result["session_group_exists"] = f"/{key}" in self.server.objects
+        return result
+
+    def do_POST(self):
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.server.batch:
+            return self._reply(404)
+        if self.server.batch_status != 200:
+            return self._reply(self.server.batch_status)
+        results = [self._presign(params) for params in body["requests"]][:self.server.batch_limit]
+        self._reply(200, json.dumps({"results": results}).encode())
+
+    def do_GET(self):
+        if self.path.startswith("/presign?"):
+            self.server.requests.append((self.command, self.path, dict(self.headers)))
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            return self._reply(200, json.dumps(self._presign(params)).encode())
+        if self._should_fail():
+            return self._reply(503)
+        path = urlparse(self.path).path
+        if path not in self.server.objects:
+            return self._reply(404)
+        self._reply(200, self.server.objects[path])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _S3StandIn)
+    server.objects = {}
+    server.requests = []
+    server.failures = 0
+    server.batch = True
+    server.batch_status = 200
+    server.batch_limit = None
+    server.url_age = 0
+    server.url_expires = 3600
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(client, "RETRY_BACKOFF", 0)
+    monkeypatch.setattr(client, "API_URL", f"http://127.0.0.1:{server.server_address[1]}/presign")
+    monkeypatch.setattr(client, "_batch_supported", True)
+    client.clear_presigned_cache()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, key):
+    return f"http://127.0.0.1:{server.server_address[1]}/{key}"
+
+
+def test_upload_and_download_content(s3):
+    assert client.upload_content_to_s3(_url(s3, "a.txt"), "abcde") == 200
+    assert client.download_content_from_s3(_url(s3, "a.txt")) == b"abcde"
+
+
+def test_upload_file_is_streamed_with_content_length(s3, tmp_path, monkeypatch):
+    monkeypatch.setattr(client, "CHUNK_SIZE", 1000)
+    path = tmp_path / "reads.fastq"
+    data = b"@r1\nACGT\n+\nIIII\n" * 1000
+    path.write_bytes(data)
+
+    with open(path, "rb") as f:
+        assert client.upload_content_to_s3(_url(s3, "reads.fastq"), f) == 200
+
+    assert s3.objects["/reads.fastq"] == data
+    _, _, headers = s3.requests[-1]
+    assert headers["Content-Length"] == str(len(data))
+    assert "Transfer-Encoding" not in headers
+
+
+def test_download_file_streams_to_disk(s3, tmp_path):
+    s3.objects["/seqs.fasta"] = b">seq\nACGT\n" * 10000
+    path = tmp_path / "seqs.fasta"
+
+    assert client.download_file_from_s3(_url(s3, "seqs.fasta"), path) == 200
+    assert path.read_bytes() == s3.objects["/seqs.fasta"]
+
+
+def test_upload_retries_with_file_rewound(s3, tmp_path):
+    s3.failures = 2
+    path = tmp_path / "seqs.fasta"
+    path.write_bytes(b">seq\nACGT\n")
+
+    with open(path, "rb") as f:
+        assert client.upload_content_to_s3(_url(s3, "seqs.fasta"), f) == 200
+
+    assert len(s3.requests) == 3
+    assert s3.objects["/seqs.fasta"] == b">seq\nACGT\n"
+
+
+def test_retries_give_up(s3):
+    s3.failures = client.MAX_RETRIES + 1
+    assert client.upload_content_to_s3(_url(s3, "a.txt"), "abcde") == 503
+    assert len(s3.requests) == client.MAX_RETRIES + 1
+
+
+def test_client_is_pooled():
+    assert client.get_http_client() is client.get_http_client()
+
+
+def _presign_requests(server):
+    return [r for r in server.requests if r[1].startswith("/presign")]
+
+
+def test_presigned_urls_are_reused(s3):
+    client.upload_s3("abcde", "charlie", "a.txt", "Text")
+    client.upload_s3("fghij", "charlie", "a.txt", "Text")
+
+    assert len(_presign_requests(s3)) == 1
+    assert client.download_s3("charlie", "a.txt", "Text") == b"fghij"
+    assert len(_presign_requests(s3)) == 2
+
+
+def test_expired_presigned_urls_are_refreshed(s3):
+    s3.url_age = 3600 - client.URL_EXPIRY_MARGIN + 1
+    client.upload_s3("abcde", "charlie", "a.txt", "Text")
+    client.upload_s3("abcde", "charlie", "a.txt", "Text")
+
+    assert len(_presign_requests(s3)) == 2
+
+
+def test_upload_marks_session_group_as_existing(s3):
+    url, exists = client.get_s3_download_url("charlie", data_file="session-group")
+    assert not exists
+
+    client.upload_s3("[]", "charlie", data_file="session-group")
+
+    assert client.get_s3_download_url("charlie", data_file="session-group") == (url, True)
+    assert len(_presign_requests(s3)) == 2
+
+
+def test_presign_many_uses_one_batch_request(s3):
+    keys = [("download", "charlie", "test_file", "session-group"), ("upload", "charlie", "test_file", "session-group")]
+
+    results = client.presign_many(keys)
+    assert [r["upload_url"] for r in results] == [client.presign(*key)["upload_url"] for key in keys]
+    assert [r[0] for r in _presign_requests(s3)] == ["POST"]
+
+    client.presign_many(keys)
+    assert len(_presign_requests(s3)) == 1
+
+
+def test_presign_many_falls_back_without_batch_endpoint(s3):
+    s3.batch = False
+    keys = [("download", "charlie", "test_file", "session-group"), ("upload", "charlie", "test_file", "session-group")]
+
+    client.presign_many(keys)
+
+    assert [r[0] for r in _presign_requests(s3)] == ["POST", "GET", "GET"]
+    assert not client._batch_supported
+
+
+def test_presign_many_keeps_batching_after_server_errors(s3):
+    s3.batch_status = 500
+    keys = [("download", "charlie", "test_file", "session-group"), ("upload", "charlie", "test_file", "session-group")]
+
+    results = client.presign_many(keys)
+
+    assert all(r["upload_url"] for r in results)
+    assert [r[0] for r in _presign_requests(s3)][-2:] == ["GET", "GET"]
+    assert client._batch_supported
+
+
+def test_presign_many_with_missing_batch_results(s3):
+    s3.batch_limit = 1
+    keys = [("upload", "charlie", f"file_{i}", "FASTA") for i in range(3)]
+
+    results = client.presign_many(keys)
+
+    assert [r["upload_url"].split("?")[0] for r in results] == [_url(s3, f"charlie/FASTA/file_{i}") for i in range(3)]
+    assert [r[0] for r in _presign_requests(s3)] == ["POST", "GET", "GET", "GET"]
+
+
+def test_iter_s3_object(s3, monkeypatch):
+    monkeypatch.setattr(client, "CHUNK_SIZE", 4)
+    s3.objects["/charlie/session-log/index.jsonl"] = b'{"sessionId": "a"}\n'
+
+    chunks = client.iter_s3_object("charlie", "index.jsonl", "session-log", chunk_size=4)
+    assert b"".join(chunks) == b'{"sessionId": "a"}\n'
+    assert client.iter_s3_object("charlie", "missing.jsonl", "session-log") is None
@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from genesys.csvprofile import HyperLogLog, profile_csv, profile_dataframe
+
+
+def _csv(df: pd.DataFrame) -> io.StringIO:
+    return io.StringIO(df.to_csv(index=False))
+
+
+@pytest.mark.parametrize("n", [10, 1000, 100_000])
+def test_hyperloglog_accuracy(n):
+    hll = HyperLogLog()
+    values = pd.Series(np.arange(n))
+    # Duplicates must not change the estimate
+    hll.add_series(values)
+    hll.add_series(values)
+
+    assert abs(hll.count() - n) / n < 0.05
+
+
+def test_profile_csv_matches_whole_file():
+    df = pd.DataFrame({
+        "Name": ["John", "Jane", None, "Tom", "Alice", "John", "Bob", "Eve"],
+        "Age": [28, 24, 22, None, 27, 28, 31, 40],
+        "City": ["NY", "LA", "NY", "NY", "LA", "SF", "SF", "NY"],
+    })
+
+    metadata = profile_csv(_csv(df), chunksize=3)
+    columns = {column["Name"]: column for column in metadata["columns"]}
+
+    assert metadata["rows"] == 8
+    assert columns["Name"]["possibleValues"] == ["John", "Jane", "Tom", "Alice", "Bob"]
+    assert columns["Name"]["nullCount"] == 1
+    assert columns["City"]["possibleValues"] == ["NY", "LA", "SF"]
+    assert columns["City"]["approxDistinct"] == 3
+    # The first chunk has no nulls in Age, later ones do
+    assert columns["Age"]["Type"] == str(pd.read_csv(_csv(df))["Age"].dtype) == "float64"
+
+
+def test_profile_csv_widens_mixed_columns():
+    csv = io.StringIO("a,b\n1,x\n2,y\n3.5,1\nz,2\n")
+
+    columns = {column["Name"]: column for column in profile_csv(csv, chunksize=2)["columns"]}
+
+    assert columns["a"]["Type"] == "object"
+    assert columns["b"]["Type"] == "object"
+
+
+def test_profile_dataframe():
+    df = pd.DataFrame({"x": [1, 2, 2, 3, 4, 5, 6]})
+
+    metadata = profile_dataframe(df, chunksize=2, samples=3)
+
+    assert metadata["rows"] == 7
+    assert metadata["columns"] == [{
+        "Name": "x",
+        "Type": "int64",
+        "possibleValues": [1, 2, 3],
+        "nullCount": 0,
+        "approxDistinct": 6,
+    }]
@@ -0,0 +1,210 @@
+import json
+import time
+
+import pytest
+
+from genesys import eventcreator as ec
+from genesys.storage import LocalStorage, StorageError
+
+
+class _RecordingStorage(LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.puts = []
+        self.reads = []
+        self.prepared = []
+
+    def iter_chunks(self, user_id, data_file, filename):
+        self.reads.append((user_id, data_file, filename))
+        return super().iter_chunks(user_id, data_file, filename)
+
+    def put(self, user_id, data_file, filename, content):
+        super().put(user_id, data_file, filename, content)
+        self.puts.append(filename)
+
+    def prepare_puts(self, user_id, data_file, filenames):
+        self.prepared.append(filenames)
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    storage = _RecordingStorage(tmp_path / "storage")
+    monkeypatch.setattr(ec, "get_storage", lambda: storage)
+    monkeypatch.setattr(ec, "WAL_DIR", tmp_path / "wal")
+    monkeypatch.setattr(ec, "_writers", {})
+    # Write every event straight away unless a test batches them
+    monkeypatch.setattr(ec, "FLUSH_EVENTS", 1)
+    monkeypatch.setattr(ec, "FLUSH_INTERVAL", 3600)
+    return storage
+
+
+def test_events_are_appended_as_segments(storage):
+    session = ec.create_session("session-1", "charlie")
+    storage.puts.clear()
+
+    ec.create_message_event("charlie", session, "hello")
+    ec.create_response_event("charlie", session, "hi")
+
+    # One small write per event, never the whole history
+    assert storage.puts == ["session-1-000000.jsonl", "session-1-000001.jsonl"]
+    assert ec.get_session("charlie", "session-1")["sessionData"] == session["sessionData"]
+
+
+def test_list_session_ids_reads_only_the_index(storage, monkeypatch):
+    for session_id in ("session-1", "session-2"):
+        session = ec.create_session(session_id, "charlie")
+        ec.create_message_event("charlie", session, "hello")
+    ec.create_session("session-1", "charlie")
+
+    storage.reads.clear()
+
+    assert ec.list_session_ids("charlie") == ["session-1", "session-2"]
+    assert storage.reads == [("charlie", ec.SESSION_LOG, ec.INDEX_FILE)]
+
+
+def test_compaction_writes_snapshot(storage, monkeypatch):
+    monkeypatch.setattr(ec, "COMPACT_EVERY", 3)
+    session = ec.create_session("session-1", "charlie")
+    for i in range(4):
+        ec.create_message_event("charlie", session, f"message {i}")
+
+    assert "session-1-snapshot.jsonl" in storage.puts
+    restored = ec.get_session("charlie", "session-1")
+    assert [event["detail"]["text"] for event in restored["sessionData"]] == [f"message {i}" for i in range(4)]
+    assert restored["segments"] == 4
+
+    # A restored session keeps appending after the existing segments
+    ec.create_message_event("charlie", restored, "message 4")
+    assert storage.puts[-1] == "session-1-000004.jsonl"
+    assert len(ec.get_session("charlie", "session-1")["sessionData"]) == 5
+
+
+def test_segment_urls_are_presigned_ahead(storage):
+    session = ec.create_session("session-1", "charlie")
+    for i in range(ec.PRESIGN_AHEAD + 1):
+        ec.create_message_event("charlie", session, f"message {i}")
+
+    assert len(storage.prepared) == 2
+    assert storage.prepared[1][0] == f"session-1-{ec.PRESIGN_AHEAD:06d}.jsonl"
+
+
+def test_migrate_session_group(storage, tmp_path):
+    legacy = [{"sessionId": "old", "sessionData": [{"event": "message", "detail": {"text": "hi \"there\"", "uTime": "1"}}]}]
+    legacy_storage = LocalStorage(tmp_path / "s3")
+    legacy_storage.put("charlie", "session-group", "test_file", json.dumps(legacy))
+
+    ec.migrate_session_group("charlie", legacy_storage)
+
+    assert ec.list_session_ids("charlie") == ["old"]
+    assert ec.get_session_group("charlie")[0]["sessionData"] == legacy[0]["sessionData"]
+
+
+def test_events_are_batched_into_one_write(storage, monkeypatch):
+    monkeypatch.setattr(ec, "FLUSH_EVENTS", 3)
+    session = ec.create_session("session-1", "charlie")
+    storage.puts.clear()
+
+    ec.create_message_event("charlie", session, "hello")
+    ec.create_response_event("charlie", session, "hi")
+    assert storage.puts == []
+
+    ec.flush_session("charlie", session)
+    assert storage.puts == ["session-1-000000.jsonl"]
+    assert ec.get_session("charlie", "session-1")["sessionData"] == session["sessionData"]
+
+    for i in range(3):
+        ec.create_message_event("charlie", session, f"message {i}")
+    assert storage.puts == ["session-1-000000.jsonl", "session-1-000001.jsonl"]
+
+
+def test_events_are_flushed_after_interval(storage, monkeypatch):
+    monkeypatch.setattr(ec, "FLUSH_EVENTS", 100)
+    monkeypatch.setattr(ec, "FLUSH_INTERVAL", 0.05)
+    session = ec.create_session("session-1", "charlie")
+
+    ec.create_message_event("charlie", session, "hello")
+    ec.create_message_event("charlie", session, "again")
+    ec.get_session_writer("charlie", session).timer.join()
+
+    assert len(ec.get_session("charlie", "session-1")["sessionData"]) == 2
+
+
+def test_end_session_flushes(storage, monkeypatch):
+    monkeypatch.setattr(ec, "FLUSH_EVENTS", 100)
+    session = ec.create_session("session-1", "charlie")
+    ec.create_message_event("charlie", session, "hello")
+
+    ec.end_session("charlie", session)
+
+    assert len(ec.get_session("charlie", "session-1")["sessionData"]) == 1
+    assert list((ec.WAL_DIR / "charlie").iterdir()) == []
+
+
+def test_unflushed_events_are_recovered(storage, monkeypatch):
+    monkeypatch.setattr(ec, "FLUSH_EVENTS", 100)
+    session = ec.create_session("session-1", "charlie")
+    ec.create_message_event("charlie", session, "written")
+    ec.flush_session("charlie", session)
+    ec.create_message_event("charlie", session, "lost")
+    ec.create_message_event("charlie", session, "also lost")
+
+    # The process dies before flushing; a new one picks up the write-ahead file
+    monkeypatch.setattr(ec, "_writers", {})
+    assert ec.recover_sessions("charlie") == ["session-1"]
+
+    texts = [event["detail"]["text"] for event in ec.get_session("charlie", "session-1")["sessionData"]]
+    assert texts == ["written", "lost", "also lost"]
+    assert ec.recover_sessions("charlie") == []
+
+
+def test_failed_flush_keeps_events_pending(storage, monkeypatch):
+    session = ec.create_session("session-1", "charlie")
+    def fail(*args):
+        raise StorageError("HTTP 503")
+    monkeypatch.setattr(storage, "put", fail)
+
+    ec.create_message_event("charlie", session, "hello")
+
+    assert ec.get_session_writer("charlie", session).pending() == 1
+    assert (ec.WAL_DIR / "charlie" / "session-1.jsonl").exists()
+
+
+def test_compressed_and_plain_segments_mix(storage, monkeypatch):
+    session = ec.create_session("session-1", "charlie")
+    ec.create_message_event("charlie", session, "plain")
+    monkeypatch.setattr(ec, "SESSION_COMPRESSION", "gzip")
+    ec.create_message_event("charlie", session, "compressed")
+
+    assert storage.get("charlie", ec.SESSION_LOG, "session-1-000001.jsonl").startswith(ec.GZIP_MAGIC)
+    texts = [event["detail"]["text"] for event in ec.get_session("charlie", "session-1")["sessionData"]]
+    assert texts == ["plain", "compressed"]
+
+
+def test_iter_jsonl_across_chunks():
+    content = b'{"text": "caf\xc3\xa9"}\n{"text": "a\\nb"}\n'
+    chunks = [content[i:i + 3] for i in range(0, len(content), 3)]
+    assert list(ec.iter_jsonl(chunks)) == [{"text": "caf\u00e9"}, {"text": "a\nb"}]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1000])
+def test_iter_json_array_across_chunks(chunk_size):
+    value = [{"sessionId": "a", "sessionData": [{"text": 'b"c\\d', "n": [1, 2]}]}, 12345, "caf\u00e9", [], {}]
+    content = json.dumps(value).encode()
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+    assert list(ec.iter_json_array(chunks)) == value
+    assert list(ec.iter_json_array([b" [ ] "])) == []
+    with pytest.raises(ValueError):
+        list(ec.iter_json_array([b'[{"a": 1}']))
+
+
+def test_iter_json_array_large_element_is_linear():
+    # One multi-MB session spread over many chunks
+    session = {"sessionId": "big", "sessionData": [{"text": 'say "hi" \\ ' * 20, "n": [1, {"a": "]"}]}] * 25000}
+    content = json.dumps([session, 1]).encode()
+    chunks = [content[i:i + 64 * 1024] for i in range(0, len(content), 64 * 1024)]
+    assert len(content) > 5_000_000
+
+    start = time.perf_counter()
+    assert list(ec.iter_json_array(chunks)) == [session, 1]
+    assert time.perf_counter() - start < 5
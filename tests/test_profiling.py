@@ -0,0 +1,19 @@
+from genesys import profiling
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       272 |        272 |   _io
+import time:      1200 |       1500 |   json.decoder
+import time:       300 |       1800 | json
+"""
+
+def test_parse_importtime():
+    timings = profiling.parse_importtime(IMPORTTIME_OUTPUT)
+    assert [t["module"] for t in timings] == ["_io", "json.decoder", "json"]
+    assert timings[-1] == {"module": "json", "depth": 0, "self_us": 300, "cumulative_us": 1800}
+    assert timings[1]["depth"] == 1
+
+def test_startup_skips_heavy_modules():
+    imported = {t["module"] for t in profiling.profile_imports(profiling.STARTUP_MODULES)}
+    for heavy in ("pandas", "pandasai", "openai", "Bio", "py3Dmol", "matplotlib", "httpx"):
+        assert heavy not in imported
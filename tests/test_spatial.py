@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from genesys import spatial
+from genesys.spatial import CellList, contact_map, neighbours, residue_pairs, spatial_index
+from genesys.structure import load_structure, parse_pdb
+
+INSULIN = "tests/fixtures/insulin.pdb"
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).uniform(0, 30, (1500, 3)).astype(np.float32)
+
+
+def brute_force_pairs(a, b, radius):
+    distance = ((a[:, None] - b[None]) ** 2).sum(axis=-1)
+    return set(zip(*np.nonzero(distance <= np.float32(radius) ** 2)))
+
+
+@pytest.mark.parametrize("radius", [2.0, 5.0, 9.0])
+def test_pairs_match_brute_force(points, radius):
+    i, j = CellList(points).pairs(radius)
+
+    assert np.all(i < j)
+    assert len(i) == len(set(zip(i, j)))
+    assert set(zip(i, j)) == {(a, b) for a, b in brute_force_pairs(points, points, radius) if a < b}
+
+
+@pytest.mark.parametrize("radius", [3.0, 12.0])
+def test_query_pairs_match_brute_force(points, radius):
+    queries = np.random.default_rng(1).uniform(-10, 40, (200, 3)).astype(np.float32)
+    i, j = CellList(points).query_pairs(queries, radius)
+
+    assert set(zip(i, j)) == brute_force_pairs(queries, points, radius)
+
+
+def test_batches(points, monkeypatch):
+    monkeypatch.setattr(spatial, "BATCH_SIZE", 7)
+    i, j = CellList(points).pairs(4.0)
+
+    assert set(zip(i, j)) == {(a, b) for a, b in brute_force_pairs(points, points, 4.0) if a < b}
+
+
+def test_ids(points):
+    ids = np.arange(len(points)) * 10
+    index = CellList(points, ids=ids)
+
+    assert index.within(points[:1], 0.0).tolist() == [0]
+    assert index.within(points[5:6], 0.0).tolist() == [50]
+
+
+def test_empty_index():
+    index = CellList(np.zeros((0, 3)))
+
+    assert len(index.within([0, 0, 0], 5.0)) == 0
+    assert len(index.pairs(5.0)[0]) == 0
+
+
+def test_index_is_cached_per_structure():
+    structure = load_structure(INSULIN)
+
+    assert spatial_index(structure) is spatial_index(structure)
+    assert spatial_index(structure, ("CA",)) is spatial_index(structure, ("CA",))
+    assert len(spatial_index(structure, ("CA",))) == 46
+
+
+def test_residue_pairs():
+    structure = load_structure(INSULIN)
+    # Atoms 0 and 1 are both in residue 0; atom 10 is in residue 1
+    pairs = residue_pairs(structure, np.array([0, 10, 10]), np.array([1, 0, 1]))
+
+    assert pairs.tolist() == [[0, 1]]
+
+
+def test_contact_map():
+    structure = load_structure(INSULIN)
+    pairs = contact_map(structure, 8.0)
+    ca = structure.coords[(structure.atom_name == "CA") & ~structure.hetatm]
+    expected = {(a, b) for a, b in brute_force_pairs(ca, ca, 8.0) if a < b}
+
+    assert {tuple(pair) for pair in pairs.tolist()} == expected
+
+
+def test_contact_map_skips_calcium_ions():
+    structure = parse_pdb([
+        b"ATOM      1  CA  GLY A   1       0.000   0.000   0.000  1.00  0.00           C\n",
+        b"ATOM      2  CA  GLY A   2       3.800   0.000   0.000  1.00  0.00           C\n",
+        b"HETATM    3 CA    CA A 101       1.900   2.000   0.000  1.00  0.00          CA\n",
+    ])
+
+    assert spatial_index(structure, ("CA",)).within([1.9, 2.0, 0.0], 0.5).tolist() == []
+    assert contact_map(structure, 8.0).tolist() == [[0, 1]]
+
+
+def test_neighbours():
+    structure = load_structure(INSULIN)
+    chain_a = ~structure.hetatm & (structure.chain_id == "A")
+    chain_b = ~structure.hetatm & (structure.chain_id == "B")
+    atoms_a, atoms_b = neighbours(structure, chain_a, chain_b, 4.0)
+
+    close = brute_force_pairs(structure.coords[chain_a], structure.coords[chain_b], 4.0)
+    assert atoms_a.tolist() == sorted({np.flatnonzero(chain_a)[i] for i, _ in close})
+    assert atoms_b.tolist() == sorted({np.flatnonzero(chain_b)[j] for _, j in close})
@@ -0,0 +1,94 @@
+import pytest
+
+from genesys.storage import LocalStorage, MirroredStorage, S3Storage, Storage, StorageError, create_storage
+
+
+class _FlakyRemote(LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.gets = 0
+        self.fail = False
+
+    def get(self, *key):
+        self.gets += 1
+        return super().get(*key)
+
+    def put(self, *args):
+        if self.fail:
+            raise StorageError("HTTP 503")
+        super().put(*args)
+
+
+def test_local_storage_roundtrip(tmp_path):
+    storage = LocalStorage(tmp_path)
+    assert storage.get("charlie", "FASTA", "a.fasta") is None
+
+    storage.put("charlie", "FASTA", "a.fasta", ">seq\nACGT\n")
+    assert storage.get("charlie", "FASTA", "a.fasta") == b">seq\nACGT\n"
+
+    source = tmp_path / "b.fasta"
+    source.write_bytes(b">b\nGG\n")
+    storage.put_file("charlie", "FASTA", "b.fasta", source)
+    assert storage.get("charlie", "FASTA", "b.fasta") == b">b\nGG\n"
+
+
+def test_local_storage_rejects_paths_outside_root(tmp_path):
+    storage = LocalStorage(tmp_path / "storage")
+    with pytest.raises(StorageError):
+        storage.put("charlie", "FASTA", "../../../escape", "x")
+
+
+def test_mirrored_storage_reads_locally(tmp_path):
+    remote = _FlakyRemote(tmp_path / "remote")
+    remote.put("charlie", "pdb", "old.pdb", "ATOM")
+    storage = MirroredStorage(LocalStorage(tmp_path / "local"), remote)
+
+    # Unknown objects are fetched once and then served from disk
+    assert storage.get("charlie", "pdb", "old.pdb") == b"ATOM"
+    assert storage.get("charlie", "pdb", "old.pdb") == b"ATOM"
+    assert remote.gets == 1
+
+    # Misses are remembered until the object is written
+    assert storage.get("charlie", "pdb", "new.pdb") is None
+    assert storage.get("charlie", "pdb", "new.pdb") is None
+    assert remote.gets == 2
+    storage.put("charlie", "pdb", "new.pdb", "HETATM")
+    assert storage.get("charlie", "pdb", "new.pdb") == b"HETATM"
+    assert remote.get("charlie", "pdb", "new.pdb") == b"HETATM"
+
+
+def test_mirrored_storage_survives_remote_failure(tmp_path):
+    remote = _FlakyRemote(tmp_path / "remote")
+    remote.fail = True
+    storage = MirroredStorage(LocalStorage(tmp_path / "local"), remote)
+
+    storage.put("charlie", "csv", "a.csv", "a,b\n1,2\n")
+
+    assert storage.get("charlie", "csv", "a.csv") == b"a,b\n1,2\n"
+    assert remote.get("charlie", "csv", "a.csv") is None
+
+
+def test_incomplete_backend_cannot_be_created():
+    class ReadOnly(Storage):
+        def get(self, user_id, data_file, filename):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+
+def test_create_storage():
+    assert isinstance(create_storage("local"), LocalStorage)
+    assert isinstance(create_storage("s3"), S3Storage)
+    assert isinstance(create_storage("local+s3"), MirroredStorage)
+    with pytest.raises(ValueError):
+        create_storage("ftp")
+
+
+def test_local_storage_iter_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("genesys.storage.CHUNK_SIZE", 3)
+    storage = LocalStorage(tmp_path)
+    storage.put("charlie", "session-log", "index.jsonl", "abcdefg")
+
+    assert list(storage.iter_chunks("charlie", "session-log", "index.jsonl")) == [b"abc", b"def", b"g"]
+    assert storage.iter_chunks("charlie", "session-log", "missing.jsonl") is None
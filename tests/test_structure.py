@@ -0,0 +1,323 @@
+import gzip
+import shutil
+
+import numpy as np
+import pytest
+
+from genesys.structure import load_models, load_structure, parse_mmcif, parse_mmcif_models, parse_pdb, structure_format, write_mmcif, write_pdb
+from genesys.tools import structure as structure_tools
+
+INSULIN = "tests/fixtures/insulin.pdb"
+
+MMCIF = b"""data_TEST
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_asym_id
+_atom_site.pdbx_PDB_model_num
+ATOM 1 N N . GLY A 1 ? 1.000 0.000 0.000 1.00 10.00 1 A 1
+ATOM 2 C CA . GLY A 1 ? 2.000 0.000 0.000 1.00 10.00 1 A 1
+ATOM 3 C CA A ALA A 2 ? 3.000 0.000 0.000 0.50 10.00 2 A 1
+ATOM 4 C CA B ALA A 2 ? 3.500 0.000 0.000 0.50 10.00 2 A 1
+HETATM 5 O "O5'" . HOH B . ? 9.000 9.000 9.000 1.00 20.00 101 W 1
+ATOM 6 N N . GLY A 1 ? 5.000 0.000 0.000 1.00 10.00 1 A 2
+#
+"""
+
+
+def pdb_line(record, serial, name, res_name, chain, res_seq, xyz, alt_loc=" "):
+    x, y, z = xyz
+    return (
+        f"{record:<6}{serial:>5} {name:<4}{alt_loc}{res_name:>3} {chain}{res_seq:>4}    "
+        f"{x:8.3f}{y:8.3f}{z:8.3f}{1.0:6.2f}{0.0:6.2f}          {name[0]:>2}\n"
+    ).encode()
+
+
+def test_load_pdb():
+    structure = load_structure(INSULIN)
+
+    assert len(structure) == 371
+    assert structure.coords.dtype == np.float32
+    assert structure.coords.shape == (371, 3)
+    assert structure.chains() == ["A", "B"]
+    assert structure.hetatm.sum() == 37
+    assert structure.res_name[0] == "GLY"
+    assert structure.atom_name[:4].tolist() == ["N", "CA", "C", "O"]
+
+
+def test_first_model_and_alt_loc_only():
+    lines = [
+        b"MODEL        1\n",
+        pdb_line("ATOM", 1, "CA", "GLY", "A", 1, (0, 0, 0)),
+        pdb_line("ATOM", 2, "CA", "ALA", "A", 2, (1, 0, 0), alt_loc="A"),
+        pdb_line("ATOM", 3, "CA", "ALA", "A", 2, (1.5, 0, 0), alt_loc="B"),
+        b"ENDMDL\n",
+        b"MODEL        2\n",
+        pdb_line("ATOM", 1, "CA", "GLY", "A", 1, (5, 0, 0)),
+        b"ENDMDL\n",
+    ]
+    structure = parse_pdb(lines)
+
+    assert structure.coords.tolist() == [[0, 0, 0], [1, 0, 0]]
+    assert structure.sequence("A") == "GA"
+
+
+def test_first_alt_loc_of_each_atom():
+    lines = [
+        pdb_line("ATOM", 1, "CA", "SER", "A", 1, (0, 0, 0), alt_loc="A"),
+        pdb_line("ATOM", 2, "CA", "SER", "A", 1, (0.5, 0, 0), alt_loc="B"),
+        pdb_line("ATOM", 3, "CA", "LEU", "A", 2, (4, 0, 0), alt_loc="B"),
+        pdb_line("ATOM", 4, "CA", "LEU", "A", 2, (4.5, 0, 0), alt_loc="C"),
+    ]
+
+    assert parse_pdb(lines).coords[:, 0].tolist() == [0, 4]
+
+    mmcif = MMCIF.replace(
+        b"ATOM 6 N N . GLY A 1 ? 5.000",
+        b"ATOM 7 C CB C ALA A 2 ? 4.000 0.000 0.000 0.50 10.00 2 A 1\n"
+        b"ATOM 8 C CB B ALA A 2 ? 4.500 0.000 0.000 0.50 10.00 2 A 1\n"
+        b"ATOM 6 N N . GLY A 1 ? 5.000",
+    )
+    structure = parse_mmcif(mmcif.splitlines(keepends=True))
+
+    assert structure.atom_name.tolist() == ["N", "CA", "CA", "O5'", "CB"]
+    assert structure.coords[:, 0].tolist() == [1.0, 2.0, 3.0, 9.0, 4.0]
+
+
+def test_nucleic_acid_sequence():
+    structure = parse_pdb([
+        pdb_line("ATOM", 1, "P", "DA", "C", 1, (0, 0, 0)),
+        pdb_line("ATOM", 2, "P", "DT", "C", 2, (6, 0, 0)),
+        pdb_line("ATOM", 3, "P", "DG", "C", 3, (12, 0, 0)),
+        pdb_line("ATOM", 4, "P", "U", "R", 1, (0, 9, 0)),
+        pdb_line("ATOM", 5, "P", "PSU", "R", 2, (6, 9, 0)),
+        pdb_line("ATOM", 6, "CA", "SEC", "P", 1, (0, 18, 0)),
+    ])
+
+    assert structure.sequence("C") == "ATG"
+    assert structure.sequence("R") == "UX"
+    assert structure.sequence("P") == "U"
+
+
+def test_all_models(tmp_path):
+    path = tmp_path / "ensemble.pdb"
+    path.write_bytes(b"".join([
+        b"MODEL        1\n",
+        pdb_line("ATOM", 1, "CA", "GLY", "A", 1, (0, 0, 0)),
+        b"ENDMDL\n",
+        b"MODEL        2\n",
+        pdb_line("ATOM", 1, "CA", "GLY", "A", 1, (5, 0, 0)),
+        b"ENDMDL\n",
+    ]))
+
+    models = load_models(path)
+
+    assert [model.coords.tolist() for model in models] == [[[0, 0, 0]], [[5, 0, 0]]]
+    assert len(load_models(INSULIN)) == 1
+
+
+def test_parse_mmcif():
+    structure = parse_mmcif(MMCIF.splitlines(keepends=True))
+
+    assert len(structure) == 4
+    assert structure.chains() == ["A", "W"]
+    assert structure.coords[:, 0].tolist() == [1.0, 2.0, 3.0, 9.0]
+    assert structure.atom_name[-1] == "O5'"
+    assert structure.hetatm.tolist() == [False, False, False, True]
+    assert structure.res_seq.tolist() == [1, 1, 2, 101]
+    assert structure.sequence("A") == "GA"
+
+
+def test_parse_mmcif_models():
+    models = parse_mmcif_models(MMCIF.splitlines(keepends=True))
+
+    assert [len(model) for model in models] == [4, 1]
+    assert models[1].coords[:, 0].tolist() == [5.0]
+
+
+def test_empty_structure():
+    structure = parse_pdb([b"HEADER    NOTHING\n"])
+
+    assert len(structure) == 0
+    assert structure.chains() == []
+    assert structure.radius_of_gyration() == 0.0
+
+
+def test_structure_format():
+    assert structure_format("1abc.pdb") == "pdb"
+    assert structure_format("1ABC.CIF") == "mmcif"
+    assert structure_format("1abc.cif.gz") == "mmcif"
+    assert structure_format("1abc.ent.gz") == "pdb"
+
+
+def test_load_gzipped(tmp_path):
+    path = tmp_path / "insulin.pdb.gz"
+    with open(INSULIN, "rb") as src, gzip.open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+
+    assert np.array_equal(load_structure(path).coords, load_structure(INSULIN).coords)
+
+
+def test_load_is_cached_until_file_changes(tmp_path):
+    path = tmp_path / "insulin.pdb"
+    shutil.copyfile(INSULIN, path)
+
+    first = load_structure(path)
+    assert load_structure(path) is first
+
+    path.write_bytes(b"".join(line for line in open(INSULIN, "rb") if not line.startswith(b"HETATM")))
+    assert len(load_structure(path)) == 334
+
+
+def test_radius_of_gyration():
+    structure = parse_pdb([
+        pdb_line("ATOM", 1, "CA", "GLY", "A", 1, (1, 0, 0)),
+        pdb_line("ATOM", 2, "CA", "GLY", "A", 2, (-1, 0, 0)),
+    ])
+
+    assert structure.radius_of_gyration() == pytest.approx(1.0)
+
+
+def test_structure_summary():
+    summary = structure_tools.structure_summary(INSULIN)
+
+    assert summary["atoms"] == 371
+    assert summary["residues"] == 46
+    assert summary["waters"] == 37
+    assert summary["ligands"] == []
+    assert summary["chains"] == {"A": {"residues": 22, "atoms": 161}, "B": {"residues": 24, "atoms": 173}}
+
+
+def test_chain_sequences():
+    sequences = structure_tools.chain_sequences(INSULIN)
+
+    assert list(sequences) == ["A", "B"]
+    assert len(sequences["A"]) == 22
+    assert sequences["B"].startswith("NSLRAC")
+
+
+def test_residue_list():
+    assert structure_tools.residue_list(INSULIN, "A")[:3] == ["GLY1", "VAL2", "VAL3"]
+
+    with pytest.raises(ValueError):
+        structure_tools.residue_list(INSULIN, "Z")
+
+
+def test_radius_of_gyration_tool():
+    whole = structure_tools.radius_of_gyration(INSULIN)
+    chain_a = structure_tools.radius_of_gyration(INSULIN, "A")
+
+    assert 0 < chain_a < whole
+
+
+def test_write_pdb_round_trip():
+    structure = load_structure(INSULIN)
+    written = parse_pdb(write_pdb(structure).encode().splitlines(keepends=True))
+
+    assert np.allclose(written.coords, structure.coords)
+    for field in ("atom_name", "res_name", "chain_id", "res_seq", "element", "hetatm"):
+        assert np.array_equal(getattr(written, field), getattr(structure, field))
+
+
+def large_assembly_atoms():
+    # Chain IDs and residue numbers beyond the fixed-width PDB columns
+    structure = load_structure(INSULIN).select(np.arange(20))
+    structure.chain_id = np.array(["AA"] * 10 + ["B1"] * 10)
+    structure.res_seq = structure.res_seq + 12345
+    structure.atom_name[0] = "O5'"
+    return structure
+
+
+def test_write_mmcif_round_trip():
+    structure = large_assembly_atoms()
+    written = parse_mmcif(write_mmcif(structure).encode().splitlines(keepends=True))
+
+    assert np.allclose(written.coords, structure.coords)
+    for field in ("atom_name", "res_name", "chain_id", "res_seq", "ins_code", "element", "hetatm"):
+        assert np.array_equal(getattr(written, field), getattr(structure, field))
+
+
+def test_write_pdb_rejects_fields_that_do_not_fit():
+    with pytest.raises(ValueError):
+        write_pdb(large_assembly_atoms())
+
+
+def test_contact_map_tool():
+    contacts = structure_tools.contact_map(INSULIN, "A")
+
+    assert all(label.startswith("A:") for label in contacts["residues"])
+    assert [0, 1] in contacts["contacts"]
+    assert all(i < j < len(contacts["residues"]) for i, j in contacts["contacts"])
+
+
+def test_interface_residues():
+    interface = structure_tools.interface_residues(INSULIN, "A", "B")
+
+    assert list(interface) == ["A", "B"]
+    assert interface["A"] and all(label.startswith("A:") for label in interface["A"])
+    assert interface["B"] and all(label.startswith("B:") for label in interface["B"])
+
+    with pytest.raises(ValueError):
+        structure_tools.interface_residues(INSULIN, "A", "Z")
+
+
+def test_ligand_contacts(tmp_path):
+    path = tmp_path / "ligand.pdb"
+    path.write_bytes(b"".join([
+        pdb_line("ATOM", 1, "CA", "HIS", "A", 1, (0, 0, 0)),
+        pdb_line("ATOM", 2, "CA", "GLY", "A", 2, (3.8, 0, 0)),
+        pdb_line("ATOM", 3, "CA", "ALA", "A", 3, (7.6, 0, 0)),
+        pdb_line("HETATM", 4, "FE", "HEM", "A", 101, (0, 3, 0)),
+        pdb_line("HETATM", 5, "O", "HOH", "A", 201, (0, 4, 0)),
+    ]))
+
+    assert structure_tools.ligand_contacts(str(path), "hem") == ["A:HIS1"]
+    assert structure_tools.ligand_contacts(str(path), "HEM", cutoff=5.0) == ["A:HIS1", "A:GLY2"]
+
+    with pytest.raises(ValueError):
+        structure_tools.ligand_contacts(INSULIN, "HEM")
+
+
+def test_residues_within_radius():
+    # The N atom of A:GLY1
+    assert structure_tools.residues_within_radius(INSULIN, 18.23, 4.903, 9.716, 0.1) == ["A:GLY1"]
+
+
+def test_superpose_structures():
+    result = structure_tools.superpose_structures(INSULIN, INSULIN, "A", "A")
+
+    assert result["rmsd"] == 0
+    assert result["alignedResidues"] == 22
+    assert np.allclose(result["rotation"], np.eye(3))
+
+
+def test_rmsd_matrix_tool(tmp_path):
+    path = tmp_path / "ensemble.pdb"
+    structure = load_structure(INSULIN)
+    shifted = structure.select(slice(None))
+    shifted.coords = shifted.coords + 3
+    path.write_text("MODEL        1\n" + write_pdb(structure).replace("END\n", "ENDMDL\n")
+                    + "MODEL        2\n" + write_pdb(shifted).replace("END\n", "ENDMDL\n"))
+
+    result = structure_tools.rmsd_matrix([str(path), INSULIN])
+
+    assert result["labels"] == [f"{path}#1", f"{path}#2", INSULIN]
+    assert result["alignedResidues"] == 46
+    assert np.allclose(result["matrix"], 0, atol=1e-3)
+
+    with pytest.raises(ValueError):
+        structure_tools.rmsd_matrix([INSULIN])
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from genesys.structure import load_structure
+from genesys.superpose import ca_trace, kabsch, matched_coords, residue_mapping, rmsd_matrix, superpose
+
+INSULIN = "tests/fixtures/insulin.pdb"
+
+
+def random_rotation(rng):
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    return q
+
+
+def explicit_rmsd(a, b):
+    return np.sqrt(((a - b) ** 2).sum(axis=1).mean())
+
+
+def test_kabsch_recovers_rigid_motion():
+    rng = np.random.default_rng(0)
+    target = rng.normal(size=(40, 3)) * 10
+    mobile = (target - [1, 2, 3]) @ random_rotation(rng).T
+
+    rotation, translation, rmsd = kabsch(mobile, target)
+
+    assert rmsd == pytest.approx(0, abs=1e-6)
+    assert np.allclose(mobile @ rotation + translation, target)
+    assert np.linalg.det(rotation) == pytest.approx(1)
+
+
+def test_kabsch_rmsd_matches_superposed_coordinates():
+    rng = np.random.default_rng(1)
+    target = rng.normal(size=(30, 3)) * 10
+    mobile = target @ random_rotation(rng) + rng.normal(scale=0.7, size=target.shape)
+
+    rotation, translation, rmsd = kabsch(mobile, target)
+
+    assert rmsd == pytest.approx(explicit_rmsd(mobile @ rotation + translation, target))
+
+
+def test_kabsch_never_reflects():
+    rng = np.random.default_rng(2)
+    target = rng.normal(size=(20, 3))
+    mirrored = target * [-1, 1, 1]
+
+    rotation, translation, rmsd = kabsch(mirrored, target)
+
+    assert np.linalg.det(rotation) == pytest.approx(1)
+    assert rmsd == pytest.approx(explicit_rmsd(mirrored @ rotation + translation, target))
+    assert rmsd > 0
+
+
+def test_kabsch_batches():
+    rng = np.random.default_rng(3)
+    mobile = rng.normal(size=(5, 25, 3))
+    target = rng.normal(size=(5, 25, 3))
+
+    rotations, translations, rmsds = kabsch(mobile, target)
+
+    assert rotations.shape == (5, 3, 3)
+    assert translations.shape == (5, 3)
+    for k in range(5):
+        _, _, rmsd = kabsch(mobile[k], target[k])
+        assert rmsds[k] == pytest.approx(rmsd)
+
+
+def test_rmsd_matrix_matches_pairwise_kabsch():
+    rng = np.random.default_rng(4)
+    base = rng.normal(size=(30, 3)) * 5
+    models = np.stack([base @ random_rotation(rng) + rng.normal(scale=0.5, size=base.shape) for _ in range(6)])
+
+    matrix = rmsd_matrix(models)
+
+    assert matrix.shape == (6, 6)
+    assert np.allclose(matrix, matrix.T)
+    assert np.all(np.diag(matrix) == 0)
+    for i in range(6):
+        for j in range(i + 1, 6):
+            assert matrix[i, j] == pytest.approx(kabsch(models[i], models[j])[2])
+
+
+def test_residue_mapping():
+    positions_a, positions_b = residue_mapping("GIVEQCCTSICSLYQLENYCN", "GIVEQCCSICSLYQLENYCNU")
+
+    # T8 is missing from the second sequence; the trailing U is unmatched
+    assert positions_a.tolist() == [*range(7), *range(8, 21)]
+    assert positions_b.tolist() == list(range(20))
+
+
+def test_identical_sequences_map_one_to_one():
+    positions_a, positions_b = residue_mapping("ACDE", "ACDE")
+
+    assert positions_a.tolist() == positions_b.tolist() == [0, 1, 2, 3]
+
+
+def test_ca_trace():
+    coords, sequence = ca_trace(load_structure(INSULIN), "A")
+
+    assert coords.shape == (22, 3)
+    assert len(sequence) == 22
+
+
+def test_superpose_moved_copy():
+    structure = load_structure(INSULIN)
+    moved = structure.select(slice(None))
+    moved.coords = moved.coords @ random_rotation(np.random.default_rng(5)).T.astype(np.float32) + 7
+
+    result = superpose(moved, structure)
+
+    assert result["aligned"] == 46
+    assert result["rmsd"] == pytest.approx(0, abs=1e-3)
+
+
+def test_superpose_too_few_residues():
+    structure = load_structure(INSULIN)
+
+    with pytest.raises(ValueError):
+        superpose(structure, structure, "A", "Z")
+
+
+def test_matched_coords_keeps_shared_residues():
+    structure = load_structure(INSULIN)
+    chain_a = structure.select(structure.chain_id == "A")
+    # Drop ASP4 from one copy
+    shorter = chain_a.select(chain_a.residue_index != 3)
+
+    coords = matched_coords([chain_a, shorter, chain_a])
+
+    assert coords.shape == (3, 21, 3)
+    assert np.array_equal(coords[0], coords[1])
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from genesys import tables
+from genesys.tables import csv_to_parquet, load_parquet
+
+CSV = b"Name,Age,City\nJohn,28,New York\nJane,24,Los Angeles\nTom,22,Chicago\n"
+
+
+def test_csv_is_converted_once(tmp_path):
+    path = csv_to_parquet(CSV, tmp_path)
+    mtime = path.stat().st_mtime_ns
+
+    assert csv_to_parquet(CSV, tmp_path) == path
+    assert path.stat().st_mtime_ns == mtime
+    assert path.name == f"{tables.content_hash(CSV)}.parquet"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_parquet_matches_csv(tmp_path):
+    df = load_parquet(csv_to_parquet(CSV, tmp_path))
+
+    assert df["Name"].tolist() == ["John", "Jane", "Tom"]
+    assert df["Age"].tolist() == [28, 24, 22]
+    assert df["City"].tolist() == ["New York", "Los Angeles", "Chicago"]
+
+
+def test_type_change_after_first_block(tmp_path, monkeypatch):
+    monkeypatch.setattr(tables, "BLOCK_SIZE", 32)
+    content = b"a,b\n" + b"1,x\n" * 20 + b"oops,y\n"
+
+    df = load_parquet(csv_to_parquet(content, tmp_path))
+
+    assert len(df) == 21
+    assert df["a"].iloc[-1] == "oops"
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from genesys.storage import StorageError
+from genesys.uploads import UploadQueue
+
+
+class _FakeS3:
+    def __init__(self, status_code=200, failures=None):
+        self.status_code = status_code
+        self.failures = failures
+        self.uploads = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, path, user_id, filename, data_file):
+        self.release.wait()
+        self.uploads.append((path.read_bytes(), user_id, filename, data_file))
+        if self.failures is not None:
+            if self.failures == 0:
+                return
+            self.failures -= 1
+        if self.status_code != 200:
+            raise StorageError(f"HTTP {self.status_code}")
+
+
+def test_enqueue_uploads_in_background(tmp_path):
+    s3 = _FakeS3()
+    s3.release.clear()
+    uploads = UploadQueue(tmp_path, upload=s3)
+
+    # Returns before the upload has happened
+    assert uploads.enqueue(">seq\nACGT\n", "charlie", "1-a.fasta", "FASTA") == "1-a.fasta"
+    assert s3.uploads == []
+
+    s3.release.set()
+    uploads.join()
+    assert s3.uploads == [(b">seq\nACGT\n", "charlie", "1-a.fasta", "FASTA")]
+    # Spooled content is removed once uploaded
+    assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+
+def test_duplicate_content_is_uploaded_once(tmp_path):
+    s3 = _FakeS3()
+    uploads = UploadQueue(tmp_path, upload=s3)
+
+    assert uploads.enqueue(b"ACGT", "charlie", "1-a.fasta", "FASTA") == "1-a.fasta"
+    uploads.join()
+    assert uploads.enqueue(b"ACGT", "charlie", "2-a.fasta", "FASTA") == "1-a.fasta"
+    uploads.join()
+
+    assert len(s3.uploads) == 1
+
+
+def test_same_content_from_different_users(tmp_path):
+    s3 = _FakeS3()
+    uploads = UploadQueue(tmp_path, upload=s3)
+
+    assert uploads.enqueue(b"ACGT", "charlie", "1-a.fasta", "FASTA") == "1-a.fasta"
+    assert uploads.enqueue(b"ACGT", "dana", "2-a.fasta", "FASTA") == "2-a.fasta"
+    # Same user, but stored as a different kind of file
+    assert uploads.enqueue(b"ACGT", "charlie", "3-a.csv", "csv") == "3-a.csv"
+    uploads.join()
+
+    assert sorted(s3.uploads) == [
+        (b"ACGT", "charlie", "1-a.fasta", "FASTA"),
+        (b"ACGT", "charlie", "3-a.csv", "csv"),
+        (b"ACGT", "dana", "2-a.fasta", "FASTA"),
+    ]
+    assert uploads.status(UploadQueue.upload_key(b"ACGT", "dana", "FASTA")) == "done"
+
+
+def test_pending_uploads_resume_after_restart(tmp_path):
+    failing = _FakeS3(status_code=503)
+    uploads = UploadQueue(tmp_path, upload=failing)
+    uploads.enqueue(b"ACGT", "charlie", "1-a.fasta", "FASTA")
+    uploads.join()
+    assert len(failing.uploads) == 1
+
+    s3 = _FakeS3()
+    restarted = UploadQueue(tmp_path, upload=s3)
+    restarted.join()
+
+    assert s3.uploads == [(b"ACGT", "charlie", "1-a.fasta", "FASTA")]
+    assert restarted.enqueue(b"ACGT", "charlie", "2-a.fasta", "FASTA") == "1-a.fasta"
+
+
+def test_failed_uploads_are_retried_with_backoff(tmp_path):
+    flaky = _FakeS3(status_code=503, failures=2)
+    uploads = UploadQueue(tmp_path, upload=flaky, retry_delay=0.05)
+    uploads.enqueue(b"ACGT", "charlie", "1-a.fasta", "FASTA")
+
+    key = UploadQueue.upload_key(b"ACGT", "charlie", "FASTA")
+    deadline = time.monotonic() + 5
+    while uploads.status(key) != "done" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    uploads.join()
+
+    assert uploads.status(key) == "done"
+    assert len(flaky.uploads) == 3
+    assert uploads.failures == {}
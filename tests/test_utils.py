@@ -1,6 +1,7 @@
 import inspect
+import json
 import math
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
 from typing_extensions import Doc
 
@@ -94,3 +95,41 @@ def test_gen_sequence_tools_schema():
 
     for tool in schema:
         assert tool["type"] == "function"
+
+def search(
+    terms: Annotated[list[str], Doc("Search terms.")],
+    limit: Optional[int] = None,
+    mode: Literal["any", "all"] = "any",
+    weights: dict[str, float] | None = None,
+) -> list[str]:
+    """Search for things."""
+    return terms
+
+def test_generic_param_types():
+    props = utils.gen_function_schema(search)["parameters"]["properties"]
+    assert props["terms"]["type"] == "array"
+    assert props["terms"]["items"] == {"type": "string"}
+    assert props["terms"]["description"] == "Search terms."
+    assert props["limit"]["type"] == ["integer", "null"]
+    assert props["mode"]["enum"] == ["any", "all"]
+    assert props["weights"]["type"] == ["object", "null"]
+    assert props["weights"]["additionalProperties"] == {"type": "number"}
+
+def test_gen_tools_schema_is_cached():
+    from genesys.tools import sequence
+
+    first = utils.gen_tools_schema(sequence)
+    first[0]["function"]["name"] = "mutated"
+    assert utils.gen_tools_schema(sequence)[0]["function"]["name"] != "mutated"
+    assert sequence.__name__ in utils._tools_schemas
+
+def test_precompiled_tools_schema(tmp_path, monkeypatch):
+    from genesys.tools import sequence
+
+    path = tmp_path / "schema.json"
+    utils.precompile_tools_schema([sequence], path)
+
+    monkeypatch.setattr(utils, "TOOLS_SCHEMA_FILE", path)
+    monkeypatch.setattr(utils, "_tools_schemas", {})
+    monkeypatch.setattr(utils, "get_tool_functions", None)  # introspection must not run
+    assert utils.gen_tools_schema(sequence) == json.loads(path.read_text())[sequence.__name__]["tools"]
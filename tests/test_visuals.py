@@ -0,0 +1,88 @@
+import base64
+import gzip
+import shutil
+
+import pytest
+
+from genesys import visuals
+from genesys.structure import load_structure, parse_mmcif
+from genesys.visuals import decimate_structure, protein_view_html, structure_model
+
+INSULIN = "tests/fixtures/insulin.pdb"
+
+
+def decode(model):
+    return gzip.decompress(base64.b64decode(model["payload"])).decode()
+
+
+def test_small_structures_keep_every_atom():
+    structure = load_structure(INSULIN)
+    reduced, level = decimate_structure(structure)
+
+    assert level == "full"
+    assert len(reduced) == len(structure)
+
+
+def test_large_structures_become_a_trace():
+    structure = load_structure(INSULIN)
+    reduced, level = decimate_structure(structure, max_atoms=100)
+
+    assert level == "trace"
+    assert len(reduced) == 46
+    assert set(reduced.atom_name) == {"CA"}
+
+
+def test_chain_subset():
+    reduced, level = decimate_structure(load_structure(INSULIN), chains=["B"], level="full")
+
+    assert level == "full"
+    assert reduced.chains() == ["B"]
+
+
+def test_unknown_level():
+    with pytest.raises(ValueError):
+        decimate_structure(load_structure(INSULIN), level="medium")
+
+
+def test_full_model_is_the_uploaded_file(tmp_path):
+    path = tmp_path / "insulin.pdb"
+    shutil.copyfile(INSULIN, path)
+    model = structure_model(path)
+
+    assert model["level"] == "full"
+    assert model["format"] == "pdb"
+    assert decode(model) == path.read_text()
+    assert model["atoms"] == model["totalAtoms"] == 371
+
+
+def test_trace_model(tmp_path):
+    path = tmp_path / "insulin.pdb"
+    shutil.copyfile(INSULIN, path)
+    model = structure_model(path, max_atoms=100)
+
+    assert model["level"] == "trace"
+    assert model["format"] == "cif"
+    assert model["atoms"] == 46
+    assert len(parse_mmcif(decode(model).encode().splitlines(keepends=True))) == 46
+
+
+def test_model_is_cached_until_file_changes(tmp_path):
+    path = tmp_path / "insulin.pdb"
+    shutil.copyfile(INSULIN, path)
+
+    first = structure_model(path, chains=["A"])
+    assert structure_model(path, chains=["A"]) is first
+
+    path.write_bytes(b"".join(line for line in open(INSULIN, "rb") if b" A " not in line[16:23]))
+    assert structure_model(path, chains=["A"]) is not first
+
+
+def test_view_html_only_depends_on_the_model(tmp_path):
+    path = tmp_path / "insulin.pdb"
+    shutil.copyfile(INSULIN, path)
+    model = structure_model(path)
+    html = protein_view_html(model)
+
+    assert model["payload"] in html
+    assert html == protein_view_html(structure_model(path))
+    assert visuals.VIEWER_JS in html
@@ -3,11 +3,17 @@ This testing module is to make sure that the prompts and the function
 descriptions defined in `tools.pubmed` results in the behavior that we expect.
 """
 
+import asyncio
 import os
 import pytest
 import openai
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 from genesys import tools
+from genesys.tools import pubmed
 from genesys.tools.pubmed import fetch_papers
+from genesys.tools.pubmed_cache import PubMedCache
 import time
 import pytest
 
@@ -32,5 +38,155 @@ def test_perform_search_multiple_queries():
 def test_perform_search_with_assistant():
     pass
 
+
+class _EutilsStandIn(BaseHTTPRequestHandler):
+    """Serves canned ESearch/EFetch responses for `count` articles with PMIDs 1..count."""
+
+    count = 7
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, params))
+
+        if url.path.endswith("esearch.fcgi"):
+            ids = "".join(f"<Id>{pmid}</Id>" for pmid in range(1, min(int(params["retmax"]), self.count) + 1))
+            body = (
+                f"<eSearchResult><Count>{self.count}</Count><RetMax>{params['retmax']}</RetMax>"
+                f"<QueryKey>1</QueryKey><WebEnv>MCID_test</WebEnv><IdList>{ids}</IdList></eSearchResult>"
+            )
+        else:
+            if "id" in params:
+                pmids = [int(pmid) for pmid in params["id"].split(",")]
+            else:
+                start, size = int(params["retstart"]), int(params["retmax"])
+                pmids = range(start + 1, min(start + size, self.count) + 1)
+            articles = "".join(
+                f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+                f"<ArticleTitle>Paper <i>{pmid}</i></ArticleTitle>"
+                f"<Abstract><AbstractText>Abstract {pmid}</AbstractText></Abstract>"
+                "</Article></MedlineCitation></PubmedArticle>"
+                for pmid in pmids
+            )
+            body = f"<PubmedArticleSet>{articles}</PubmedArticleSet>"
+
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def eutils():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EutilsStandIn)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_fetch_in_batches_from_history(eutils, monkeypatch):
+    server, url = eutils
+    monkeypatch.setattr(pubmed, "BATCH_SIZE", 3)
+
+    papers = asyncio.run(pubmed.afetch_papers("genomics & cancer", max_results=7, url=url, rate_limit=100))
+
+    assert [p[0] for p in papers] == [str(i) for i in range(1, 8)]
+    assert papers[0] == ("1", "Paper 1", "Abstract 1")
+
+    search_path, search_params = server.requests[0]
+    assert search_path.endswith("esearch.fcgi")
+    assert search_params["term"] == "genomics & cancer"
+    assert search_params["usehistory"] == "y"
+
+    fetches = sorted(int(p["retstart"]) for path, p in server.requests[1:])
+    assert fetches == [0, 3, 6]
+    assert all(p["WebEnv"] == "MCID_test" for _, p in server.requests[1:])
+
+
+def test_fetch_respects_rate_limit(eutils, monkeypatch):
+    server, url = eutils
+    monkeypatch.setattr(pubmed, "BATCH_SIZE", 2)
+
+    start = time.monotonic()
+    asyncio.run(pubmed.afetch_papers("genomics", max_results=6, url=url, rate_limit=10))
+
+    # 1 search + 3 fetches at 10 requests per second
+    assert len(server.requests) == 4
+    assert time.monotonic() - start >= 0.3
+
+
+def test_stream_stops_early(eutils):
+    server, url = eutils
+
+    async def first():
+        async for paper in pubmed.aiter_papers("genomics", max_results=7, url=url, rate_limit=100):
+            return paper
+
+    assert asyncio.run(first())[0] == "1"
+
+def test_cached_search_makes_no_requests(eutils, tmp_path):
+    server, url = eutils
+    cache = PubMedCache(tmp_path / "pubmed.sqlite3")
+
+    first = asyncio.run(pubmed.afetch_papers("Genomics", max_results=5, url=url, rate_limit=100, cache=cache))
+    requests_made = len(server.requests)
+    second = asyncio.run(pubmed.afetch_papers("  genomics ", max_results=5, url=url, rate_limit=100, cache=cache))
+
+    assert first == second
+    assert [p[0] for p in first] == ["1", "2", "3", "4", "5"]
+    assert len(server.requests) == requests_made
+
+
+def test_overlapping_search_fetches_missing_articles(eutils, tmp_path):
+    server, url = eutils
+    cache = PubMedCache(tmp_path / "pubmed.sqlite3")
+
+    asyncio.run(pubmed.afetch_papers("genomics", max_results=3, url=url, rate_limit=100, cache=cache))
+    server.requests.clear()
+    papers = asyncio.run(pubmed.afetch_papers("crispr", max_results=6, url=url, rate_limit=100, cache=cache))
+
+    assert [p[0] for p in papers] == ["1", "2", "3", "4", "5", "6"]
+    fetches = [p for path, p in server.requests if path.endswith("efetch.fcgi")]
+    assert [p["id"] for p in fetches] == ["4,5,6"]
+
+
+def test_cache_ttl_and_eviction(tmp_path):
+    cache = PubMedCache(tmp_path / "pubmed.sqlite3", search_ttl=0, max_article_bytes=30)
+
+    cache.put_search("genomics", 10, ["1", "2"], count=2)
+    assert cache.get_search("genomics", 10) is None
+
+    cache.put_articles([("1", "Title 1", "Abstract 1")])
+    cache.put_articles([("2", "Title 2", "Abstract 2")])
+    assert set(cache.get_articles(["1", "2"])) == {"2"}
+
+
+def test_search_local_papers(tmp_path, monkeypatch):
+    cache = PubMedCache(tmp_path / "pubmed.sqlite3", max_article_bytes=40)
+    monkeypatch.setattr(pubmed, "get_default_cache", lambda: cache)
+
+    cache.put_articles([
+        ("1", "FMR1 and fragile X syndrome", "Expansion of CGG repeats."),
+        ("2", "CRISPR screens", "Genome-wide knockout of FMR1 targets."),
+        ("3", "Protein folding", "Nothing relevant here."),
+    ])
+
+    results = pubmed.search_local_papers("fragile X FMR1")
+    assert [paper[0] for paper in results] == ["1", "2"]
+    assert results[0] == ("1", "FMR1 and fragile X syndrome", "Expansion of CGG repeats.")
+
+    # Evicted from the article cache, but still in the index
+    assert cache.get_articles(["1"]) == {}
+    assert pubmed.search_local_papers("CGG repeats")[0][0] == "1"
+    assert pubmed.search_local_papers("!!") == []
+
+
 if __name__ == "__main__":
-    pytest.main()
\ No newline at end of file
+    pytest.main()